@@ -1,36 +1,327 @@
+from __future__ import annotations
+
+import hashlib
+import json
 import os
+import time
 
 import pandas as pd
 import streamlit as st
 from dotenv import load_dotenv
 
-from src import kpis
-from src.snow_client import fetch_incidents
-from src.transforms import to_dataframe
+from src import instrument
+from src.csv_ingest import ingest_csv
+from src.cube import KpiCube
+from src.frame_cache import FrameCache, cache_key, file_fingerprint
+from src.kpi_cache import (
+    FINGERPRINT_COLUMNS,
+    cached_compute_kpis,
+    frame_fingerprint,
+    kpi_cache_stats,
+    prime_kpis,
+    stamp_frame,
+)
+from src.kpi_fetch import fetch_headline_kpis
+from src.kpis import KpiResult
+from src.local_query import UnsupportedQuery, filter_frame
+from src.parallel import process_csv
+from src.refresh import (
+    DEFAULT_INTERVAL_SECONDS,
+    RefreshWorker,
+    SnapshotStore,
+    api_views_builder,
+)
+from src.snow_client import SnowClient
+from src.store import IncidentStore
+from src.table_view import page_frame
+from src.transforms import (
+    DASHBOARD_COLUMNS,
+    compact_frame,
+    load_transform_plan,
+)
+from src.trends import TrendStore
+from src.views import ViewBatch, batch_version, dashboard_views, fetch_views, views_key
 
 load_dotenv()
 
+API_TTL_SECONDS = 300  # how long a synced API frame is reused across reruns
+DETAIL_COLUMNS = ["number", "priority", "opened_at", "resolved_at", "location", "category",
+                  "incident_state", "short_description"]
+SECTIONS = ["Trends", "Drill-down", "Incident details"]
+# CSVs at least this big are normalised on MI_TRANSFORM_WORKERS processes when that is > 1;
+# below it the process pool costs more than it saves
+PARALLEL_MIN_BYTES = 64 * 2**20
+
+@st.cache_resource
+def get_snow_client() -> SnowClient:
+    """One pooled ServiceNow client shared across reruns and sessions"""
+    return SnowClient()
+
+@st.cache_resource
+def get_incident_store() -> IncidentStore:
+    """Local incident store backing incremental (delta) syncs"""
+    return IncidentStore()
+
+@st.cache_resource
+def get_frame_cache() -> FrameCache:
+    """On-disk cache of normalised frames so reruns skip parsing"""
+    return FrameCache()
+
+@st.cache_resource(max_entries=4)
+def get_trend_store(fingerprint: str, _df: pd.DataFrame) -> TrendStore:
+    """Time-bucketed aggregates for a frame, built once per frame fingerprint"""
+    return TrendStore.from_frame(_df)
+
+@st.cache_resource(max_entries=4)
+def get_kpi_cube(fingerprint: str, _df: pd.DataFrame) -> KpiCube:
+    """Drill-down cube for a frame, built once per frame fingerprint"""
+    return KpiCube.build(_df)
+
+# Frames are held with cache_resource rather than cache_data: the same object is
+# returned on every rerun (no pickle round-trip or copy), which also keeps its
+# KPI-cache stamp valid. Callers must not mutate them in place.
+@st.cache_resource(max_entries=2)
+def load_csv_frame(path: str, fingerprint: str) -> tuple[pd.DataFrame, str]:
+    """Normalised frame for a CSV file, rebuilt only when the file changes"""
+    key = cache_key(f"csv:{path}", None, fingerprint)
+    built = {}
+
+    def build() -> pd.DataFrame:
+        df, built["kpis"] = read_csv_frame(path)
+        return df
+
+    df = get_frame_cache().get_or_build(key, build)
+    if "kpis" in built:
+        # KPIs were aggregated while the file streamed in; no second pass needed
+        prime_kpis(stamp_frame(df, key), built["kpis"])
+    return df, key
+
+def read_csv_frame(path: str) -> tuple[pd.DataFrame, KpiResult]:
+    workers = int(os.getenv("MI_TRANSFORM_WORKERS", "1"))
+    if workers > 1 and os.path.getsize(path) >= PARALLEL_MIN_BYTES:
+        df, kpis = process_csv(path, workers)
+        if df is None:  # only with keep_frame=False
+            raise RuntimeError(f"process_csv kept no frame for {path}")
+        return df, kpis
+    result = ingest_csv(path)
+    return result.df, result.kpis
+
+@st.cache_resource(max_entries=2)
+def load_uploaded_frame(digest: str, _data: bytes) -> pd.DataFrame:
+    """Normalised frame for an uploaded CSV, keyed by content digest (parsed in chunks)"""
+    result = ingest_csv(_data)
+    prime_kpis(stamp_frame(result.df, f"upload:{digest}"), result.kpis)
+    return result.df
+
+@st.cache_resource(ttl=API_TTL_SECONDS, max_entries=4)
+def load_api_views(views: tuple[tuple[str, str], ...], incremental: bool) -> tuple[pd.DataFrame, str | None, dict]:
+    """Fetch every view in one batch, each record once; reruns within the TTL reuse the result.
+
+    The frame has a ``view:<name>`` mask column per view (see ``src.views``).
+    Returns the frame, its loader version (None when not cached on disk) and
+    debug details that are only rendered on request.
+    """
+    view_map = dict(views)
+    version = None
+    if incremental:
+        store = get_incident_store()
+        batch = fetch_views(view_map, client=get_snow_client(), store=store)
+        # A new version only when a sync or reconcile changed some view's stored records
+        version = batch_version(view_map, store)
+        df = get_frame_cache().get_or_build(version, batch.to_frame)
+    else:
+        batch = fetch_views(view_map, client=get_snow_client())
+        df = batch.to_frame()
+    debug = {
+        "raw_records": len(batch.df),
+        "record_keys": list(batch.df.columns),
+        "view_rows": batch.counts(),
+        # First record as normalised (the raw dicts are converted page by page, not kept)
+        "sample_record": json.loads(batch.df.head(1).to_json(orient="records", date_format="iso"))[0]
+        if len(batch.df) else None,
+        "loaded_at": time.time(),
+    }
+    return df, version, debug
+
+@st.cache_resource(max_entries=8)
+def view_frame(version: str, view: str, _df: pd.DataFrame) -> pd.DataFrame:
+    """One view of a batch frame, built once per loader version (a row mask, no API calls)"""
+    return ViewBatch.from_frame(_df).view(view)
+
+@st.cache_resource(max_entries=8)
+def filtered_frame(version: str, query: str, _df: pd.DataFrame) -> pd.DataFrame:
+    """Rows of a loaded frame matching an encoded query, evaluated locally (no API calls)"""
+    return filter_frame(_df, query)
+
+@st.cache_resource(ttl=API_TTL_SECONDS, max_entries=4)
+def load_headline_kpis(query: str) -> tuple[KpiResult, dict]:
+    """Headline KPIs only: Aggregate API counts plus a minimal-field row fetch."""
+    client = get_snow_client()
+    client.stats.reset()
+    result = fetch_headline_kpis(query, client=client)
+    return result, {**client.stats.summary(), "loaded_at": time.time()}
+
+@st.cache_resource
+def get_refresh_worker(views: tuple[tuple[str, str], ...], incremental: bool) -> RefreshWorker:
+    """In-process snapshot refresher, used when no external worker keeps the snapshot fresh"""
+    interval = float(os.getenv("REFRESH_INTERVAL_SECONDS", DEFAULT_INTERVAL_SECONDS))
+    return RefreshWorker(SnapshotStore(views_key(dict(views))), api_views_builder(dict(views), incremental), interval)
+
+def load_snapshot(views: tuple[tuple[str, str], ...], incremental: bool) -> tuple[pd.DataFrame, str]:
+    """Serve the last good snapshot immediately (stale-while-revalidate).
+
+    Only the very first load, with no snapshot on disk yet, waits for a sync.
+    """
+    worker = get_refresh_worker(views, incremental)
+    store = worker.store
+    status = store.status()
+    # A worker in another process (see infra/Dockerfile) records its pid on each refresh
+    external = (status.get("pid") not in (None, os.getpid())
+                and time.time() - status.get("updated_at", 0) < 2 * worker.interval)
+    if st.sidebar.button("Refresh now") and not external:
+        worker.start().trigger()
+    snapshot = store.latest()
+    if snapshot is None:
+        with st.spinner("First sync from ServiceNow…"):
+            if external:
+                while snapshot is None and store.status().get("refreshing"):
+                    time.sleep(1)
+                    snapshot = store.latest()
+            if snapshot is None:
+                snapshot = worker.run_once()
+        if snapshot is None:
+            raise RuntimeError(store.status().get("last_error") or "Snapshot refresh failed")
+    if not external:
+        worker.start()  # no-op when already running
+
+    status = store.status()
+    note = " · refreshing…" if status.get("refreshing") else ""
+    if not (external or worker.enabled):
+        note += " · auto-refresh off"
+    if status.get("last_error"):
+        note += f" · last refresh failed: {status['last_error']}"
+    st.caption(f"{len(snapshot.df):,} incidents across all views from ServiceNow · snapshot {snapshot.age_seconds / 60:.0f} min old{note}")
+    return snapshot.df, snapshot.version
+
+@st.cache_resource(max_entries=2)
+def compact_cached(version: str, _df: pd.DataFrame) -> tuple[pd.DataFrame, str]:
+    """Compact-mode copy of a frame, built once per loader version"""
+    df, report = compact_frame(_df)
+    return df, str(report)
+
+def render_kpis(df: pd.DataFrame) -> None:
+    """KPI tiles and weekly chart; the numbers come from the KPI cache, so they
+    are only recomputed when the frame's fingerprint changes."""
+    render_kpi_result(cached_compute_kpis(df))
+
+def render_kpi_result(result: KpiResult) -> None:
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("MTTR (hrs)", f"{result.mttr_hours:.1f}")
+    col1.caption(f"P50 {result.mttr_p50_hours:.1f} · P90 {result.mttr_p90_hours:.1f} · "
+                 f"P99 {result.mttr_p99_hours:.1f} hrs")
+    col2.metric("MIs (YTD)", result.mi_count)
+    col3.metric("P1 ratio", f"{result.p1_ratio*100:.0f}%")
+    col4.metric("Sites impacted", result.sites_impacted)
+
+    st.line_chart(result.weekly.set_index("week")["mi_count"], height=280)
+
+def render_trends(df: pd.DataFrame, fingerprint: str) -> None:
+    st.subheader("Trends")
+    freq = st.radio("Bucket", ["W", "D", "M"], horizontal=True,
+                    format_func={"D": "Daily", "W": "Weekly", "M": "Monthly"}.get)
+    trend = get_trend_store(fingerprint, df).rolling(window=4, freq=freq).set_index("period")
+    left, right = st.columns(2)
+    left.line_chart(trend[["incidents", "incidents_ma"]], height=240)
+    right.line_chart(trend[["mttr_rolling_hours", "p90_rolling_hours"]], height=240)
+
+def render_drilldown(df: pd.DataFrame, fingerprint: str) -> None:
+    st.subheader("Drill-down")
+    cube = get_kpi_cube(fingerprint, df)
+    dims = [d for d in cube.dimensions if d not in ("week", "is_major")]
+    if dims:
+        by = st.multiselect("Group by", dims, default=dims[:1])
+        st.dataframe(cube.rollup(by).sort_values("incidents", ascending=False), hide_index=True)
+
+@st.fragment
+def render_details(df: pd.DataFrame) -> None:
+    """Server-side filtered/paginated detail table. Runs as a fragment, so paging
+    and filtering rerun only this block and only one page reaches the browser."""
+    st.subheader("Incident details")
+    c1, c2, c3, c4 = st.columns([3, 2, 2, 1])
+    search = c1.text_input("Search", placeholder="Number, description, site or category")
+    priorities = c2.multiselect("Priority", sorted(df["priority"].dropna().unique().tolist())
+                                if "priority" in df.columns else [])
+    sortable = [c for c in DETAIL_COLUMNS if c in df.columns]
+    sort_by = c3.selectbox("Sort by", sortable, index=sortable.index("opened_at") if "opened_at" in sortable else 0)
+    page_size = c4.selectbox("Rows", [25, 50, 100], index=1)
+    page = page_frame(df, page=st.session_state.get("detail_page", 1), page_size=page_size, search=search,
+                      filters={"priority": priorities}, sort_by=sort_by, columns=DETAIL_COLUMNS)
+    st.session_state["detail_page"] = page.page  # clamp when a filter shrinks the result
+    st.dataframe(page.rows, hide_index=True)
+    st.number_input(f"Page (of {page.pages}) · {page.total:,} matching incidents", min_value=1,
+                    max_value=page.pages, key="detail_page")
+
+def render_diagnostics(placeholder, timings: dict[str, float]) -> None:
+    """Time-to-first-paint and rerun latency, with the recent rerun history."""
+    history = st.session_state.setdefault("rerun_history", [])
+    history.append(timings)
+    del history[:-20]
+    cache = kpi_cache_stats()
+    with placeholder.container():
+        with st.expander("Diagnostics", expanded=False):
+            st.caption(f"First paint (KPIs): {timings.get('first_paint', float('nan')) * 1000:.0f} ms")
+            st.caption(f"Rerun latency: {timings['total'] * 1000:.0f} ms "
+                       f"(median of last {len(history)}: "
+                       f"{pd.Series([h['total'] for h in history]).median() * 1000:.0f} ms)")
+            st.caption(" · ".join(f"{k} {v * 1000:.0f} ms" for k, v in timings.items()
+                                  if k not in ("first_paint", "total")))
+            st.caption(f"KPI cache: {cache['hits']} hits / {cache['misses']} misses")
+            if instrument.enabled():
+                st.json(instrument.export_json(), expanded=False)
+
+@st.cache_resource
+def start_metrics_server(port: int, host: str) -> None:
+    """Prometheus /metrics endpoint for the instrumentation counters (once per process)"""
+    instrument.serve_metrics(port, host)
+
 def main():
+    if os.getenv("MI_METRICS_PORT"):
+        start_metrics_server(int(os.environ["MI_METRICS_PORT"]), os.getenv("MI_METRICS_HOST", "127.0.0.1"))
+    # One profile dump per rerun when MI_PROFILE is set; a no-op otherwise
+    with instrument.profile("render"):
+        render_page()
+
+def render_page():
+    start = time.perf_counter()
+    timings: dict[str, float] = {}
     st.set_page_config(page_title="C‑suite MI Dashboard", layout="wide")
 
     st.title("C‑suite Major Incidents Dashboard")
 
     data_src = st.sidebar.selectbox("Data source", ["CSV sample", "ServiceNow API"])
     st.sidebar.number_input("Year", min_value=2020, max_value=2100, value=2025, step=1)
+    sections = st.sidebar.multiselect("Sections", SECTIONS, default=SECTIONS,
+                                      help="Unselected sections are not computed at all")
+    show_debug = st.sidebar.checkbox("Show debug panels", value=False)
+    diagnostics = st.sidebar.empty()
+    debug: dict = {}
 
+    version = None  # loader stamp for frames served from the frame cache
     if data_src == "CSV sample":
         path = os.path.join("data", "sample_incidents.csv")
         if not os.path.exists(path):
             st.info("No sample CSV found. Upload one below.")
             uploaded = st.file_uploader("Upload ServiceNow CSV (incidents)", type=["csv"])
             if uploaded:
-                df = pd.read_csv(uploaded)
+                data = uploaded.getvalue()
+                digest = hashlib.sha256(data).hexdigest()
+                df = load_uploaded_frame(digest, data)
+                version = f"upload:{digest}"
             else:
                 st.stop()
         else:
-            df = pd.read_csv(path)
-            # Transform CSV data to match expected format
-            df = transform_csv_data(df)
+            # Transform CSV data to match expected format (cached until the file changes)
+            df, version = load_csv_frame(path, file_fingerprint(path))
     else:
         # Use environment variable with proper fallback
         query = os.getenv("SNOW_QUERY", "")
@@ -38,29 +329,53 @@ def main():
         if not query:
             # Fallback to the working query format that matches your successful curl test
             query = "priorityIN1,2"
-            st.info("SNOW_QUERY not set in environment; using fallback query: priorityIN1,2")
-        else:
-            st.info(f"Using SNOW_QUERY from environment: {query}")
+            st.caption("SNOW_QUERY not set in environment; using fallback query: priorityIN1,2")
 
+        views = dashboard_views(query)
+        view = st.sidebar.selectbox("View", list(views),
+                                    help="All views are fetched together; switching between them makes no API calls")
+        incremental = st.sidebar.checkbox("Incremental sync", value=True,
+                                          help="Only fetch records updated since the last sync")
+        headline_only = st.sidebar.checkbox("Headline KPIs only", value=False,
+                                            help="Fetch just the counts and fields the KPI tiles need")
+        if headline_only:
+            if st.sidebar.button("Refresh now"):
+                load_headline_kpis.clear()
+            try:
+                result, fetch_stats = load_headline_kpis(views[view])
+            except Exception as e:
+                st.error(f"Failed to fetch from ServiceNow: {str(e)}")
+                st.stop()
+            st.caption(f"Headline KPIs from {fetch_stats['requests']} requests · "
+                       f"{fetch_stats['body_bytes'] / 1024:,.0f} KiB · "
+                       f"fetched {(time.time() - fetch_stats['loaded_at']) / 60:.0f} min ago")
+            timings["load"] = time.perf_counter() - start
+            render_kpi_result(result)
+            timings["first_paint"] = timings["total"] = time.perf_counter() - start
+            render_diagnostics(diagnostics, timings)
+            return
+        background = st.sidebar.checkbox("Background refresh", value=True,
+                                         help="Serve the last snapshot instantly while it is refreshed in the background")
         try:
-            records = fetch_incidents(query=query)
-            st.info(f"Raw records from ServiceNow: {len(records)} records")
-
-            if records:
-                st.info(f"First record keys: {list(records[0].keys()) if records else 'No records'}")
-                st.info(f"Sample record: {records[0] if records else 'No records'}")
-
-            df = to_dataframe(records)
-            st.success(f"Fetched {len(df)} incidents from ServiceNow")
-
-            # Debug: Show what columns we actually have
-            st.info(f"Available columns: {list(df.columns)}")
-            st.info(f"DataFrame shape: {df.shape}")
+            batch_views = tuple(views.items())
+            if background:
+                df, version = load_snapshot(batch_views, incremental)
+            else:
+                if st.sidebar.button("Refresh now"):
+                    load_api_views.clear()
+                df, version, debug = load_api_views(batch_views, incremental)
+                age = time.time() - debug["loaded_at"]
+                st.caption(f"{len(df):,} incidents across all views from ServiceNow · synced {age / 60:.0f} min ago")
+            if version:
+                df = view_frame(version, view, df)
+                version = f"{version}:{view}"
+            else:
+                df = ViewBatch.from_frame(df).view(view)
 
             # Ensure required columns exist
             if 'opened_at' not in df.columns:
                 st.error("Missing 'opened_at' column after transformation")
-                st.info("Original columns from ServiceNow: " + str(list(records[0].keys()) if records else "No records"))
+                st.info("Original columns from ServiceNow: " + str(debug.get("record_keys") or "No records"))
                 st.stop()
 
         except Exception as e:
@@ -71,14 +386,21 @@ def main():
             uploaded = st.file_uploader("Upload ServiceNow CSV (incidents)", type=["csv"])
             if not uploaded:
                 st.stop()
-            df = pd.read_csv(uploaded)
-            df = transform_csv_data(df)
+            data = uploaded.getvalue()
+            digest = hashlib.sha256(data).hexdigest()
+            df = load_uploaded_frame(digest, data)
+            version = f"upload:{digest}"
+    timings["load"] = time.perf_counter() - start
 
-    # Normalise types if CSV path
-    if "opened_at" in df.columns and not pd.api.types.is_datetime64_any_dtype(df["opened_at"]):
-        for c in ["opened_at","resolved_at","closed_at"]:
-            if c in df.columns:
-                df[c] = pd.to_datetime(df[c], errors="coerce", utc=True)
+    local_filter = st.sidebar.text_input("Filter (encoded query)", value="",
+                                         help="e.g. priority=1^categoryINNetwork,Database; "
+                                              "applied to the loaded incidents without calling ServiceNow").strip()
+    if local_filter:
+        try:
+            df = filtered_frame(version, local_filter, df) if version else filter_frame(df, local_filter)
+            version = f"{version}:{local_filter}" if version else None
+        except UnsupportedQuery as e:
+            st.sidebar.warning(f"Filter not applied: {e}")
 
     # Final safety check - ensure we have required columns
     required_columns = ["opened_at", "is_major"]
@@ -88,48 +410,57 @@ def main():
         st.info(f"Available columns: {list(df.columns)}")
         st.stop()
 
+    if st.sidebar.checkbox("Compact memory mode", value=False,
+                           help="Categorical/Int8/Arrow-string columns; drops fields the dashboard never reads"):
+        if version:
+            df, mem_report = compact_cached(version, df)
+            version = f"{version}:compact"
+        else:
+            df, report = compact_frame(df)
+            mem_report = str(report)
+        st.sidebar.caption(f"Memory: {mem_report}")
+
+    if version:
+        stamp_frame(df, version)
+
+    if show_debug:
+        with st.expander("Debug", expanded=True):
+            st.write({"shape": df.shape, "columns": list(df.columns), "version": version,
+                      "unused_columns": [c for c in df.columns if c not in DASHBOARD_COLUMNS]})
+            if debug.get("sample_record") is not None:
+                st.write({"raw_records": debug["raw_records"], "record_keys": debug["record_keys"]})
+                st.json(debug["sample_record"], expanded=False)
+
     # KPIs
-    col1, col2, col3, col4 = st.columns(4)
-    col1.metric("MTTR (hrs)", f"{kpis.mttr_hours(df):.1f}")
-    wk = kpis.weekly_counts(df)
-    col2.metric("MIs (YTD)", int(df[df.get("is_major", True)].shape[0]))
-    col3.metric("P1 ratio", f"{kpis.p1_ratio(df)*100:.0f}%")
-    col4.metric("Sites impacted", kpis.sites_impacted(df))
+    mark = time.perf_counter()
+    render_kpis(df)
+    timings["kpis"] = time.perf_counter() - mark
+    timings["first_paint"] = time.perf_counter() - start
 
-    st.line_chart(wk.set_index("week")["mi_count"], height=280)
-    st.subheader("Incident details")
-    st.dataframe(df.head(500))
+    # Trends and drill-down read pre-aggregated buckets/cells rather than rescanning rows
+    fingerprint = frame_fingerprint(df, [*FINGERPRINT_COLUMNS, "location", "category"])
+    if "Trends" in sections:
+        mark = time.perf_counter()
+        render_trends(df, fingerprint)
+        timings["trends"] = time.perf_counter() - mark
+    if "Drill-down" in sections:
+        mark = time.perf_counter()
+        render_drilldown(df, fingerprint)
+        timings["drilldown"] = time.perf_counter() - mark
+    if "Incident details" in sections:
+        mark = time.perf_counter()
+        render_details(df)
+        timings["details"] = time.perf_counter() - mark
+
+    timings["total"] = time.perf_counter() - start
+    for stage, seconds in timings.items():
+        instrument.record(f"render.{stage}", seconds)
+    render_diagnostics(diagnostics, timings)
 
 def transform_csv_data(df: pd.DataFrame) -> pd.DataFrame:
     """Transform CSV data to match expected column names and format"""
-    # Rename columns to match expected format
-    column_mapping = {
-        'created_date': 'opened_at',
-        'resolved_date': 'resolved_at',
-        'u_resolved': 'resolved_at',
-        'sites_impacted': 'location',
-        'incident_number': 'number'
-    }
-
-    # Rename columns
-    for old_col, new_col in column_mapping.items():
-        if old_col in df.columns:
-            df = df.rename(columns={old_col: new_col})
-
-    # Convert priority to numeric and determine if major incident
-    if 'priority' in df.columns:
-        # Handle both string and numeric priority values
-        if df['priority'].dtype == 'object':
-            df['priority'] = df['priority'].str.replace('P', '').astype(int)
-        # Consider P1 and P2 as major incidents
-        df['is_major'] = df['priority'].isin([1, 2])
-
-    # Convert datetime columns - handle ServiceNow format
-    for col in ['opened_at', 'resolved_at', 'closed_at']:
-        if col in df.columns:
-            df[col] = pd.to_datetime(df[col], format="%Y-%m-%d %H:%M:%S", errors="coerce")
-
-    return df
+    # Same compiled field_map.yaml plan as the API path
+    return load_transform_plan().apply(df)
 
 if __name__ == "__main__":
     main()
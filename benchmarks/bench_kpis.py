@@ -0,0 +1,63 @@
+"""Compare the single-pass KPI engine against per-function major-incident filtering.
+
+Run from the repo root:  python -m benchmarks.bench_kpis [rows ...]
+"""
+from __future__ import annotations
+
+import sys
+import timeit
+
+import numpy as np
+import pandas as pd
+
+from src import kpis
+
+
+def make_frame(rows: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    opened = pd.Timestamp("2024-01-01", tz="UTC") + pd.to_timedelta(rng.integers(0, 365 * 86_400, rows), unit="s")
+    resolved = opened + pd.to_timedelta(rng.exponential(8 * 3_600, rows).astype("int64"), unit="s")
+    priority = rng.choice([1, 2, 3, 4, 5], rows, p=[0.05, 0.15, 0.3, 0.3, 0.2])
+    return pd.DataFrame({
+        "opened_at": opened,
+        "resolved_at": resolved,
+        "priority": priority,
+        "location": rng.integers(0, 2_000, rows).astype(str),
+        "is_major": np.isin(priority, [1, 2]),
+    })
+
+
+def legacy_kpis(df: pd.DataFrame) -> tuple:
+    """The pre-engine dashboard path: every KPI (and the MI tile) filters the frame itself."""
+    def mttr(df):
+        m = df[df["is_major"]]
+        v = m[(~m["opened_at"].isna()) & (~m["resolved_at"].isna())]
+        return float(((v["resolved_at"] - v["opened_at"]).dt.total_seconds() / 3600.0).mean())
+
+    def weekly(df):
+        m = df[df["is_major"]]
+        m = m.assign(week=m["opened_at"].dt.tz_localize(None).dt.to_period("W").dt.start_time)
+        return m.groupby("week", as_index=False).size()
+
+    def p1(df):
+        m = df[df["is_major"]]
+        return float((m["priority"] == 1).sum() / len(m))
+
+    def sites(df):
+        return int(df[df["is_major"] & df["location"].notna()]["location"].nunique())
+
+    return mttr(df), weekly(df), int(df[df["is_major"]].shape[0]), p1(df), sites(df)
+
+
+def main(sizes: list[int]) -> None:
+    print(f"{'rows':>10} {'legacy (ms)':>12} {'engine (ms)':>12} {'speedup':>8}")
+    for rows in sizes:
+        df = make_frame(rows)
+        repeat = 3
+        legacy = min(timeit.repeat(lambda df=df: legacy_kpis(df), number=1, repeat=repeat))
+        engine = min(timeit.repeat(lambda df=df: kpis.compute_kpis(df), number=1, repeat=repeat))
+        print(f"{rows:>10,} {legacy * 1e3:>12.1f} {engine * 1e3:>12.1f} {legacy / engine:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or [100_000, 1_000_000])
@@ -0,0 +1,53 @@
+"""Scaling of the sharded multi-process CSV path (src.parallel) from 1 to N cores.
+
+Writes a synthetic ServiceNow export, then times the single-process path
+(``pd.read_csv`` + ``to_dataframe`` + ``compute_kpis``) against ``process_csv``
+with 1, 2, 4, ... workers, with and without materialising the merged frame.
+
+Run from the repo root:  python -m benchmarks.bench_parallel [rows] [max_workers]
+"""
+from __future__ import annotations
+
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+from src.kpis import compute_kpis
+from src.parallel import process_csv
+from src.synthetic import generate_incidents
+from src.transforms import to_dataframe
+
+
+def _best(fn, repeat: int = 2) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(rows: int, max_workers: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "incidents.csv")
+        generate_incidents(rows).to_csv(path, index=False)
+        print(f"{rows:,} rows ({os.path.getsize(path) / 2**20:.0f} MiB CSV), {os.cpu_count()} CPUs; best of 2 (s)")
+
+        serial = _best(lambda: compute_kpis(to_dataframe(pd.read_csv(path, dtype=str))))
+        print(f"{'single process':<16} {serial:>8.2f}")
+        print(f"{'workers':<16} {'frame':>8} {'speedup':>8} {'kpis only':>10} {'speedup':>8}")
+        shard_rows = max(10_000, rows // (4 * max_workers))
+        workers = 1
+        while workers <= max_workers:
+            frame = _best(lambda workers=workers: process_csv(path, workers, shard_rows))
+            kpis_only = _best(lambda workers=workers: process_csv(path, workers, shard_rows, keep_frame=False))
+            print(f"{workers:<16} {frame:>8.2f} {serial / frame:>7.1f}x {kpis_only:>10.2f} {serial / kpis_only:>7.1f}x")
+            workers *= 2
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000,
+         int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count() or 1)
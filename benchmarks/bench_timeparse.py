@@ -0,0 +1,52 @@
+"""Microbenchmark: parse_timestamps vs the previous datetime parsing paths.
+
+Run from the repo root:  python -m benchmarks.bench_timeparse [rows]
+"""
+from __future__ import annotations
+
+import sys
+import timeit
+
+import numpy as np
+import pandas as pd
+
+from src.timeparse import parse_timestamps
+
+
+def datasets(rows: int, seed: int = 0) -> dict[str, pd.Series]:
+    rng = np.random.default_rng(seed)
+    ts = pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 365 * 86_400, rows), unit="s")
+    return {
+        "api, per-second": pd.Series(ts.strftime("%Y-%m-%d %H:%M:%S")),
+        "api, hourly (repeats)": pd.Series(ts.floor("h").strftime("%Y-%m-%d %H:%M:%S")),
+        "csv, dd/mm/yyyy": pd.Series(ts.strftime("%d/%m/%Y %H:%M:%S")),
+    }
+
+
+def old_api(s: pd.Series) -> pd.Series:
+    """Former to_dataframe: fixed ServiceNow format only."""
+    return pd.to_datetime(s, format="%Y-%m-%d %H:%M:%S", errors="coerce", utc=True)
+
+
+def old_csv(s: pd.Series) -> pd.Series:
+    """Former main() re-parse of CSV columns: format inference."""
+    return pd.to_datetime(s, errors="coerce", utc=True)
+
+
+def main(rows: int) -> None:
+    print(f"{rows:,} rows; best of 3 (ms), NaT count in brackets")
+    print(f"{'dataset':<24} {'old api':>16} {'old csv':>16} {'parse_timestamps':>18}")
+    for name, s in datasets(rows).items():
+        cells = []
+        for fn in (old_api, old_csv, parse_timestamps):
+            try:
+                nat = int(fn(s).isna().sum())
+                t = min(timeit.repeat(lambda fn=fn, s=s: fn(s), number=1, repeat=3))
+                cells.append(f"{t * 1e3:.0f} [{nat:,}]")
+            except (ValueError, TypeError) as e:
+                cells.append(f"error: {type(e).__name__}")
+        print(f"{name:<24} {cells[0]:>16} {cells[1]:>16} {cells[2]:>18}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
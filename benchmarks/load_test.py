@@ -0,0 +1,82 @@
+"""Load-test ``fetch_incidents`` against the local Table API stub.
+
+Run from the repo root:
+  python -m benchmarks.load_test --rows 50000 --concurrency 1 4 8 --latency-ms 80 --jitter-ms 40
+  python -m benchmarks.load_test --rate-limit 20 --error-rate 0.02   # backoff behaviour
+
+Reports, per concurrency level: wall time, rows/s, request latency percentiles
+as seen by the client, and how many retries 429s and injected 5xx cost.
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import time
+
+import numpy as np
+
+from src.snow_client import DEFAULT_FIELDS, SnowClient, fetch_incidents
+from src.snow_stub import SnowStub, StubConfig
+from src.synthetic import generate_incidents
+
+
+def run_once(stub: SnowStub, query: str, page_size: int, concurrency: int) -> dict[str, float]:
+    with SnowClient(base_url=stub.base_url, table=stub.table, pool_size=max(1, concurrency)) as client:
+        start = time.perf_counter()
+        rows = fetch_incidents(query, DEFAULT_FIELDS, page_size, use_saved_filter=False,
+                               concurrency=concurrency, client=client)
+        elapsed = time.perf_counter() - start
+        latencies = np.array(client.stats.latencies) * 1000
+        summary = client.stats.summary()
+    served = stub.stats()
+    pages = served["ok"]
+    return {
+        "concurrency": concurrency,
+        "rows": len(rows),
+        "seconds": elapsed,
+        "rows_per_s": len(rows) / elapsed if elapsed else 0.0,
+        "requests": summary["requests"],
+        "retries": summary["requests"] - pages,
+        "throttled": served["throttled"],
+        "errors": served["errors"],
+        "p50_ms": float(np.percentile(latencies, 50)) if latencies.size else 0.0,
+        "p95_ms": float(np.percentile(latencies, 95)) if latencies.size else 0.0,
+        "p99_ms": float(np.percentile(latencies, 99)) if latencies.size else 0.0,
+        "wire_mb": summary["wire_bytes"] / 1e6,
+    }
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Load-test fetch_incidents against the local Table API stub")
+    parser.add_argument("--rows", type=int, default=50_000)
+    parser.add_argument("--query", default="priorityIN1,2,3")
+    parser.add_argument("--page-size", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--jitter-ms", type=float, default=25.0)
+    parser.add_argument("--rate-limit", type=float, default=None, help="requests/second before 429s")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args(argv)
+
+    # The stub ignores auth, but SnowClient insists on credentials being configured
+    os.environ.setdefault("SNOW_USERNAME", "load-test")
+    os.environ.setdefault("SNOW_PASSWORD", "load-test")
+
+    data = generate_incidents(args.rows)
+    config = StubConfig(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, rate_limit=args.rate_limit,
+                        error_rate=args.error_rate, error_statuses=(503,))
+    print(f"{args.rows:,} rows, query {args.query!r}, page size {args.page_size}, "
+          f"latency {args.latency_ms:g}+{args.jitter_ms:g}ms, rate limit {args.rate_limit or '-'}/s, "
+          f"error rate {args.error_rate:g}")
+    print(f"{'conc':>4} {'rows':>8} {'secs':>7} {'rows/s':>9} {'reqs':>5} {'retry':>5} {'429':>4} {'5xx':>4} "
+          f"{'p50ms':>7} {'p95ms':>7} {'p99ms':>7} {'wireMB':>7}")
+    for concurrency in args.concurrency:
+        with SnowStub(data, config=config) as stub:
+            r = run_once(stub, args.query, args.page_size, concurrency)
+        print(f"{r['concurrency']:>4} {r['rows']:>8,} {r['seconds']:>7.2f} {r['rows_per_s']:>9,.0f} "
+              f"{r['requests']:>5} {r['retries']:>5} {r['throttled']:>4} {r['errors']:>4} "
+              f"{r['p50_ms']:>7.1f} {r['p95_ms']:>7.1f} {r['p99_ms']:>7.1f} {r['wire_mb']:>7.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""Stage-by-stage benchmark suite on synthetic incident data, with regression tracking.
+
+Run from the repo root:
+
+    python -m benchmarks.run                         # 10k and 100k rows
+    python -m benchmarks.run --sizes 10000 1000000   # custom sizes (up to ~10M)
+    python -m benchmarks.run --fail-on-regression    # exit 1 if a stage slowed down
+
+Each run is saved under benchmarks/results/ and compared with the previous run
+(or ``--baseline FILE``); stages slower than ``--threshold`` are reported.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import timeit
+from collections.abc import Callable
+from datetime import datetime, timezone
+
+import pandas as pd
+
+from src import kpis
+from src.csv_ingest import ingest_csv
+from src.synthetic import (
+    generate_incidents,
+    iter_pages,
+    to_records,
+    write_csv,
+    write_parquet,
+)
+from src.transforms import load_transform_plan, to_dataframe, to_dataframe_chunked
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+
+def transform_csv_data(df: pd.DataFrame) -> pd.DataFrame:
+    """The dashboard's CSV transform (app.main.transform_csv_data), without importing Streamlit."""
+    return load_transform_plan().apply(df)
+
+
+def _best(fn: Callable[[], object], repeat: int) -> float:
+    return min(timeit.repeat(fn, number=1, repeat=repeat))
+
+
+def run_size(rows: int, repeat: int, workdir: str) -> dict[str, float]:
+    raw = generate_incidents(rows)
+    records = to_records(raw)
+    pages = list(iter_pages(raw))  # pages as the API would deliver them
+    csv_path = write_csv(raw, os.path.join(workdir, f"incidents_{rows}.csv"))
+    write_parquet(raw, os.path.join(workdir, f"incidents_{rows}.parquet"))
+    frame = to_dataframe(records)
+
+    stages: dict[str, Callable[[], object]] = {
+        "to_dataframe": lambda: to_dataframe(records),
+        "to_dataframe_chunked": lambda: to_dataframe_chunked(pages),
+        "read_csv": lambda: pd.read_csv(csv_path),
+        "transform_csv_data": lambda: transform_csv_data(pd.read_csv(csv_path, dtype=str)),
+        "ingest_csv": lambda: ingest_csv(csv_path),
+        "kpi.mttr_hours": lambda: kpis.mttr_hours(frame),
+        "kpi.weekly_counts": lambda: kpis.weekly_counts(frame),
+        "kpi.p1_ratio": lambda: kpis.p1_ratio(frame),
+        "kpi.sites_impacted": lambda: kpis.sites_impacted(frame),
+        "kpi.compute_kpis": lambda: kpis.compute_kpis(frame),
+        # main()'s data path without Streamlit: load + normalise + every KPI tile
+        "main.api_path": lambda: kpis.compute_kpis(to_dataframe_chunked(pages)),
+        # KPIs are aggregated while the CSV streams in
+        "main.csv_path": lambda: ingest_csv(csv_path).kpis,
+    }
+    out = {}
+    for name, fn in stages.items():
+        out[name] = _best(fn, repeat)
+        print(f"  {name:<24} {out[name] * 1e3:>10.1f} ms", flush=True)
+    return out
+
+
+def latest_result() -> str | None:
+    if not os.path.isdir(RESULTS_DIR):
+        return None
+    files = sorted(f for f in os.listdir(RESULTS_DIR) if f.endswith(".json"))
+    return os.path.join(RESULTS_DIR, files[-1]) if files else None
+
+
+def compare(current: dict[str, dict[str, float]], baseline: dict[str, dict[str, float]],
+            threshold: float) -> list[str]:
+    """Stages that got slower than ``threshold`` (fractional) vs the baseline run."""
+    regressions = []
+    for size, stages in current.items():
+        for stage, seconds in stages.items():
+            before = baseline.get(size, {}).get(stage)
+            if before and seconds > before * (1 + threshold):
+                regressions.append(f"{stage} @ {size} rows: {before * 1e3:.1f} -> {seconds * 1e3:.1f} ms "
+                                   f"(+{seconds / before - 1:.0%})")
+    return regressions
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--baseline", help="results JSON to compare against (default: previous run)")
+    parser.add_argument("--threshold", type=float, default=0.2, help="slowdown that counts as a regression")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    parser.add_argument("--no-save", action="store_true")
+    args = parser.parse_args(argv)
+
+    baseline_path = args.baseline or latest_result()
+    results: dict[str, dict[str, float]] = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        for rows in args.sizes:
+            print(f"{rows:,} rows")
+            start = time.perf_counter()
+            results[str(rows)] = run_size(rows, args.repeat, workdir)
+            print(f"  (size took {time.perf_counter() - start:.1f} s)")
+
+    if not args.no_save:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        path = os.path.join(RESULTS_DIR, f"{stamp}.json")
+        with open(path, "w", encoding="utf-8") as fh:
+            json.dump({"python": platform.python_version(), "pandas": pd.__version__, "results": results}, fh, indent=2)
+        print(f"saved {path}")
+
+    if baseline_path:
+        with open(baseline_path, encoding="utf-8") as fh:
+            regressions = compare(results, json.load(fh)["results"], args.threshold)
+        print(f"compared with {baseline_path}: {len(regressions)} regression(s)")
+        for line in regressions:
+            print(f"  REGRESSION {line}")
+        if regressions and args.fail_on_regression:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
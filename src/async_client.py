@@ -0,0 +1,305 @@
+"""asyncio ServiceNow Table API client (httpx) with a shared request budget.
+
+Backoff and rate limiting are ``await``\\ ed rather than slept in the calling
+thread. Every request draws from the instance's process-wide token bucket
+(``src.rate_limit``), which the sync ``SnowClient`` shares, and a Retry-After
+pauses all callers. Backoff for other failures uses full jitter, so retries
+from many coroutines spread out instead of arriving together. Cancelling a
+fetch (e.g. ``asyncio.wait_for``) cancels its in-flight pages, and so does a
+page that fails for good.
+
+``fetch_many`` fetches several saved filters or tables at once within one
+budget. ``fetch_incidents`` is a sync facade with the same signature as
+``src.snow_client.fetch_incidents``. The sync facades run on one background
+event loop per process and reuse one client (and connection pool) per
+instance and table.
+
+Requires ``httpx`` (``pip install .[async]``).
+"""
+from __future__ import annotations
+
+import asyncio
+import random
+import threading
+import time
+from collections.abc import Awaitable, Coroutine, Iterable, Mapping
+from typing import TYPE_CHECKING, Any, TypeVar
+
+from src import instrument
+from src.rate_limit import TokenBucket, limiter_for
+from src.snow_client import (
+    DEFAULT_FIELDS,
+    MAX_RETRIES,
+    RETRY_STATUSES,
+    RequestStats,
+    SnowClient,
+    _get_auth_headers,
+    _get_credentials,
+    _get_snow_base,
+    _get_table,
+    delta_query,
+    get_saved_filter_query,
+    reconcile_members,
+)
+
+if TYPE_CHECKING:
+    import httpx
+
+    from src.store import IncidentStore
+
+T = TypeVar("T")
+
+SHARED_MAX_CONNECTIONS = 20
+
+
+async def _gather(aws: Iterable[Awaitable[T]]) -> list[T]:
+    """``asyncio.gather`` that cancels the other awaitables as soon as one fails."""
+    tasks = [asyncio.ensure_future(aw) for aw in aws]
+    try:
+        return list(await asyncio.gather(*tasks))
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+
+async def _backoff(attempt: int) -> None:
+    """Full-jitter exponential backoff: a random wait up to ``min(60, 2**attempt)`` seconds."""
+    wait = random.uniform(0, min(60, 2 ** attempt))
+    instrument.count("snow.backoff.sleep_seconds", wait)
+    await asyncio.sleep(wait)
+
+
+class AsyncSnowClient:
+    """Pooled async Table API client; use as ``async with AsyncSnowClient() as client``.
+
+    Args:
+        base_url: Table API root (defaults to one built from SNOW_INSTANCE).
+        table: Default table (defaults to SNOW_TABLE or ``incident``); ``fetch`` can override it.
+        max_connections: Connection pool size.
+        timeout: Per-request timeout in seconds.
+        limiter: Request budget; defaults to the process-wide bucket for the instance.
+    """
+
+    def __init__(self, base_url: str | None = None, table: str | None = None, max_connections: int = 10,
+                 timeout: float = 60, limiter: TokenBucket | None = None) -> None:
+        try:
+            import httpx
+        except ImportError as e:  # pragma: no cover - depends on the environment
+            raise ImportError("AsyncSnowClient needs httpx: pip install 'httpx>=0.25'") from e
+        self.base_url = (base_url or _get_snow_base()).rstrip("/")
+        self.table = table or _get_table()
+        self.stats = RequestStats()
+        self.limiter = limiter or limiter_for(self.base_url)
+
+        headers = _get_auth_headers()
+        headers["Accept-Encoding"] = "gzip, deflate"
+        creds = _get_credentials()
+        auth = (creds["username"], creds["password"]) if creds["username"] and creds["password"] else None
+        self._http = httpx.AsyncClient(
+            headers=headers, auth=auth, timeout=timeout,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections))
+
+    def table_url(self, table: str | None = None) -> str:
+        return f"{self.base_url}/{table or self.table}"
+
+    async def get(self, url: str, params: dict[str, str] | None = None) -> httpx.Response:
+        """GET through the pool, recording latency and payload size like ``SnowClient.get``."""
+        start = time.perf_counter()
+        resp = await self._http.get(url, params=params)
+        body = len(resp.content)
+        wire = resp.num_bytes_downloaded or body
+        latency = time.perf_counter() - start
+        self.stats.record(latency, body, wire, resp.status_code)
+        if instrument.enabled():
+            instrument.count("snow.requests")
+            instrument.count("snow.body_bytes", body)
+            instrument.count("snow.wire_bytes", wire)
+            instrument.record("snow.request", latency, status=resp.status_code,
+                              offset=(params or {}).get("sysparm_offset"), wire_bytes=wire)
+        return resp
+
+    async def get_page(self, params: dict[str, str],
+                       table: str | None = None) -> tuple[list[dict[str, Any]], int | None]:
+        """One page with retries; returns the rows and X-Total-Count (if sent)."""
+        import httpx
+
+        url = self.table_url(table)
+        for attempt in range(1, MAX_RETRIES + 1):
+            if attempt > 1:
+                instrument.count("snow.retries")
+            await self.limiter.acquire_async()
+            try:
+                resp = await self.get(url, params)
+            except httpx.TransportError:
+                if attempt >= MAX_RETRIES:
+                    raise
+                await _backoff(attempt)
+                continue
+            if resp.status_code == 401:
+                raise Exception("Authentication failed (401). Check SNOW creds/roles.")
+            if resp.status_code in RETRY_STATUSES and attempt < MAX_RETRIES:
+                instrument.count(f"snow.retry_status.{resp.status_code}")
+                retry_after = resp.headers.get("Retry-After", "")
+                if retry_after.isdigit():
+                    self.limiter.pause(int(retry_after))  # honoured by the next acquire, for every caller
+                else:
+                    await _backoff(attempt)
+                continue
+            resp.raise_for_status()
+            total = resp.headers.get("X-Total-Count", "")
+            return resp.json().get("result", []), int(total) if total.isdigit() else None
+        raise RuntimeError("unreachable")  # pragma: no cover
+
+    async def fetch(self, query: str, fields: list[str] | None = None, page_size: int = 500,
+                    concurrency: int = 4, table: str | None = None) -> list[dict[str, Any]]:
+        """All rows for ``query`` in offset order, up to ``concurrency`` pages in flight."""
+        fields = fields or DEFAULT_FIELDS
+
+        def params(offset: int) -> dict[str, str]:
+            return {
+                "sysparm_query": query,
+                "sysparm_display_value": "false",
+                "sysparm_exclude_reference_link": "true",
+                "sysparm_fields": ",".join(fields),
+                "sysparm_limit": str(page_size),
+                "sysparm_offset": str(offset),
+            }
+
+        with instrument.span("snow.fetch_async", table=table or self.table) as fetch_span:
+            rows, total = await self.get_page(params(0), table)
+            chunk = rows
+            offset = page_size
+            if len(chunk) == page_size and total is not None and total > offset:
+                slots = asyncio.Semaphore(max(1, concurrency))
+
+                async def page(off: int) -> list[dict[str, Any]]:
+                    async with slots:
+                        return (await self.get_page(params(off), table))[0]
+
+                pages = await _gather(page(off) for off in range(offset, total, page_size))
+                for chunk in pages:
+                    rows.extend(chunk)
+                offset = max(offset, -(-total // page_size) * page_size)
+            # Records added after the count was taken: walk the tail sequentially
+            while len(chunk) == page_size:
+                chunk, _ = await self.get_page(params(offset), table)
+                rows.extend(chunk)
+                offset += page_size
+            fetch_span.set(rows=len(rows))
+        return rows
+
+    async def fetch_many(self, queries: Mapping[str, str | tuple[str, str]], fields: list[str] | None = None,
+                         page_size: int = 500, concurrency: int = 4) -> dict[str, list[dict[str, Any]]]:
+        """Fetch several queries at once; values are encoded queries or ``(table, query)`` pairs.
+
+        Each query gets up to ``concurrency`` pages in flight; all of them share the
+        connection pool and the instance's request budget.
+        """
+        names = list(queries)
+        jobs = []
+        for name in names:
+            spec = queries[name]
+            table, query = spec if isinstance(spec, tuple) else (None, spec)
+            jobs.append(self.fetch(query, fields, page_size, concurrency, table))
+        return dict(zip(names, await _gather(jobs)))
+
+    async def aclose(self) -> None:
+        await self._http.aclose()
+
+    async def __aenter__(self) -> AsyncSnowClient:
+        return self
+
+    async def __aexit__(self, *exc: object) -> None:
+        await self.aclose()
+
+
+_loop: asyncio.AbstractEventLoop | None = None
+_clients: dict[tuple[str, str], AsyncSnowClient] = {}
+_shared_lock = threading.Lock()
+
+
+def _shared_loop() -> asyncio.AbstractEventLoop:
+    """The event loop the sync facades run on, on a daemon thread started on first use."""
+    global _loop
+    with _shared_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="snow-async", daemon=True).start()
+        return _loop
+
+
+def shared_client(base_url: str | None = None, table: str | None = None) -> AsyncSnowClient:
+    """The process-wide client for an instance and table; only use it on ``run``'s loop."""
+    key = ((base_url or _get_snow_base()).rstrip("/"), table or _get_table())
+    with _shared_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = _clients[key] = AsyncSnowClient(*key, max_connections=SHARED_MAX_CONNECTIONS)
+    return client
+
+
+def run(coro: Coroutine[Any, Any, T]) -> T:
+    """Run ``coro`` to completion from sync code on the shared background loop.
+
+    Only the calling thread waits. If the wait is interrupted the coroutine is cancelled.
+    """
+    loop = _shared_loop()
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if running is loop:
+        coro.close()
+        raise RuntimeError("run() was called on the shared loop itself; await the coroutine instead")
+    future = asyncio.run_coroutine_threadsafe(coro, loop)
+    try:
+        return future.result()
+    except BaseException:
+        future.cancel()
+        raise
+
+
+def fetch_many(queries: Mapping[str, str | tuple[str, str]], fields: list[str] | None = None,
+               page_size: int = 500, concurrency: int = 4,
+               client: SnowClient | None = None) -> dict[str, list[dict[str, Any]]]:
+    """Sync facade for ``AsyncSnowClient.fetch_many`` (``client`` supplies the instance and table)."""
+    async_client = shared_client(client.base_url if client else None, client.table if client else None)
+    return run(async_client.fetch_many(queries, fields, page_size, concurrency))
+
+
+def fetch_incidents(query: str | None = None, fields: list[str] | None = None, page_size: int = 500,
+                    use_saved_filter: bool = True, concurrency: int = 1,
+                    client: SnowClient | None = None,
+                    store: IncidentStore | None = None,
+                    slice_rows: int | None = None) -> list[dict[str, Any]]:
+    """``src.snow_client.fetch_incidents`` on the asyncio client.
+
+    Same arguments and result. ``client`` is only used for its instance URL and
+    table, and ``store`` does an incremental delta sync as in the sync version,
+    reconciling the stored members every ``RECONCILE_SECONDS``.
+    ``slice_rows`` hands date-bounded queries to the (thread-based)
+    ``src.time_slices`` fetcher, which has its own checkpoints and retries.
+    """
+    if query is None and use_saved_filter:
+        query = get_saved_filter_query("PYTHON: MAJOR IM")
+    query = query or ""
+    fields = fields or DEFAULT_FIELDS
+    if slice_rows and query:
+        from src.snow_client import fetch_incidents as fetch_sync
+
+        return fetch_sync(query, fields, page_size, False, concurrency, client, store, slice_rows)
+    if store is None:
+        return fetch_many({"": query}, fields, page_size, concurrency, client)[""]
+
+    def fetch(q: str, f: list[str]) -> list[dict[str, Any]]:
+        return fetch_many({"": q}, f, page_size, concurrency, client)[""]
+
+    # As in snow_client._sync_incidents, including the periodic key-only reconcile
+    fields = list(dict.fromkeys([*fields, "sys_id", "sys_updated_on"]))
+    full_sync = store.high_water_mark(query) is None
+    changed = fetch(delta_query(store, query), fields)
+    store.upsert(query, changed)
+    reconcile_members(store, query, page_size, concurrency, client, changed if full_sync else None, fetch)
+    return store.records(query)
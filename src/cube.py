@@ -0,0 +1,172 @@
+from __future__ import annotations
+
+from collections.abc import Iterable
+from datetime import date
+from functools import reduce
+from operator import or_
+
+import numpy as np
+import pandas as pd
+
+from src.kpis import _NAT, _NS_PER_DAY, KpiResult, _as_ns
+
+CUBE_DIMENSIONS = ["week", "priority", "location", "category"]
+MEASURES = ["incidents", "resolved", "resolve_seconds", "p1"]
+
+
+def _dimension(df: pd.DataFrame, col: str) -> pd.Series:
+    """One cube dimension as a plain column: Monday week start, -1 for unknown priority, "" for missing text."""
+    if col == "week":
+        opened = _as_ns(df["opened_at"])
+        days = opened // _NS_PER_DAY
+        weeks = ((days - (days + 3) % 7) * _NS_PER_DAY).astype("datetime64[ns]")
+        weeks[opened == _NAT] = np.datetime64("NaT")
+        return pd.Series(weeks, index=df.index)
+    s = df[col]
+    if col == "priority" or pd.api.types.is_numeric_dtype(s):
+        return pd.to_numeric(s, errors="coerce").fillna(-1).astype(np.int64)
+    s = s.astype(object)
+    return s.where(s.notna(), "").astype(str)
+
+
+class KpiCube:
+    """Pre-aggregated incident measures keyed by dimension tuples, for drill-down and roll-up.
+
+    Built once per data load: one cell per distinct (week, priority, location,
+    category, is_major) combination holding additive measures (incident and
+    resolved counts, summed resolution seconds, P1 count) plus a bitset of the
+    sites the cell's incidents touched. Slices and roll-ups sum cells and OR the
+    bitsets, so distinct-site counts stay exact across merged cells without
+    going back to the incident rows.
+    """
+
+    def __init__(self, cells: pd.DataFrame, dimensions: list[str], sites: pd.Index) -> None:
+        self.cells = cells
+        self.dimensions = dimensions
+        self.sites = sites
+
+    @classmethod
+    def build(cls, df: pd.DataFrame, dimensions: Iterable[str] | None = None,
+              site_col: str = "location") -> KpiCube:
+        """Aggregate a normalised incident frame; dimensions missing from ``df`` are skipped."""
+        dims = [d for d in (dimensions or CUBE_DIMENSIONS) if d == "week" or d in df.columns]
+        if "week" in dims and "opened_at" not in df.columns:
+            dims.remove("week")
+        dims.append("is_major")
+
+        rows = pd.DataFrame({d: _dimension(df, d) for d in dims if d != "is_major"}, index=df.index)
+        rows["is_major"] = df["is_major"].to_numpy(dtype=bool, na_value=False) if "is_major" in df.columns else False
+
+        if "resolved_at" in df.columns and "opened_at" in df.columns:
+            opened, resolved = _as_ns(df["opened_at"]), _as_ns(df["resolved_at"])
+            done = (opened != _NAT) & (resolved != _NAT)
+            rows["resolved"] = done.astype(np.int64)
+            rows["resolve_seconds"] = np.where(done, (resolved - opened) / 1e9, 0.0)
+        else:
+            rows["resolved"] = 0
+            rows["resolve_seconds"] = 0.0
+        if "priority" in df.columns:
+            rows["p1"] = df["priority"].eq(1).to_numpy(dtype=bool, na_value=False).astype(np.int64)
+        else:
+            rows["p1"] = 0
+
+        if site_col in df.columns:
+            site_codes, sites = pd.factorize(df[site_col], use_na_sentinel=True)
+        else:
+            site_codes, sites = np.full(len(df), -1), pd.Index([])
+        rows["_site"] = site_codes
+
+        grouped = rows.groupby(dims, dropna=False, sort=True)
+        cells = pd.DataFrame({
+            "incidents": grouped.size(),
+            "resolved": grouped["resolved"].sum(),
+            "resolve_seconds": grouped["resolve_seconds"].sum(),
+            "p1": grouped["p1"].sum(),
+        })
+        # Site bitsets: OR of 1 << site code over the distinct (cell, site) pairs
+        pairs = rows.loc[rows["_site"] >= 0, [*dims, "_site"]].drop_duplicates()
+        bits = pairs.groupby(dims, dropna=False, sort=True)["_site"].agg(
+            lambda codes: reduce(or_, (1 << int(c) for c in codes), 0))
+        cells["sites"] = bits.reindex(cells.index).fillna(0).astype(object).map(int)
+        return cls(cells.reset_index(), dims, pd.Index(sites))
+
+    def __len__(self) -> int:
+        return len(self.cells)
+
+    def slice(self, **filters: object) -> KpiCube:
+        """Sub-cube for ``dimension=value`` filters (a scalar, a collection, or a ``slice`` range)."""
+        mask = np.ones(len(self.cells), dtype=bool)
+        for dim, value in filters.items():
+            if dim not in self.dimensions:
+                raise KeyError(f"Unknown cube dimension {dim!r}; have {self.dimensions}")
+            col = self.cells[dim]
+            if isinstance(value, slice):
+                start, stop = value.start, value.stop
+                if dim == "week":
+                    start, stop = _naive_utc(start), _naive_utc(stop)
+                if start is not None:
+                    mask &= (col >= start).to_numpy()
+                if stop is not None:
+                    mask &= (col < stop).to_numpy()
+            elif isinstance(value, (list, tuple, set, frozenset, pd.Index, np.ndarray)):
+                mask &= col.isin(list(value)).to_numpy()
+            else:
+                mask &= (col == value).to_numpy()
+        return KpiCube(self.cells[mask], self.dimensions, self.sites)
+
+    def rollup(self, by: str | list[str] | None = None, major_only: bool = True) -> pd.DataFrame:
+        """KPIs per group of ``by`` dimensions (the grand total when ``by`` is empty).
+
+        Columns: the ``by`` dimensions, ``incidents``, ``mttr_hours``, ``p1_ratio``
+        and ``sites_impacted``, with the same definitions as ``src.kpis``.
+        """
+        by = [by] if isinstance(by, str) else list(by or [])
+        cells = self.cells[self.cells["is_major"]] if major_only else self.cells
+        if by:
+            grouped = cells.groupby(by, dropna=False, sort=True)
+            sums = grouped[MEASURES].sum()
+            sites = grouped["sites"].agg(lambda s: reduce(or_, s, 0))
+        else:
+            sums = cells[MEASURES].sum().to_frame().T
+            sites = pd.Series([reduce(or_, cells["sites"], 0)], index=sums.index)
+        out = pd.DataFrame({
+            "incidents": sums["incidents"].astype(np.int64),
+            "mttr_hours": _ratio(sums["resolve_seconds"], sums["resolved"]) / 3600,
+            "p1_ratio": _ratio(sums["p1"], sums["incidents"]),
+            "sites_impacted": sites.map(lambda bits: bin(bits).count("1")).astype(np.int64),
+        }, index=sums.index)
+        return out.reset_index() if by else out.reset_index(drop=True)
+
+    def kpis(self, **filters: object) -> KpiResult:
+        """Headline KPIs for a slice, matching ``compute_kpis`` on the filtered incidents."""
+        cube = self.slice(**filters) if filters else self
+        total = cube.rollup().iloc[0]
+        if "week" in cube.dimensions:
+            majors = cube.cells[cube.cells["is_major"] & cube.cells["week"].notna()]
+            per_week = majors.groupby("week", sort=True)["incidents"].sum()
+            weekly = pd.DataFrame({"week": per_week.index.to_numpy(dtype="datetime64[ns]"),
+                                   "mi_count": per_week.to_numpy(dtype=np.int64)})
+        else:
+            weekly = pd.DataFrame({"week": pd.Series(dtype="datetime64[ns]"), "mi_count": pd.Series(dtype=np.int64)})
+        count = int(total["incidents"])
+        return KpiResult(
+            mttr_hours=0.0 if np.isnan(total["mttr_hours"]) else float(total["mttr_hours"]),
+            mi_count=count,
+            p1_ratio=0.0 if not count else float(total["p1_ratio"]),
+            sites_impacted=int(total["sites_impacted"]),
+            weekly=weekly,
+        )
+
+
+def _naive_utc(value: str | date | None) -> pd.Timestamp | None:
+    """Week bounds compare against naive UTC week starts."""
+    if value is None:
+        return None
+    ts = pd.Timestamp(value)
+    return ts.tz_convert("UTC").tz_localize(None) if ts.tzinfo is not None else ts
+
+
+def _ratio(numerator: pd.Series, denominator: pd.Series) -> pd.Series:
+    numerator = numerator.astype("float64")
+    denominator = denominator.astype("float64")
+    return numerator / denominator.where(denominator > 0)
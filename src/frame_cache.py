@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import time
+from collections.abc import Callable
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+from src.transforms import compact_dtypes
+
+DEFAULT_CACHE_DIR = os.path.join("data", "cache")
+
+_CREATED_KEY = b"mi_dashboard.created_at"
+
+
+def file_fingerprint(path: str | os.PathLike[str]) -> str:
+    """Cheap change detector for a source file: modification time + size."""
+    st = os.stat(path)
+    return f"{st.st_mtime_ns}:{st.st_size}"
+
+
+def cache_key(query: str, fields: list[str] | None, fingerprint: str | None) -> str:
+    """Stable key for a normalised frame built from ``query``/``fields`` at ``fingerprint``.
+
+    ``fingerprint`` identifies the source version, e.g. ``file_fingerprint(path)`` for
+    CSVs or ``IncidentStore.version`` for API syncs.
+    """
+    payload = json.dumps([query, list(fields or []), fingerprint or ""])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+
+class FrameCache:
+    """On-disk Feather cache of normalised incident frames.
+
+    Files are written uncompressed so warm loads memory-map them straight into
+    Arrow buffers with no string or datetime parsing. Entries expire after
+    ``ttl_seconds`` and the least recently used ones are evicted once the cache
+    grows past ``max_bytes``.
+    """
+
+    def __init__(self, directory: str | os.PathLike[str] = DEFAULT_CACHE_DIR, ttl_seconds: float = 24 * 3600,
+                 max_bytes: int = 512 * 1024 * 1024) -> None:
+        self.directory = os.fspath(directory)
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.feather")
+
+    def get(self, key: str) -> pd.DataFrame | None:
+        """Cached frame for ``key``, or None if missing or expired."""
+        path = self._path(key)
+        try:
+            table = feather.read_table(path, memory_map=True)
+        except (FileNotFoundError, pa.ArrowInvalid):
+            return None
+        created = float((table.schema.metadata or {}).get(_CREATED_KEY, b"0"))
+        if time.time() - created > self.ttl_seconds:
+            self._remove(path)
+            return None
+        os.utime(path)  # mtime doubles as the LRU clock
+        # Keep text columns Arrow-backed instead of materialising Python str objects
+        return table.to_pandas(types_mapper={pa.string(): pd.StringDtype("pyarrow")}.get)
+
+    def put(self, key: str, df: pd.DataFrame) -> pd.DataFrame:
+        """Store ``df`` (coerced to compact dtypes) and return the stored frame."""
+        df = compact_dtypes(df)
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}), _CREATED_KEY: str(time.time()).encode()})
+        path = self._path(key)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        feather.write_feather(table, tmp, compression="uncompressed")
+        os.replace(tmp, path)  # readers never see a half-written file
+        self._evict()
+        return df
+
+    def get_or_build(self, key: str, build: Callable[[], pd.DataFrame]) -> pd.DataFrame:
+        """Return the cached frame for ``key``, building and storing it on a miss."""
+        df = self.get(key)
+        if df is None:
+            df = self.put(key, build())
+        return df
+
+    def clear(self) -> None:
+        for name in os.listdir(self.directory):
+            if name.endswith(".feather"):
+                self._remove(os.path.join(self.directory, name))
+
+    def _evict(self) -> None:
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".feather"):
+                path = os.path.join(self.directory, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+
+    @staticmethod
+    def _remove(path: str) -> None:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,257 @@
+"""Lightweight timing spans, counters and opt-in profiling for the hot paths.
+
+Disabled by default: ``span`` then hands back a shared no-op context manager and
+``count``/``record`` return after one attribute check, so the hooks left in
+fetch/transform/KPI code cost next to nothing. Enable with ``MI_INSTRUMENT=1``
+(or ``enable()``). When enabled every span is aggregated (count/total/max) and
+logged as one JSON line on the ``mi_dashboard.perf`` logger at INFO; unless
+logging is already configured, enabling sends those lines to stderr.
+``export_json`` and ``export_prometheus`` expose the aggregates.
+
+Profiling is separate and per request: with ``MI_PROFILE=cprofile`` (or
+``pyinstrument``, if installed) ``profile(name)`` writes one dump per call to
+``MI_PROFILE_DIR`` (default ``data/profiles``).
+"""
+from __future__ import annotations
+
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from typing import Any, TypeVar
+
+logger = logging.getLogger("mi_dashboard.perf")
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+
+class _State:
+    def __init__(self) -> None:
+        self.enabled = os.getenv("MI_INSTRUMENT", "").lower() in ("1", "true", "yes", "on")
+        self.lock = threading.Lock()
+        self.spans: dict[str, list[float]] = {}  # name -> [count, total_s, max_s]
+        self.counters: dict[str, float] = {}
+
+
+def _configure_logger() -> None:
+    """Let the span lines through: INFO level, and a stderr handler if nothing would print them."""
+    if logger.level == logging.NOTSET:
+        logger.setLevel(logging.INFO)
+    if not logger.hasHandlers():
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+
+
+_state = _State()
+if _state.enabled:
+    _configure_logger()
+
+
+def enable(on: bool = True) -> None:
+    _state.enabled = on
+    if on:
+        _configure_logger()
+
+
+def enabled() -> bool:
+    return _state.enabled
+
+
+def reset() -> None:
+    with _state.lock:
+        _state.spans.clear()
+        _state.counters.clear()
+
+
+def record(name: str, seconds: float, **attrs: object) -> None:
+    """Add an already-measured duration to span ``name``."""
+    if not _state.enabled:
+        return
+    with _state.lock:
+        agg = _state.spans.get(name)
+        if agg is None:
+            _state.spans[name] = [1, seconds, seconds]
+        else:
+            agg[0] += 1
+            agg[1] += seconds
+            agg[2] = max(agg[2], seconds)
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(json.dumps({"span": name, "ms": round(seconds * 1000, 3), "ts": time.time(), **attrs},
+                               default=str))
+
+
+def count(name: str, value: float = 1) -> None:
+    """Increment counter ``name``."""
+    if not _state.enabled:
+        return
+    with _state.lock:
+        _state.counters[name] = _state.counters.get(name, 0) + value
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self) -> _NoopSpan:
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        pass
+
+    def set(self, **attrs: object) -> None:
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+class _Span:
+    __slots__ = ("name", "attrs", "start")
+
+    def __init__(self, name: str, attrs: dict[str, object]) -> None:
+        self.name = name
+        self.attrs = attrs
+
+    def __enter__(self) -> _Span:
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type: object, *exc: object) -> None:
+        if exc_type is not None:
+            self.attrs["error"] = getattr(exc_type, "__name__", str(exc_type))
+        record(self.name, time.perf_counter() - self.start, **self.attrs)
+
+    def set(self, **attrs: object) -> None:
+        """Attach attributes (e.g. rows or bytes) that go into the span's log line."""
+        self.attrs.update(attrs)
+
+
+def span(name: str, **attrs: object) -> _Span | _NoopSpan:
+    """Context manager timing a block as span ``name`` (a shared no-op when disabled).
+
+    ``with span(...) as s: s.set(rows=n)`` attaches attributes to the log line.
+    """
+    if not _state.enabled:
+        return _NOOP
+    return _Span(name, attrs)
+
+
+def timed(name: str) -> Callable[[F], F]:
+    """Decorator form of ``span``."""
+    def wrap(fn: F) -> F:
+        @functools.wraps(fn)
+        def inner(*args: Any, **kwargs: Any) -> Any:
+            if not _state.enabled:
+                return fn(*args, **kwargs)
+            with _Span(name, {}):
+                return fn(*args, **kwargs)
+        return inner  # type: ignore[return-value]
+    return wrap
+
+
+def sleep(seconds: float, reason: str) -> None:
+    """``time.sleep`` that is also counted as ``<reason>.sleep_seconds``."""
+    if seconds > 0:
+        count(f"{reason}.sleep_seconds", seconds)
+        time.sleep(seconds)
+
+
+# -- export -------------------------------------------------------------------
+def export_json() -> dict[str, Any]:
+    with _state.lock:
+        spans = {name: {"count": int(c), "total_s": total, "mean_ms": total / c * 1000 if c else 0.0,
+                        "max_ms": peak * 1000} for name, (c, total, peak) in sorted(_state.spans.items())}
+        counters = dict(sorted(_state.counters.items()))
+    return {"enabled": _state.enabled, "spans": spans, "counters": counters}
+
+
+def _label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"')
+
+
+def export_prometheus() -> str:
+    """Prometheus text exposition of the span aggregates and counters."""
+    data = export_json()
+    lines = [
+        "# TYPE mi_span_seconds_total counter",
+        *(f'mi_span_seconds_total{{span="{_label(n)}"}} {s["total_s"]:.6f}' for n, s in data["spans"].items()),
+        "# TYPE mi_span_count_total counter",
+        *(f'mi_span_count_total{{span="{_label(n)}"}} {s["count"]}' for n, s in data["spans"].items()),
+        "# TYPE mi_span_max_seconds gauge",
+        *(f'mi_span_max_seconds{{span="{_label(n)}"}} {s["max_ms"] / 1000:.6f}' for n, s in data["spans"].items()),
+        "# TYPE mi_counter_total counter",
+        *(f'mi_counter_total{{name="{_label(n)}"}} {v:g}' for n, v in data["counters"].items()),
+    ]
+    return "\n".join(lines) + "\n"
+
+
+def serve_metrics(port: int, host: str = "127.0.0.1") -> threading.Thread:
+    """Serve ``export_prometheus()`` at ``/metrics`` on a daemon thread.
+
+    The endpoint has no authentication, so it listens on loopback unless
+    ``host`` says otherwise (e.g. a private network that a scraper reaches).
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format: str, *args: object) -> None:
+            pass
+
+        def do_GET(self) -> None:
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = export_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    thread = threading.Thread(target=server.serve_forever, name="metrics", daemon=True)
+    thread.start()
+    return thread
+
+
+# -- profiling ----------------------------------------------------------------
+@contextmanager
+def profile(name: str) -> Iterator[str | None]:
+    """Profile the block if ``MI_PROFILE`` is set; yields the dump path (None when off)."""
+    mode = os.getenv("MI_PROFILE", "").lower()
+    if mode not in ("cprofile", "pyinstrument"):
+        yield None
+        return
+    directory = os.getenv("MI_PROFILE_DIR", os.path.join("data", "profiles"))
+    os.makedirs(directory, exist_ok=True)
+    stem = os.path.join(directory, f"{name}-{time.strftime('%Y%m%dT%H%M%S')}-{time.perf_counter_ns() % 10**6:06d}")
+
+    if mode == "pyinstrument":
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            mode = "cprofile"
+        else:
+            profiler = Profiler()
+            profiler.start()
+            try:
+                yield f"{stem}.html"
+            finally:
+                profiler.stop()
+                with open(f"{stem}.html", "w", encoding="utf-8") as fh:
+                    fh.write(profiler.output_html())
+            return
+
+    import cProfile
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield f"{stem}.prof"
+    finally:
+        profiler.disable()
+        profiler.dump_stats(f"{stem}.prof")
@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+import hashlib
+import threading
+import weakref
+from collections import OrderedDict
+from collections.abc import Hashable
+
+import numpy as np
+import pandas as pd
+
+from src.kpis import KpiResult, compute_kpis
+
+FINGERPRINT_COLUMNS = ["is_major", "opened_at", "resolved_at", "priority"]
+
+# id(frame) -> (weakref to frame, loader version); entries vanish with the frame
+_stamps: dict[int, tuple[weakref.ref, str]] = {}
+_stamps_lock = threading.Lock()
+
+
+def stamp_frame(df: pd.DataFrame, version: str) -> pd.DataFrame:
+    """Tag ``df`` with a loader-supplied version so fingerprinting is O(1).
+
+    The stamp belongs to this exact object: derived frames (filters, copies) are
+    fingerprinted by content. Do not mutate ``df`` in place after stamping it.
+    """
+    key = id(df)
+
+    def _forget(_ref: weakref.ref, key: int = key) -> None:
+        with _stamps_lock:
+            _stamps.pop(key, None)
+
+    with _stamps_lock:
+        _stamps[key] = (weakref.ref(df, _forget), version)
+    return df
+
+
+def _hash_column(h: hashlib.blake2b, s: pd.Series) -> None:
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        h.update(np.ascontiguousarray(s.cat.codes.to_numpy()).tobytes())
+        h.update(pd.util.hash_array(s.cat.categories.to_numpy()).tobytes())
+        return
+    values = s.values
+    if isinstance(values, np.ndarray) and values.dtype.kind in "biufmM":
+        h.update(np.ascontiguousarray(values).view(np.uint8).tobytes())
+    else:
+        # object/extension columns: slower, but still exact
+        h.update(pd.util.hash_pandas_object(s, index=False).to_numpy().tobytes())
+
+
+def frame_fingerprint(df: pd.DataFrame, columns: list[str] | None = None) -> str:
+    """Cheap content identity for a frame: loader stamp if present, else row count + column hash."""
+    with _stamps_lock:
+        entry = _stamps.get(id(df))
+    if entry is not None and entry[0]() is df:
+        return f"v:{entry[1]}"
+
+    cols = [c for c in (columns or FINGERPRINT_COLUMNS) if c in df.columns]
+    h = hashlib.blake2b(digest_size=16)
+    for col in cols:
+        h.update(f"{col}:{df[col].dtype}".encode())
+        _hash_column(h, df[col])
+    return f"h:{len(df)}:{h.hexdigest()}"
+
+
+class KpiCache:
+    """Bounded LRU memo of ``compute_kpis`` results keyed by frame fingerprint + parameters."""
+
+    def __init__(self, maxsize: int = 32) -> None:
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[Hashable, KpiResult] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(df: pd.DataFrame, site_col: str) -> Hashable:
+        return frame_fingerprint(df, [*FINGERPRINT_COLUMNS, site_col]), site_col
+
+    def get_or_compute(self, df: pd.DataFrame, site_col: str = "location") -> KpiResult:
+        key = self._key(df, site_col)
+        with self._lock:
+            result = self._entries.get(key)
+            if result is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return result
+            self.misses += 1
+
+        result = compute_kpis(df, site_col)
+        self._store(key, result)
+        return result
+
+    def put(self, df: pd.DataFrame, result: KpiResult, site_col: str = "location") -> None:
+        """Record KPIs for ``df`` that were computed elsewhere (e.g. while streaming it in)."""
+        self._store(self._key(df, site_col), result)
+
+    def _store(self, key: Hashable, result: KpiResult) -> None:
+        with self._lock:
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._entries), "maxsize": self.maxsize}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+
+_default_cache = KpiCache()
+
+
+def cached_compute_kpis(df: pd.DataFrame, site_col: str = "location") -> KpiResult:
+    """``compute_kpis`` through the process-wide KPI cache."""
+    return _default_cache.get_or_compute(df, site_col)
+
+
+def prime_kpis(df: pd.DataFrame, result: KpiResult, site_col: str = "location") -> None:
+    """Seed the process-wide KPI cache with ``result`` for ``df``.
+
+    This does not stamp ``df``. Callers pass a frame already tagged by
+    ``stamp_frame`` so later lookups are O(1); an unstamped frame is keyed by a
+    hash of its contents.
+    """
+    _default_cache.put(df, result, site_col)
+
+
+def kpi_cache_stats() -> dict[str, int]:
+    return _default_cache.stats()
@@ -0,0 +1,114 @@
+"""Headline KPIs fetched from ServiceNow with the smallest possible payload.
+
+Counts (MI count, P1 ratio, sites impacted) come from the Aggregate API as a
+handful of grouped counts instead of one row per incident. Only the KPIs that
+need per-incident timestamps (MTTR and its percentiles, the weekly trend) fetch
+rows, and then only major incidents and only the fields those KPIs read. When
+the Aggregate API is not available the counts are computed from the same
+projected rows instead.
+"""
+from __future__ import annotations
+
+from dataclasses import replace
+
+import numpy as np
+import pandas as pd
+
+from src.kpis import KpiResult, _MajorView, compute_kpis
+from src.snow_client import (
+    KPI_FIELDS,
+    SnowClient,
+    StatsUnavailable,
+    fetch_incidents,
+    fetch_stats,
+    kpi_fields,
+)
+from src.transforms import MAJOR_PRIORITIES, to_dataframe
+
+HEADLINE_KPIS = list(KPI_FIELDS)
+ROW_KPIS = {"mttr_hours", "weekly"}  # need per-incident timestamps
+COUNT_KPIS = {"mi_count", "p1_ratio", "sites_impacted"}
+
+
+def major_query(query: str) -> str:
+    """``query`` narrowed to major incidents (P1/P2), in every ``^NQ`` branch."""
+    clause = "priorityIN" + ",".join(str(p) for p in MAJOR_PRIORITIES)
+    if not query:
+        return clause
+    return "^NQ".join(f"{part}^{clause}" for part in query.split("^NQ"))
+
+
+def _empty_result() -> KpiResult:
+    weekly = pd.DataFrame({"week": pd.Series(dtype="datetime64[ns]"), "mi_count": pd.Series(dtype=np.int64)})
+    return KpiResult(mttr_hours=0.0, mi_count=0, p1_ratio=0.0, sites_impacted=0, weekly=weekly)
+
+
+def _priority(value: object) -> int | None:
+    digits = "".join(ch for ch in str(value).split(" ")[0] if ch.isdigit())
+    return int(digits) if digits else None
+
+
+def stats_counts(query: str, sites: bool = True, client: SnowClient | None = None) -> dict[str, float | int]:
+    """``mi_count``, ``p1_ratio`` and (optionally) ``sites_impacted`` from grouped counts.
+
+    ``query`` should already select major incidents (see ``major_query``).
+    Raises ``StatsUnavailable`` if the Aggregate API cannot be used.
+    """
+    by_priority = fetch_stats(query, ["priority"], client)
+    mi_count = sum(g["count"] for g in by_priority)
+    p1 = sum(g["count"] for g in by_priority if _priority(g.get("priority")) == 1)
+    counts: dict[str, float | int] = {"mi_count": mi_count, "p1_ratio": p1 / mi_count if mi_count else 0.0}
+    if sites:
+        by_location = fetch_stats(query, ["location"], client)
+        counts["sites_impacted"] = sum(1 for g in by_location if g.get("location") and g["count"])
+    return counts
+
+
+def fetch_headline_kpis(query: str, kpis: list[str] | None = None, page_size: int = 1000,
+                        concurrency: int = 1, use_stats: bool = True,
+                        client: SnowClient | None = None) -> KpiResult:
+    """Headline KPIs for ``query`` without fetching the full incident rows.
+
+    Args:
+        query: Encoded query for the dashboard's incidents; it is narrowed to major
+            incidents here, since only those feed the KPIs.
+        kpis: Subset of ``HEADLINE_KPIS`` to compute (default: all). KPIs not asked
+            for keep ``KpiResult``'s empty values.
+        page_size, concurrency: Passed to ``fetch_incidents`` for the row fetch.
+        use_stats: Try the Aggregate API for counts; False always fetches rows.
+        client: Shared SnowClient; a temporary one is created when omitted.
+    """
+    if client is None:
+        with SnowClient(pool_size=max(1, concurrency)) as own_client:
+            return fetch_headline_kpis(query, kpis, page_size, concurrency, use_stats, own_client)
+
+    wanted = list(kpis or HEADLINE_KPIS)
+    unknown = [k for k in wanted if k not in KPI_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown KPI(s) {unknown}; expected some of {HEADLINE_KPIS}")
+    query = major_query(query)
+
+    counts = None
+    if use_stats and COUNT_KPIS.intersection(wanted):
+        try:
+            counts = stats_counts(query, "sites_impacted" in wanted, client)
+        except StatsUnavailable:
+            counts = None
+    row_kpis = [k for k in wanted if k in ROW_KPIS or counts is None]
+
+    result = _empty_result()
+    if row_kpis:
+        rows = fetch_incidents(query, kpi_fields(row_kpis), page_size, use_saved_filter=False,
+                               concurrency=concurrency, client=client)
+        if rows:
+            df = to_dataframe(rows)
+            if "opened_at" in df.columns:
+                result = compute_kpis(df)
+            else:  # counts only (Aggregate API unavailable): no timestamps were fetched
+                view = _MajorView(df)
+                result = replace(result, mi_count=view.count, p1_ratio=view.p1_ratio(),
+                                 sites_impacted=view.sites_impacted())
+    if not counts:
+        return result
+    return replace(result, mi_count=int(counts["mi_count"]), p1_ratio=float(counts["p1_ratio"]),
+                   sites_impacted=int(counts.get("sites_impacted", result.sites_impacted)))
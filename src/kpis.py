@@ -1,33 +1,144 @@
 from __future__ import annotations
 
+from dataclasses import dataclass
+from functools import cached_property
+
+import numpy as np
 import pandas as pd
 
+from src import instrument
+from src.timeparse import parse_timestamps
+
+_NAT = np.iinfo(np.int64).min
+_NS_PER_HOUR = 3_600 * 10**9
+_NS_PER_DAY = 86_400 * 10**9
+
+
+@dataclass(frozen=True)
+class KpiResult:
+    """Headline KPIs for one incident frame (major incidents only)."""
+
+    mttr_hours: float
+    mi_count: int
+    p1_ratio: float
+    sites_impacted: int
+    weekly: pd.DataFrame  # columns: week (Monday start), mi_count
+    mttr_p50_hours: float = float("nan")
+    mttr_p90_hours: float = float("nan")
+    mttr_p99_hours: float = float("nan")
+
+
+def _as_ns(series: pd.Series) -> np.ndarray:
+    """Datetime column as int64 nanoseconds (UTC wall time for tz-aware data, NaT -> min int64)."""
+    if not pd.api.types.is_datetime64_any_dtype(series):
+        series = parse_timestamps(series)
+    return np.asarray(series.values, dtype="datetime64[ns]").view(np.int64)
+
+
+class _MajorView:
+    """The major-incident subset of a frame: the mask is built once and each
+    column is pulled out as a NumPy array the first time a metric needs it."""
+
+    def __init__(self, df: pd.DataFrame, site_col: str = "location") -> None:
+        self._df = df
+        self._site_col = site_col
+        self._mask = df["is_major"].to_numpy(dtype=bool, na_value=False)
+        self.count = int(np.count_nonzero(self._mask))
+
+    @cached_property
+    def opened(self) -> np.ndarray:
+        return _as_ns(self._df["opened_at"])[self._mask]
 
+    @cached_property
+    def resolved(self) -> np.ndarray | None:
+        if "resolved_at" not in self._df.columns:
+            return None
+        return _as_ns(self._df["resolved_at"])[self._mask]
+
+    @cached_property
+    def resolve_ns(self) -> np.ndarray:
+        """Time to resolve (ns) of each resolved major incident."""
+        if self.resolved is None:
+            return np.empty(0, dtype=np.int64)
+        valid = (self.opened != _NAT) & (self.resolved != _NAT)
+        return self.resolved[valid] - self.opened[valid]
+
+    def mttr_hours(self) -> float:
+        if not self.resolve_ns.size:
+            return 0.0
+        return float(self.resolve_ns.mean() / _NS_PER_HOUR)
+
+    def mttr_percentiles(self, quantiles: tuple[float, ...] = (0.5, 0.9, 0.99)) -> list[float]:
+        # Exact over one frame (a single partition pass); per-slice percentiles
+        # come from the mergeable sketches in src.trends instead
+        if not self.resolve_ns.size:
+            return [float("nan")] * len(quantiles)
+        hours = np.percentile(self.resolve_ns, [q * 100 for q in quantiles], method="lower") / _NS_PER_HOUR
+        return [float(h) for h in hours]
+
+    def weekly(self) -> pd.DataFrame:
+        opened = self.opened[self.opened != _NAT]
+        days = opened // _NS_PER_DAY
+        # 1970-01-01 was a Thursday: shift so weeks start on Monday, matching to_period("W")
+        week_start = days - (days + 3) % 7
+        weeks, counts = np.unique(week_start, return_counts=True)
+        return pd.DataFrame({
+            "week": (weeks * _NS_PER_DAY).astype("datetime64[ns]"),
+            "mi_count": counts.astype(np.int64),
+        })
+
+    def p1_ratio(self) -> float:
+        if not self.count or "priority" not in self._df.columns:
+            return 0.0
+        p1 = self._df["priority"].eq(1).to_numpy(dtype=bool, na_value=False) & self._mask
+        return float(np.count_nonzero(p1) / self.count)
+
+    def sites_impacted(self) -> int:
+        if self._site_col not in self._df.columns:
+            return 0
+        sites = self._df[self._site_col]
+        if isinstance(sites.dtype, pd.CategoricalDtype):
+            codes = sites.cat.codes.to_numpy()[self._mask]
+            return int(np.unique(codes[codes >= 0]).size)
+        uniques = pd.unique(sites.to_numpy()[self._mask])
+        return int(pd.notna(uniques).sum())
+
+
+@instrument.timed("kpi.compute_kpis")
+def compute_kpis(df: pd.DataFrame, site_col: str = "location") -> KpiResult:
+    """Compute every headline KPI from a single major-incident pass over ``df``."""
+    view = _MajorView(df, site_col)
+    p50, p90, p99 = view.mttr_percentiles()
+    return KpiResult(
+        mttr_hours=view.mttr_hours(),
+        mi_count=view.count,
+        p1_ratio=view.p1_ratio(),
+        sites_impacted=view.sites_impacted(),
+        weekly=view.weekly(),
+        mttr_p50_hours=p50,
+        mttr_p90_hours=p90,
+        mttr_p99_hours=p99,
+    )
+
+
+@instrument.timed("kpi.mttr_hours")
 def mttr_hours(df: pd.DataFrame) -> float:
     """Mean time to resolve (hours) for major incidents only."""
-    major_incidents = df[df["is_major"]]
-    valid_incidents = major_incidents[(~major_incidents["opened_at"].isna()) & (~major_incidents["resolved_at"].isna())]
-    if valid_incidents.empty:
-        return 0.0
-    hours = (valid_incidents["resolved_at"] - valid_incidents["opened_at"]).dt.total_seconds() / 3600.0
-    return float(hours.mean())
+    return _MajorView(df).mttr_hours()
+
+@instrument.timed("kpi.mttr_percentiles")
+def mttr_percentiles(df: pd.DataFrame, quantiles: tuple[float, ...] = (0.5, 0.9, 0.99)) -> list[float]:
+    """Time-to-resolve percentiles (hours) for major incidents; NaN when none are resolved."""
+    return _MajorView(df).mttr_percentiles(quantiles)
 
+@instrument.timed("kpi.weekly_counts")
 def weekly_counts(df: pd.DataFrame) -> pd.DataFrame:
-    major_incidents = df[df["is_major"]]
-    major_incidents_with_week = major_incidents.assign(week=major_incidents["opened_at"].dt.to_period("W").dt.start_time)
-    out = major_incidents_with_week.groupby("week", as_index=False).size()
-    out.rename(columns={"size": "mi_count"}, inplace=True)
-    return out.sort_values("week")
+    return _MajorView(df).weekly()
 
+@instrument.timed("kpi.p1_ratio")
 def p1_ratio(df: pd.DataFrame) -> float:
-    major_incidents = df[df["is_major"]]
-    if major_incidents.empty:
-        return 0.0
-    p1_count = (major_incidents["priority"] == 1).sum()
-    return float(p1_count / len(major_incidents))
+    return _MajorView(df).p1_ratio()
 
+@instrument.timed("kpi.sites_impacted")
 def sites_impacted(df: pd.DataFrame, site_col: str = "location") -> int:
-    if site_col not in df.columns:
-        return 0
-    d = df[df["is_major"] & df[site_col].notna()]
-    return int(d[site_col].nunique())
+    return _MajorView(df, site_col).sites_impacted()
@@ -0,0 +1,212 @@
+"""Evaluate ServiceNow encoded queries against the local incident frame.
+
+``compile_query`` parses an encoded query once into a ``CompiledQuery``. Its
+``mask`` is a vectorised boolean mask over the canonical frame (the output of
+``to_dataframe``, compact or not), so re-filtering incidents that are already
+held locally costs no API round trip. Compiled queries are cached by text.
+Relative dates such as ``gs.endOfToday()`` are resolved each time a mask is
+built, so a cached query does not go stale overnight.
+
+Grammar: ``^NQ`` joins alternative queries, ``^`` joins AND clauses and
+``^OR`` binds tighter than ``^``, so ``a^ORb^c`` is ``(a OR b) AND c``. A
+parenthesised ``(a^ORb)`` group is read the same way, and ``ORDERBY``/``EQ``
+terms are ignored. The operators are
+``=``, ``!=``, ``IN``, ``NOT IN``, ``<``, ``<=``, ``>``, ``>=``, ``BETWEEN``,
+``ISEMPTY`` and ``ISNOTEMPTY``, with ``NULL`` for an empty value. As on the
+instance, ``!=`` and ``NOT IN`` do not match empty values. Source field names
+(``u_resolved``) are mapped to canonical columns (``resolved_at``) through the
+field map. Dot-walked fields (``location.u_region``) and fields the frame lacks
+raise ``UnsupportedQuery``; the caller should ask the API instead.
+"""
+from __future__ import annotations
+
+import re
+import threading
+from collections import OrderedDict
+from collections.abc import Iterable
+from dataclasses import dataclass
+from datetime import datetime
+from typing import cast
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_bool_dtype, is_datetime64_any_dtype, is_numeric_dtype
+
+from src.time_slices import SN_FORMAT, resolve_date
+from src.transforms import load_transform_plan
+
+# One clause: <field><op><value>. Operators are upper-case in ServiceNow and
+# field names lower-case, so the lazy field match stops at the first operator.
+_CLAUSE = re.compile(r"^(?P<field>[a-z0-9_.]+?)(?P<op>ISNOTEMPTY|ISEMPTY|BETWEEN|NOT IN|IN|!=|>=|<=|=|>|<)(?P<value>.*)$")
+# "^" joins AND terms, except in "^OR" (which stays inside its term; "^ORDERBY" does not)
+_AND = re.compile(r"\^(?!OR(?!DERBY))")
+
+MAX_COMPILED = 256
+
+
+class UnsupportedQuery(ValueError):
+    """The query uses syntax, or fields, that cannot be evaluated against the local frame."""
+
+
+@dataclass(frozen=True)
+class Clause:
+    """One ``<field><op><value>`` condition."""
+
+    field: str
+    op: str
+    value: str
+
+    def mask(self, df: pd.DataFrame, now: datetime | None = None) -> np.ndarray:
+        col = df[_column(self.field, df.columns)]
+        if isinstance(col.dtype, pd.CategoricalDtype):
+            # Evaluate once per category (plus a trailing NaN for code -1) and gather by code
+            categories = pd.Series(col.cat.categories).reindex(range(len(col.cat.categories) + 1))
+            return self._values_mask(categories, now)[col.cat.codes.to_numpy()]
+        return self._values_mask(col, now)
+
+    def _values_mask(self, col: pd.Series, now: datetime | None) -> np.ndarray:
+        empty = col.isna().to_numpy()
+        if not (is_numeric_dtype(col.dtype) or is_datetime64_any_dtype(col.dtype)):
+            empty |= _bool(col.eq(""))
+        op, value = self.op, self.value
+        if op == "ISEMPTY" or (op == "=" and value in ("", "NULL")):
+            return empty
+        if op == "ISNOTEMPTY" or (op == "!=" and value in ("", "NULL")):
+            return ~empty
+        if op in ("IN", "NOT IN"):
+            hit = _bool(col.isin([_scalar(col, v, now) for v in value.split(",")]))
+            return hit if op == "IN" else ~hit & ~empty
+        if op == "BETWEEN":
+            low, sep, high = value.partition("@")
+            if not sep:
+                raise UnsupportedQuery(f"BETWEEN needs low@high: {self.field}{op}{value}")
+            return _bool(col.ge(_scalar(col, low, now)) & col.le(_scalar(col, high, now))) & ~empty
+        compare = {"=": col.eq, "!=": col.ne, ">=": col.ge, "<=": col.le, ">": col.gt, "<": col.lt}[op]
+        return _bool(compare(_scalar(col, value, now))) & ~empty
+
+
+def _bool(values: pd.Series) -> np.ndarray:
+    return values.to_numpy(dtype=bool, na_value=False)
+
+
+def _column(field: str, columns: pd.Index) -> str:
+    """The frame column for a query field (a canonical name or one of its source aliases)."""
+    if field in columns:
+        return field
+    canonical = load_transform_plan().rename_map([field]).get(field)
+    if canonical is not None and canonical in columns:
+        return canonical
+    raise UnsupportedQuery(f"{field!r} is not a column of the local frame")
+
+
+def _scalar(col: pd.Series, value: str, now: datetime | None) -> pd.Timestamp | bool | float | str:
+    """``value`` as a scalar comparable with ``col`` (NaN/NaT when it cannot be one)."""
+    value = value.strip()
+    if is_datetime64_any_dtype(col.dtype):
+        when = resolve_date(value, now)
+        if when is None:
+            return cast(pd.Timestamp, pd.NaT)  # the stubs type NaT apart from Timestamp
+        stamp = pd.Timestamp(when)
+        tz = getattr(col.dtype, "tz", None)
+        return stamp.tz_localize(tz) if tz is not None else stamp
+    if is_bool_dtype(col.dtype):
+        return value.lower() in ("true", "1")
+    if is_numeric_dtype(col.dtype):
+        return pd.to_numeric(value, errors="coerce")
+    if value.startswith("javascript:"):
+        when = resolve_date(value, now)
+        if when is not None:
+            return when.strftime(SN_FORMAT)  # ServiceNow timestamps held as text sort lexicographically
+    return value
+
+
+def parse_clause(text: str) -> Clause:
+    """One ``<field><op><value>`` clause (raises ``UnsupportedQuery`` if it is not one)."""
+    m = _CLAUSE.match(text)
+    if m is None:
+        raise UnsupportedQuery(f"cannot parse clause {text!r}")
+    return Clause(m.group("field"), m.group("op"), m.group("value"))
+
+
+@dataclass(frozen=True)
+class CompiledQuery:
+    """A parsed encoded query: ``^NQ`` branches of AND terms of ``^OR`` alternatives."""
+
+    query: str
+    branches: tuple[tuple[tuple[Clause, ...], ...], ...]
+
+    @property
+    def fields(self) -> set[str]:
+        return {clause.field for branch in self.branches for term in branch for clause in term}
+
+    def supports(self, columns: Iterable[str]) -> bool:
+        """Whether every field of the query resolves to one of ``columns`` (e.g. ``df.columns``)."""
+        columns = pd.Index(columns)
+        try:
+            for field in self.fields:
+                _column(field, columns)
+        except UnsupportedQuery:
+            return False
+        return True
+
+    def mask(self, df: pd.DataFrame, now: datetime | None = None) -> np.ndarray:
+        """Rows of ``df`` matching the query. ``now`` (naive UTC) anchors ``gs.*OfToday()``."""
+        if not self.branches:
+            return np.ones(len(df), dtype=bool)
+        out = np.zeros(len(df), dtype=bool)
+        for branch in self.branches:
+            hit = np.ones(len(df), dtype=bool)
+            for term in branch:
+                alternatives = np.zeros(len(df), dtype=bool)
+                for clause in term:
+                    alternatives |= clause.mask(df, now)
+                hit &= alternatives
+            out |= hit
+        return out
+
+    def filter(self, df: pd.DataFrame, now: datetime | None = None) -> pd.DataFrame:
+        return df[self.mask(df, now)].reset_index(drop=True)
+
+
+def and_clauses(query: str) -> list[str]:
+    """Top-level AND terms of ``query``, with ``^OR`` groups kept whole (a ``^NQ`` term starts with ``NQ``)."""
+    return [term for term in _AND.split(query) if term]
+
+
+def _parse(query: str) -> CompiledQuery:
+    branches = []
+    for branch in query.split("^NQ"):
+        terms = []
+        for term in and_clauses(branch):
+            term = term.strip()
+            if term.startswith("(") and term.endswith(")"):
+                term = term[1:-1]
+            if term and term != "EQ" and not term.startswith("ORDERBY"):  # sorting, not filtering
+                terms.append(tuple(parse_clause(alt) for alt in term.split("^OR") if alt))
+        if terms:
+            branches.append(tuple(terms))
+    return CompiledQuery(query, tuple(branches))
+
+
+_compiled: OrderedDict[str, CompiledQuery] = OrderedDict()
+_compiled_lock = threading.Lock()
+
+
+def compile_query(query: str) -> CompiledQuery:
+    """Parse ``query`` (cached; raises ``UnsupportedQuery`` for clauses it cannot parse)."""
+    with _compiled_lock:
+        compiled = _compiled.get(query)
+        if compiled is not None:
+            _compiled.move_to_end(query)
+            return compiled
+    compiled = _parse(query)
+    with _compiled_lock:
+        _compiled[query] = compiled
+        while len(_compiled) > MAX_COMPILED:
+            _compiled.popitem(last=False)
+    return compiled
+
+
+def filter_frame(df: pd.DataFrame, query: str, now: datetime | None = None) -> pd.DataFrame:
+    """Rows of the canonical incident frame ``df`` matching the encoded ``query``."""
+    return compile_query(query).filter(df, now)
@@ -0,0 +1,214 @@
+"""Multi-process sharded normalisation and KPI aggregation for very large exports.
+
+``to_dataframe`` and ``compute_kpis`` run on one core. ``process_csv`` and
+``process_records`` split their input into shards, normalise each shard and
+reduce it to a ``KpiPartial`` on a process pool, then merge the partials into
+the same ``KpiResult`` as ``compute_kpis`` over the whole frame.
+
+Shards travel as Arrow IPC (Feather) files in a scratch directory, on
+``/dev/shm`` where available, rather than as pickled frames. The parent
+streams the CSV (or record pages) into raw string shards. Each worker writes
+its normalised shard back for the parent to concatenate. Only the small
+partials are pickled.
+"""
+from __future__ import annotations
+
+import csv
+import multiprocessing as mp
+import os
+import tempfile
+from collections import deque
+from collections.abc import Iterable, Iterator
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+from src.kpis import _NS_PER_HOUR, KpiResult, _MajorView
+
+DEFAULT_SHARD_ROWS = 250_000
+
+
+@dataclass
+class KpiPartial:
+    """Mergeable KPI state for one shard of major incidents.
+
+    Counts, resolution times (kept whole so the merged percentiles stay exact;
+    their sum gives MTTR), weekly buckets and the set of distinct sites.
+    """
+
+    mi_count: int = 0
+    p1: int = 0
+    resolve_ns: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=np.int64))
+    weekly: pd.Series = field(default_factory=lambda: pd.Series(dtype=np.int64))  # week start (ns) -> count
+    sites: set = field(default_factory=set)
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, site_col: str = "location") -> KpiPartial:
+        """Partial over a normalised incident frame (the same major-incident pass as ``compute_kpis``)."""
+        view = _MajorView(df, site_col)
+        majors = df["is_major"].to_numpy(dtype=bool, na_value=False)
+        partial = cls(mi_count=view.count)
+        if "priority" in df.columns:
+            partial.p1 = int(np.count_nonzero(df["priority"].eq(1).to_numpy(dtype=bool, na_value=False) & majors))
+        if site_col in df.columns:
+            partial.sites = {s for s in pd.unique(df[site_col].to_numpy()[majors]) if pd.notna(s)}
+        if "opened_at" in df.columns:
+            weekly = view.weekly()
+            partial.resolve_ns = view.resolve_ns
+            partial.weekly = pd.Series(weekly["mi_count"].to_numpy(dtype=np.int64),
+                                       index=weekly["week"].to_numpy(dtype="datetime64[ns]").view(np.int64))
+        return partial
+
+    def merge(self, other: KpiPartial) -> KpiPartial:
+        return KpiPartial(
+            mi_count=self.mi_count + other.mi_count,
+            p1=self.p1 + other.p1,
+            resolve_ns=np.concatenate([self.resolve_ns, other.resolve_ns]),
+            weekly=self.weekly.add(other.weekly, fill_value=0).astype(np.int64),
+            sites=self.sites | other.sites,
+        )
+
+    def result(self) -> KpiResult:
+        resolve_ns = self.resolve_ns
+        if resolve_ns.size:
+            mttr = float(resolve_ns.sum() / resolve_ns.size / _NS_PER_HOUR)
+            p50, p90, p99 = (float(h) for h in np.percentile(resolve_ns, [50, 90, 99], method="lower") / _NS_PER_HOUR)
+        else:
+            mttr, p50, p90, p99 = 0.0, float("nan"), float("nan"), float("nan")
+        weekly = self.weekly.sort_index()
+        return KpiResult(
+            mttr_hours=mttr,
+            mi_count=self.mi_count,
+            p1_ratio=self.p1 / self.mi_count if self.mi_count else 0.0,
+            sites_impacted=len(self.sites),
+            weekly=pd.DataFrame({"week": weekly.index.to_numpy(dtype=np.int64).astype("datetime64[ns]"),
+                                 "mi_count": weekly.to_numpy(dtype=np.int64)}),
+            mttr_p50_hours=p50,
+            mttr_p90_hours=p90,
+            mttr_p99_hours=p99,
+        )
+
+
+def merge_partials(partials: Iterable[KpiPartial]) -> KpiResult:
+    total = KpiPartial()
+    for partial in partials:
+        total = total.merge(partial)
+    return total.result()
+
+
+def _process_shard(path: str, keep_frame: bool, site_col: str, compact: bool) -> KpiPartial:
+    """Worker: normalise one raw shard, write it back in place and return its partial."""
+    from pyarrow import feather
+
+    from src.transforms import compact_dtypes, to_dataframe
+
+    df = to_dataframe(feather.read_table(path).to_pandas())
+    partial = KpiPartial.from_frame(df, site_col)
+    if keep_frame:
+        (compact_dtypes(df) if compact else df).reset_index(drop=True).to_feather(path)
+    else:
+        os.remove(path)
+    return partial
+
+
+def _scratch_dir() -> tempfile.TemporaryDirectory:
+    shm = "/dev/shm"
+    return tempfile.TemporaryDirectory(prefix="mi-shards-", dir=shm if os.path.isdir(shm) else None)
+
+
+def _pool(workers: int) -> ProcessPoolExecutor:
+    # No fork: the app process runs Streamlit/refresh threads, which fork would copy mid-lock
+    method = "forkserver" if "forkserver" in mp.get_all_start_methods() else "spawn"
+    return ProcessPoolExecutor(max_workers=workers, mp_context=mp.get_context(method))
+
+
+def _run(shards: Iterator, workers: int | None, keep_frame: bool, site_col: str,
+         compact: bool = False) -> tuple[pd.DataFrame | None, KpiResult]:
+    """Write raw shards from ``shards`` (each a pyarrow Table) and process them on the pool.
+
+    At most ``2 * workers`` shards are on disk waiting, so the input is never
+    held in memory (or scratch space) whole.
+    """
+    import pyarrow as pa
+    from pyarrow import feather
+
+    workers = workers or os.cpu_count() or 1
+    partials: list[KpiPartial] = []
+    paths: list[str] = []
+    with _scratch_dir() as scratch, _pool(workers) as pool:
+        pending: deque[Future] = deque()
+        for i, table in enumerate(shards):
+            path = os.path.join(scratch, f"shard-{i:05d}.feather")
+            feather.write_feather(table, path, compression="uncompressed")
+            paths.append(path)
+            pending.append(pool.submit(_process_shard, path, keep_frame, site_col, compact))
+            while len(pending) >= 2 * workers:
+                partials.append(pending.popleft().result())
+        partials.extend(f.result() for f in pending)
+
+        df = None
+        if keep_frame:
+            tables = [feather.read_table(p, memory_map=True) for p in paths]
+            if tables:
+                # Category columns come back with their per-shard dictionaries unified
+                df = pa.concat_tables(tables, promote_options="permissive").to_pandas()
+            else:
+                from src.transforms import compact_dtypes, to_dataframe
+                df = compact_dtypes(to_dataframe([])) if compact else to_dataframe([])
+    return df, merge_partials(partials)
+
+
+def _csv_shards(path: str | os.PathLike[str], shard_rows: int) -> Iterator:
+    import pyarrow as pa
+    from pyarrow import csv as pacsv
+
+    with open(path, newline="", encoding="utf-8-sig") as fh:
+        header = next(csv.reader(fh), [])
+    if not header:
+        return
+    # Every column as (nullable) strings, as pd.read_csv(dtype=str) would see them;
+    # the transform plan does all type conversion, identically on every shard
+    convert = pacsv.ConvertOptions(column_types={c: pa.string() for c in header}, strings_can_be_null=True)
+    reader = pacsv.open_csv(path, read_options=pacsv.ReadOptions(block_size=1 << 24), convert_options=convert)
+    batches, rows = [], 0
+    for batch in reader:
+        batches.append(batch)
+        rows += batch.num_rows
+        if rows >= shard_rows:
+            yield pa.Table.from_batches(batches)
+            batches, rows = [], 0
+    if batches:
+        yield pa.Table.from_batches(batches)
+
+
+def process_csv(path: str | os.PathLike[str], workers: int | None = None, shard_rows: int = DEFAULT_SHARD_ROWS,
+                keep_frame: bool = True, site_col: str = "location",
+                compact: bool = True) -> tuple[pd.DataFrame | None, KpiResult]:
+    """Normalise a (large) incident CSV and compute its KPIs on ``workers`` processes.
+
+    Returns the normalised frame (None when ``keep_frame`` is False, for KPI-only
+    runs) and the merged KPIs. With ``compact`` (the default, as for
+    ``src.csv_ingest.ingest_csv``) each shard is stored in ``compact_dtypes``.
+    """
+    return _run(_csv_shards(path, shard_rows), workers, keep_frame, site_col, compact)
+
+
+def process_records(pages: Iterable[list[dict]], workers: int | None = None, shard_rows: int = DEFAULT_SHARD_ROWS,
+                    keep_frame: bool = True, site_col: str = "location") -> tuple[pd.DataFrame | None, KpiResult]:
+    """Like ``process_csv`` for API records, e.g. the pages of ``iter_incident_pages``."""
+    import pyarrow as pa
+
+    def shards() -> Iterator:
+        buffer: list[dict] = []
+        for page in pages:
+            buffer.extend(page)
+            if len(buffer) >= shard_rows:
+                yield pa.Table.from_pylist(buffer)
+                buffer = []
+        if buffer:
+            yield pa.Table.from_pylist(buffer)
+
+    return _run(shards(), workers, keep_frame, site_col)
+
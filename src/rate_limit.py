@@ -0,0 +1,88 @@
+"""Process-wide request budget per ServiceNow instance.
+
+Every client in the process draws from one token bucket per instance: the sync
+``SnowClient`` paging threads and ``AsyncSnowClient`` coroutines alike. A
+Retry-After from the instance pauses all of them. Several dashboards or
+refreshes running at once therefore stay within the instance's rate limit
+together, instead of each one backing off on its own.
+
+The sustained rate and burst come from ``SNOW_RATE_LIMIT`` (requests per second)
+and ``SNOW_RATE_BURST``. With no rate set, only the shared Retry-After pause
+applies.
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+import threading
+import time
+
+from src import instrument
+
+
+class TokenBucket:
+    """Thread- and asyncio-safe token bucket with a shared pause.
+
+    Callers reserve a token and then wait until it is due. A token drawn while
+    the bucket is empty puts the caller in a queue (the count goes negative),
+    so waiters are served in order rather than racing for each refill.
+    """
+
+    def __init__(self, rate: float | None = None, burst: float | None = None) -> None:
+        self.rate = rate if rate and rate > 0 else None
+        self.burst = burst or max(1.0, self.rate or 1.0)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        """Take a token; returns the seconds to wait before using it."""
+        with self._lock:
+            now = time.monotonic()
+            wait = max(0.0, self._paused_until - now)
+            if self.rate:
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                self._tokens -= 1
+                if self._tokens < 0:
+                    wait = max(wait, -self._tokens / self.rate)
+            return wait
+
+    def acquire(self) -> float:
+        """Block the calling thread until a request may be sent; returns the time waited."""
+        wait = self._reserve()
+        instrument.sleep(wait, "snow.rate_limit")
+        return wait
+
+    async def acquire_async(self) -> float:
+        """``acquire`` for coroutines: waits without holding the thread."""
+        wait = self._reserve()
+        if wait > 0:
+            instrument.count("snow.rate_limit.sleep_seconds", wait)
+            await asyncio.sleep(wait)
+        return wait
+
+    def pause(self, seconds: float) -> None:
+        """Hold back every caller for ``seconds`` (a Retry-After from the instance)."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+
+_limiters: dict[str, TokenBucket] = {}
+_limiters_lock = threading.Lock()
+
+
+def _env_float(name: str) -> float | None:
+    value = os.getenv(name, "").strip()
+    return float(value) if value else None
+
+
+def limiter_for(base_url: str) -> TokenBucket:
+    """The shared bucket for an instance (keyed by its scheme and host)."""
+    key = "/".join(base_url.split("/")[:3])
+    with _limiters_lock:
+        limiter = _limiters.get(key)
+        if limiter is None:
+            limiter = _limiters[key] = TokenBucket(_env_float("SNOW_RATE_LIMIT"), _env_float("SNOW_RATE_BURST"))
+        return limiter
@@ -0,0 +1,289 @@
+"""Background refresh of incident snapshots (stale-while-revalidate).
+
+A worker periodically syncs incidents, rebuilds the normalised frame and
+publishes it as a snapshot: the frame goes into a Feather file and a small
+manifest pointing at it is swapped in with ``os.replace``, so readers (the
+Streamlit app, possibly in another process) always see a complete snapshot and
+keep serving the last good one while a refresh is running or after it fails.
+
+Run standalone (e.g. next to Streamlit in the container):
+  python -m src.refresh --interval 300
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import threading
+import time
+import traceback
+import uuid
+from collections.abc import Callable
+from dataclasses import dataclass
+
+import pandas as pd
+
+from src.frame_cache import FrameCache
+from src.kpi_cache import stamp_frame
+from src.kpis import KpiResult, compute_kpis
+
+DEFAULT_SNAPSHOT_DIR = os.path.join("data", "snapshots")
+DEFAULT_INTERVAL_SECONDS = 300.0
+MIN_INTERVAL_SECONDS = 30.0  # shorter positive intervals are raised to this; <= 0 disables the thread
+KEEP_SNAPSHOTS = 2  # the current one plus its predecessor, which readers may still be mapping
+
+
+def snapshot_name(query: str) -> str:
+    """Manifest name for a query's snapshots."""
+    return hashlib.sha256(query.encode("utf-8")).hexdigest()[:16]
+
+
+def _write_json(path: str, payload: dict) -> None:
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump(payload, fh)
+    os.replace(tmp, path)
+
+
+def _read_json(path: str) -> dict | None:
+    try:
+        with open(path, encoding="utf-8") as fh:
+            return json.load(fh)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    """One published, immutable incident frame with its headline KPIs."""
+
+    df: pd.DataFrame
+    version: str
+    query: str
+    built_at: float
+    build_seconds: float
+    kpis: KpiResult
+
+    @property
+    def age_seconds(self) -> float:
+        return time.time() - self.built_at
+
+
+class SnapshotStore:
+    """Shared on-disk snapshots for one query.
+
+    ``publish`` writes the frame, then atomically replaces ``<name>.json``;
+    ``latest`` follows that manifest and memoises the loaded snapshot until a
+    newer one is published. A ``<name>.status.json`` file records whether a
+    refresh is in progress and the last error.
+    """
+
+    def __init__(self, query: str, directory: str | os.PathLike[str] = DEFAULT_SNAPSHOT_DIR) -> None:
+        self.query = query
+        self.directory = os.fspath(directory)
+        self.name = snapshot_name(query)
+        # Snapshots never expire by age; superseded ones are pruned on publish
+        self.frames = FrameCache(self.directory, ttl_seconds=float("inf"), max_bytes=2**62)
+        self._manifest = os.path.join(self.directory, f"{self.name}.json")
+        self._status = os.path.join(self.directory, f"{self.name}.status.json")
+        self._lock = threading.Lock()
+        self._current: Snapshot | None = None
+
+    def publish(self, df: pd.DataFrame, build_seconds: float = 0.0) -> Snapshot:
+        version = f"{self.name}-{time.time_ns()}-{uuid.uuid4().hex[:8]}"
+        df = self.frames.put(version, df)
+        built_at = time.time()
+        manifest = _read_json(self._manifest) or {}
+        history = [v for v in manifest.get("history", []) if v != version][: KEEP_SNAPSHOTS - 1]
+        _write_json(self._manifest, {"version": version, "query": self.query, "built_at": built_at,
+                                     "build_seconds": build_seconds, "rows": len(df),
+                                     "history": [version, *history]})
+        for name in os.listdir(self.directory):
+            stale = name.startswith(f"{self.name}-") and name.endswith(".feather")
+            if stale and name[: -len(".feather")] not in (version, *history):
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except FileNotFoundError:
+                    pass
+        snapshot = Snapshot(stamp_frame(df, version), version, self.query, built_at, build_seconds, compute_kpis(df))
+        with self._lock:
+            self._current = snapshot
+        return snapshot
+
+    def latest(self) -> Snapshot | None:
+        """The most recently published snapshot, or None if there is none yet."""
+        manifest = _read_json(self._manifest)
+        if not manifest:
+            return None
+        with self._lock:
+            current = self._current
+        if current is not None and current.version == manifest["version"]:
+            return current
+        df = self.frames.get(manifest["version"])
+        if df is None:
+            return current  # pruned or unreadable: keep serving what we have
+        snapshot = Snapshot(stamp_frame(df, manifest["version"]), manifest["version"], self.query,
+                            manifest["built_at"], manifest.get("build_seconds", 0.0), compute_kpis(df))
+        with self._lock:
+            self._current = snapshot
+        return snapshot
+
+    def set_status(self, refreshing: bool, error: str | None = None) -> None:
+        status = self.status()
+        status.update({"refreshing": refreshing, "updated_at": time.time(), "pid": os.getpid()})
+        if refreshing:
+            status["started_at"] = time.time()
+        else:
+            status["last_error"] = error
+        _write_json(self._status, status)
+
+    def status(self) -> dict:
+        """``refreshing``, ``started_at``, ``last_error`` and ``updated_at`` of the latest refresh."""
+        return _read_json(self._status) or {"refreshing": False, "last_error": None}
+
+
+class RefreshWorker:
+    """Rebuilds and publishes snapshots every ``interval`` seconds on a daemon thread.
+
+    ``build`` returns a normalised incident frame. Failures are recorded in the
+    store's status and the previous snapshot keeps being served. An ``interval``
+    of 0 (or less) disables periodic refresh: ``start`` does not start the
+    thread and the last snapshot is served until ``run_once`` or ``trigger``.
+    """
+
+    def __init__(self, store: SnapshotStore, build: Callable[[], pd.DataFrame],
+                 interval: float = DEFAULT_INTERVAL_SECONDS) -> None:
+        self.store = store
+        self.build = build
+        self.interval = max(interval, MIN_INTERVAL_SECONDS) if interval > 0 else 0.0
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._running = threading.Lock()
+        self._thread: threading.Thread | None = None
+
+    def run_once(self) -> Snapshot | None:
+        """Refresh now on the calling thread (skipped if a refresh is already running here)."""
+        if not self._running.acquire(blocking=False):
+            return None
+        try:
+            self.store.set_status(refreshing=True)
+            start = time.perf_counter()
+            try:
+                df = self.build()
+                snapshot = self.store.publish(df, time.perf_counter() - start)
+            except Exception as e:
+                self.store.set_status(refreshing=False, error=f"{type(e).__name__}: {e}")
+                traceback.print_exc()
+                return None
+            self.store.set_status(refreshing=False)
+            return snapshot
+        finally:
+            self._running.release()
+
+    @property
+    def refreshing(self) -> bool:
+        return self._running.locked()
+
+    @property
+    def enabled(self) -> bool:
+        """Whether snapshots are refreshed periodically (``interval > 0``)."""
+        return self.interval > 0
+
+    def start(self) -> RefreshWorker:
+        """Start the background thread (no-op when already running or when disabled)."""
+        if self.enabled and (self._thread is None or not self._thread.is_alive()):
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._loop, name="snapshot-refresh", daemon=True)
+            self._thread.start()
+        return self
+
+    def trigger(self) -> None:
+        """Refresh now instead of waiting for the interval (in the background either way)."""
+        if self._thread is not None and self._thread.is_alive():
+            self._wake.set()
+        else:
+            threading.Thread(target=self.run_once, name="snapshot-refresh-once", daemon=True).start()
+
+    def join(self, timeout: float | None = None) -> None:
+        """Wait for the background thread to exit (after ``stop``)."""
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def stop(self, timeout: float | None = None) -> None:
+        self._stopping.set()
+        self._wake.set()
+        self.join(timeout)
+
+    def _loop(self) -> None:
+        forced = False
+        while not self._stopping.is_set():
+            latest = self.store.latest()
+            # A fresh enough snapshot (e.g. just built on first page load) is not rebuilt
+            wait = self.interval - latest.age_seconds if latest is not None and not forced else 0.0
+            if wait <= 0:
+                self.run_once()
+                wait = self.interval
+            forced = self._wake.wait(wait)
+            self._wake.clear()
+
+
+def api_views_builder(views: dict[str, str], incremental: bool = True,
+                      slice_rows: int | None = None) -> Callable[[], pd.DataFrame]:
+    """``build`` callable that syncs a batch of views (``src.views.fetch_views``).
+
+    The frame holds every record once plus a ``view:<name>`` mask column per view.
+    """
+    from src.snow_client import SnowClient
+    from src.store import IncidentStore
+    from src.views import fetch_views
+
+    client: SnowClient | None = None
+    store: IncidentStore | None = None
+
+    def build() -> pd.DataFrame:
+        nonlocal client, store
+        client = client or SnowClient()
+        if incremental:
+            store = store or IncidentStore()
+        return fetch_views(views, concurrency=4 if slice_rows else 1, client=client, store=store,
+                           slice_rows=slice_rows).to_frame()
+
+    return build
+
+
+def main(argv: list[str] | None = None) -> None:
+    from src.snow_client import DEFAULT_QUERY, _load_env
+    from src.views import dashboard_views, views_key
+
+    parser = argparse.ArgumentParser(description="Periodically refresh the shared incident snapshot")
+    parser.add_argument("--query", default=None, help="Encoded query (default: SNOW_QUERY or priorityIN1,2)")
+    parser.add_argument("--interval", type=float,
+                        default=float(os.getenv("REFRESH_INTERVAL_SECONDS", DEFAULT_INTERVAL_SECONDS)))
+    parser.add_argument("--directory", default=DEFAULT_SNAPSHOT_DIR)
+    parser.add_argument("--full", action="store_true", help="Full fetch instead of incremental sync")
+    parser.add_argument("--once", action="store_true", help="Refresh once and exit")
+    parser.add_argument("--slice-rows", type=int, default=None,
+                        help="Fetch date-bounded queries as resumable time slices of about this many rows")
+    args = parser.parse_args(argv)
+    if args.interval <= 0 and not args.once:
+        parser.error("--interval must be positive (periodic refresh is disabled; use --once for one refresh)")
+
+    _load_env()
+    query = args.query or os.getenv("SNOW_QUERY") or DEFAULT_QUERY
+    # The same batch of views the app reads, so it finds this worker's snapshots
+    views = dashboard_views(query)
+    build = api_views_builder(views, not args.full, args.slice_rows)
+    worker = RefreshWorker(SnapshotStore(views_key(views), args.directory), build, args.interval)
+    if args.once:
+        raise SystemExit(0 if worker.run_once() is not None else 1)
+    print(f"Refreshing snapshot for {', '.join(views)} every {worker.interval:g}s into {args.directory}")
+    worker.start()
+    try:
+        worker.join()
+    except KeyboardInterrupt:
+        worker.stop(timeout=60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import math
+from collections.abc import Iterable, Sequence
+
+import numpy as np
+
+ZERO_KEY = -(2**31)  # bucket key for values too small to take a logarithm of
+_MIN_POSITIVE = 1e-9
+
+
+class DDSketch:
+    """Mergeable quantile sketch with a relative-accuracy guarantee (DDSketch).
+
+    Values are counted in logarithmic buckets ``(gamma**(k-1), gamma**k]`` with
+    ``gamma = (1 + a) / (1 - a)``, so any quantile is returned within a relative
+    error of ``a`` (``relative_accuracy``) of the exact lower quantile. Sketches
+    built with the same accuracy merge exactly by adding bucket counts, which is
+    what lets per-slice sketches be combined into any date range or site group.
+    Only non-negative values are supported (durations).
+    """
+
+    def __init__(self, relative_accuracy: float = 0.01) -> None:
+        if not 0 < relative_accuracy < 1:
+            raise ValueError("relative_accuracy must be between 0 and 1")
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.bins: dict[int, int] = {}
+        self.count = 0
+
+    # -- key mapping ----------------------------------------------------------
+    def keys(self, values: np.ndarray) -> np.ndarray:
+        """Bucket key for each (non-negative) value."""
+        values = np.asarray(values, dtype="float64")
+        out = np.full(values.shape, ZERO_KEY, dtype=np.int64)
+        positive = values > _MIN_POSITIVE
+        out[positive] = np.ceil(np.log(values[positive]) / self._log_gamma).astype(np.int64)
+        return out
+
+    def values(self, keys: np.ndarray) -> np.ndarray:
+        """Representative value for each bucket key (0 for the zero bucket)."""
+        keys = np.asarray(keys, dtype=np.int64)
+        zero = keys == ZERO_KEY
+        out = 2 * np.power(self.gamma, np.where(zero, 0, keys).astype("float64")) / (self.gamma + 1)
+        out[zero] = 0.0
+        return out
+
+    # -- building -------------------------------------------------------------
+    def add(self, values: Iterable[float] | np.ndarray) -> DDSketch:
+        """Add values (NaN are ignored); returns ``self``."""
+        arr = np.asarray(values if isinstance(values, np.ndarray) else list(values), dtype="float64")
+        arr = arr[~np.isnan(arr)]
+        if (arr < 0).any():
+            raise ValueError("DDSketch only supports non-negative values")
+        keys, counts = np.unique(self.keys(arr), return_counts=True)
+        return self.add_counts(keys, counts)
+
+    def add_counts(self, keys: np.ndarray, counts: np.ndarray) -> DDSketch:
+        """Add pre-bucketed counts (keys from ``keys()`` of a sketch with the same accuracy)."""
+        for key, n in zip(np.asarray(keys).tolist(), np.asarray(counts).tolist()):
+            if n:
+                self.bins[key] = self.bins.get(key, 0) + n
+                self.count += n
+        return self
+
+    @classmethod
+    def from_counts(cls, keys: np.ndarray, counts: np.ndarray, relative_accuracy: float = 0.01) -> DDSketch:
+        return cls(relative_accuracy).add_counts(keys, counts)
+
+    def merge(self, other: DDSketch) -> DDSketch:
+        """Fold ``other`` into this sketch in place; returns ``self``."""
+        if not math.isclose(other.gamma, self.gamma):
+            raise ValueError("Cannot merge sketches with different relative accuracy")
+        for key, n in other.bins.items():
+            self.bins[key] = self.bins.get(key, 0) + n
+        self.count += other.count
+        return self
+
+    def __add__(self, other: DDSketch) -> DDSketch:
+        return self.copy().merge(other)
+
+    def copy(self) -> DDSketch:
+        out = DDSketch(self.relative_accuracy)
+        out.bins = dict(self.bins)
+        out.count = self.count
+        return out
+
+    # -- reads ------------------------------------------------------------------
+    def quantiles(self, qs: Sequence[float]) -> list[float]:
+        """Estimated lower quantiles (NaN when empty)."""
+        if not self.count:
+            return [math.nan for _ in qs]
+        keys = np.array(sorted(self.bins), dtype=np.int64)
+        cum = np.cumsum([self.bins[k] for k in keys.tolist()])
+        values = self.values(keys)
+        return [float(values[np.searchsorted(cum, q * (self.count - 1), side="right")]) for q in qs]
+
+    def quantile(self, q: float) -> float:
+        return self.quantiles([q])[0]
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __repr__(self) -> str:
+        return f"DDSketch(relative_accuracy={self.relative_accuracy}, count={self.count}, buckets={len(self.bins)})"
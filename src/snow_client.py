@@ -1,15 +1,30 @@
 from __future__ import annotations
 
 import os
+import threading
 import time
-from typing import Any
+from collections import Counter, deque
+from collections.abc import Callable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from functools import cache
+from itertools import islice
+from typing import TYPE_CHECKING, Any
 
 import requests
+from requests.adapters import HTTPAdapter
+
+from src import instrument
+from src.rate_limit import TokenBucket, limiter_for
+
+if TYPE_CHECKING:
+    from src.store import IncidentStore
 
 
 # Only load environment variables when actually needed
+@cache
 def _load_env():
-    """Load environment variables only when needed"""
+    """Load environment variables only when needed (the .env file is read once per process)"""
     try:
         from dotenv import load_dotenv
         load_dotenv()
@@ -44,21 +59,44 @@ DEFAULT_FIELDS = [
     "short_description", "impact", "urgency", "location", "incident_state"
 ]
 
+# How often an incremental sync checks which stored records its query still returns
+RECONCILE_SECONDS = float(os.getenv("SNOW_RECONCILE_SECONDS", "3600"))
+
+# Latency samples a client's RequestStats keeps (for percentiles in the load test)
+RECENT_LATENCIES = 10_000
+
 # Default query for MI by priority (P1/P2)
 DEFAULT_QUERY = "priorityIN1,2"
 
+# Known saved filter names and their queries
+SAVED_FILTERS = {
+    "PYTHON: MAJOR IM": "priorityIN1,2^location.u_region=EMEA^u_resolvedBETWEENjavascript:gs.dateGenerate('2025-01-01','00:00:00')@javascript:gs.endOfToday()",
+    "SIMPLE_P1_P2": "priorityIN1,2",
+    "EMEA_HIGH_PRIORITY": "location.u_region=EMEA^priorityIN1,2",
+}
+
+# Minimum source fields each headline KPI needs. ``priority`` is always fetched
+# because ``is_major`` is derived from it.
+KPI_FIELDS = {
+    "mttr_hours": ["opened_at", "u_resolved"],
+    "mi_count": [],
+    "p1_ratio": [],
+    "sites_impacted": ["location"],
+    "weekly": ["opened_at"],
+}
+
+
+def kpi_fields(kpis: list[str] | None = None) -> list[str]:
+    """Projection (``sysparm_fields``) covering ``kpis`` (default: every headline KPI)."""
+    fields = ["priority"]
+    for kpi in kpis or KPI_FIELDS:
+        fields.extend(KPI_FIELDS[kpi])
+    return list(dict.fromkeys(fields))
+
 def get_saved_filter_query(filter_name: str = "PYTHON: MAJOR IM") -> str:
     """Get query from saved filter - best practice approach"""
-
-    # Map of known saved filter names to their queries
-    saved_filters = {
-        "PYTHON: MAJOR IM": "priorityIN1,2^location.u_region=EMEA^u_resolvedBETWEENjavascript:gs.dateGenerate('2025-01-01','00:00:00')@javascript:gs.endOfToday()",
-        "SIMPLE_P1_P2": "priorityIN1,2",
-        "EMEA_HIGH_PRIORITY": "location.u_region=EMEA^priorityIN1,2"
-    }
-
-    if filter_name in saved_filters:
-        return saved_filters[filter_name]
+    if filter_name in SAVED_FILTERS:
+        return SAVED_FILTERS[filter_name]
     else:
         # Fallback to default query
         print(f"⚠️ Saved filter '{filter_name}' not found, using default query")
@@ -121,16 +159,217 @@ def _get_auth_headers() -> dict[str, str]:
         raise ValueError("No authentication provided. Set SNOW_USERNAME/SNOW_PASSWORD or OAuth creds.")
     return headers
 
-def fetch_incidents(query: str | None = None, fields: list[str] | None = None, page_size: int = 500, use_saved_filter: bool = True) -> list[dict[str, Any]]:
+@dataclass
+class RequestStats:
+    """Running request totals for a SnowClient (thread-safe).
+
+    Long-lived clients record every request for the life of the process, so only
+    the totals and the latest ``RECENT_LATENCIES`` latencies are kept.
     """
-    Fetch incidents using the ServiceNow Table API with paging and retry/backoff.
-    Supports Basic Auth (default) and OAuth (if token provided).
+
+    requests: int = 0
+    total_latency: float = 0.0
+    max_latency: float = 0.0
+    body_bytes: int = 0
+    wire_bytes: int = 0
+    statuses: Counter[int] = field(default_factory=Counter)
+    latencies: deque[float] = field(default_factory=lambda: deque(maxlen=RECENT_LATENCIES))
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def record(self, latency: float, body: int, wire: int, status: int) -> None:
+        with self._lock:
+            self.requests += 1
+            self.total_latency += latency
+            self.max_latency = max(self.max_latency, latency)
+            self.body_bytes += body
+            self.wire_bytes += wire
+            self.statuses[status] += 1
+            self.latencies.append(latency)
+
+    def summary(self) -> dict[str, float]:
+        """Aggregate view: request count, mean/max latency (s) and total bytes."""
+        with self._lock:
+            n = self.requests
+            return {
+                "requests": n,
+                "mean_latency_s": self.total_latency / n if n else 0.0,
+                "max_latency_s": self.max_latency,
+                "body_bytes": self.body_bytes,
+                "wire_bytes": self.wire_bytes,
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self.requests = self.body_bytes = self.wire_bytes = 0
+            self.total_latency = self.max_latency = 0.0
+            self.statuses.clear()
+            self.latencies.clear()
+
+
+class SnowClient:
+    """Reusable ServiceNow Table API client.
+
+    Owns a pooled keep-alive ``requests.Session`` and resolves the instance URL,
+    table and auth once, so paging does not pay a TCP+TLS handshake or a
+    ``load_dotenv()`` per request. Safe to share between threads and reruns.
 
     Args:
-        query: ServiceNow query string. If None and use_saved_filter=True, uses saved filter.
-        fields: List of fields to retrieve
-        page_size: Number of records per page
-        use_saved_filter: Whether to use saved filter if no query provided
+        base_url: Table API root, e.g. ``https://<instance>.service-now.com/api/now/table``.
+            Defaults to one built from SNOW_INSTANCE.
+        table: Table name. Defaults to SNOW_TABLE (or ``incident``).
+        pool_size: Maximum keep-alive connections held per host.
+        timeout: Per-request timeout in seconds.
+        limiter: Request budget; defaults to the process-wide bucket for the instance
+            (see ``src.rate_limit``), shared with every other client in the process.
+    """
+
+    def __init__(self, base_url: str | None = None, table: str | None = None, pool_size: int = 10,
+                 timeout: float = 60, limiter: TokenBucket | None = None) -> None:
+        self.base_url = (base_url or _get_snow_base()).rstrip("/")
+        self.table = table or _get_table()
+        self.timeout = timeout
+        self.stats = RequestStats()
+        self.limiter = limiter or limiter_for(self.base_url)
+
+        headers = _get_auth_headers()
+        headers["Accept-Encoding"] = "gzip, deflate"
+        creds = _get_credentials()
+
+        self.session = requests.Session()
+        self.session.headers.update(headers)
+        # Prefer Basic Auth unless you actually obtained a Bearer token
+        if creds["username"] and creds["password"]:
+            self.session.auth = (creds["username"], creds["password"])
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    @property
+    def table_url(self) -> str:
+        return f"{self.base_url}/{self.table}"
+
+    @property
+    def stats_url(self) -> str:
+        """Aggregate API endpoint for the table (``/api/now/stats/<table>``)."""
+        root = self.base_url[: -len("/table")] if self.base_url.endswith("/table") else self.base_url
+        return f"{root}/stats/{self.table}"
+
+    def get(self, url: str, params: dict[str, str] | None = None) -> requests.Response:
+        """GET through the pooled session, recording latency and payload size."""
+        start = time.perf_counter()
+        resp = self.session.get(url, params=params, timeout=self.timeout)
+        body = len(resp.content)
+        try:
+            wire = int(resp.raw.tell()) or body
+        except (AttributeError, TypeError, ValueError):
+            wire = body
+        latency = time.perf_counter() - start
+        self.stats.record(latency, body, wire, resp.status_code)
+        if instrument.enabled():
+            instrument.count("snow.requests")
+            instrument.count("snow.body_bytes", body)
+            instrument.count("snow.wire_bytes", wire)
+            instrument.record("snow.request", latency, status=resp.status_code,
+                              offset=(params or {}).get("sysparm_offset"), wire_bytes=wire)
+        return resp
+
+    def close(self) -> None:
+        self.session.close()
+
+    def __enter__(self) -> SnowClient:
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+
+MAX_RETRIES = 5
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class _BackoffGate:
+    """Shared pause point so a Retry-After seen by one worker holds back all workers."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._resume_at = 0.0
+
+    def pause(self, seconds: float) -> None:
+        with self._lock:
+            self._resume_at = max(self._resume_at, time.monotonic() + seconds)
+
+    def wait(self) -> None:
+        while True:
+            with self._lock:
+                delay = self._resume_at - time.monotonic()
+            if delay <= 0:
+                return
+            instrument.sleep(delay, "snow.backoff_gate")
+
+
+def _get_page(client: SnowClient, params: dict[str, str],
+              gate: _BackoffGate) -> tuple[list[dict[str, Any]], int | None]:
+    """Fetch one page with retry/backoff; returns the rows and the X-Total-Count header (if sent)."""
+    with instrument.span("snow.page", offset=params.get("sysparm_offset")) as page_span:
+        rows, total, attempts = _get_page_with_retries(client, params, gate)
+        page_span.set(rows=len(rows), attempts=attempts)
+    return rows, total
+
+
+def _get_page_with_retries(client: SnowClient, params: dict[str, str], gate: _BackoffGate,
+                           url: str | None = None,
+                           fatal_statuses: tuple[int, ...] = ()) -> tuple[list[dict[str, Any]], int | None, int]:
+    for attempt in range(1, MAX_RETRIES + 1):
+        if attempt > 1:
+            instrument.count("snow.retries")
+        gate.wait()
+        client.limiter.acquire()
+        try:
+            resp = client.get(url or client.table_url, params=params)
+            if resp.status_code in fatal_statuses:
+                resp.raise_for_status()
+            # Backoff for rate limiting / transient server errors
+            if resp.status_code in RETRY_STATUSES:
+                instrument.count(f"snow.retry_status.{resp.status_code}")
+                retry_after = resp.headers.get("Retry-After")
+                if retry_after and retry_after.isdigit():
+                    wait = int(retry_after)
+                    client.limiter.pause(wait)  # the instance asked every caller to hold off
+                else:
+                    wait = min(60, 2 ** attempt)
+                gate.pause(wait)
+                gate.wait()
+                if attempt < MAX_RETRIES:
+                    continue
+            resp.raise_for_status()
+
+            total = resp.headers.get("X-Total-Count")
+            with instrument.span("snow.json_decode"):
+                rows = resp.json().get("result", [])
+            return rows, int(total) if (total and total.isdigit()) else None, attempt
+        except requests.exceptions.HTTPError as e:
+            if e.response is not None and e.response.status_code == 401:
+                raise Exception("Authentication failed (401). Check SNOW creds/roles.") from e
+            if e.response is not None and e.response.status_code in fatal_statuses:
+                raise
+            if attempt >= MAX_RETRIES:
+                raise
+            instrument.sleep(min(60, 2 ** attempt), "snow.backoff")
+        except requests.RequestException:
+            if attempt >= MAX_RETRIES:
+                raise
+            instrument.sleep(min(60, 2 ** attempt), "snow.backoff")
+    raise RuntimeError("unreachable")  # pragma: no cover
+
+
+def iter_incident_pages(query: str | None = None, fields: list[str] | None = None, page_size: int = 500,
+                        use_saved_filter: bool = True, concurrency: int = 1,
+                        client: SnowClient | None = None) -> Iterator[list[dict[str, Any]]]:
+    """Yield pages of incidents (in offset order) as soon as each one arrives.
+
+    Takes the same arguments as ``fetch_incidents``. Only the current page, plus at
+    most ``concurrency`` pages in flight, is held in memory, so callers that convert
+    or write each page before pulling the next run in bounded memory.
     """
     # Use saved filter by default (best practice)
     if query is None and use_saved_filter:
@@ -138,57 +377,199 @@ def fetch_incidents(query: str | None = None, fields: list[str] | None = None, p
         print("🔍 Using saved filter: PYTHON: MAJOR IM")
 
     fields = fields or DEFAULT_FIELDS
-    offset = 0
-    results: list[dict[str, Any]] = []
-    headers = _get_auth_headers()
+    if client is None:
+        with SnowClient(pool_size=max(1, concurrency)) as own_client:
+            yield from iter_incident_pages(query, fields, page_size, use_saved_filter=False,
+                                           concurrency=concurrency, client=own_client)
+        return
 
-    # Prefer Basic Auth unless you actually obtained a Bearer token
-    creds = _get_credentials()
-    auth = (creds["username"], creds["password"]) if (creds["username"] and creds["password"]) else None
+    gate = _BackoffGate()
 
-    MAX_RETRIES = 5
-    while True:
+    def page(offset: int) -> tuple[list[dict[str, Any]], int | None]:
         params = {
-            "sysparm_query": query,
+            "sysparm_query": query or "",
             "sysparm_display_value": "false",
             "sysparm_exclude_reference_link": "true",
             "sysparm_fields": ",".join(fields),
             "sysparm_limit": str(page_size),
             "sysparm_offset": str(offset),
         }
-
-        for attempt in range(1, MAX_RETRIES + 1):
+        return _get_page(client, params, gate)
+
+    chunk, total = page(0)
+    if chunk:
+        yield chunk
+    if len(chunk) < page_size:
+        return  # single page
+    offset = page_size
+
+    if concurrency > 1 and total is not None and total > offset:
+        offsets = iter(range(offset, total, page_size))
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            # Keep a bounded window in flight and yield strictly in submission order
+            pending = deque(pool.submit(page, off) for off in islice(offsets, concurrency))
             try:
-                resp = requests.get(
-                    f"{_get_snow_base()}/{_get_table()}",
-                    headers=headers,
-                    params=params,
-                    auth=auth,
-                    timeout=60,
-                )
-                # Backoff for rate limiting / transient server errors
-                if resp.status_code in (429, 500, 502, 503, 504):
-                    retry_after = resp.headers.get("Retry-After")
-                    wait = int(retry_after) if (retry_after and retry_after.isdigit()) else min(60, 2 ** attempt)
-                    time.sleep(wait)
-                    if attempt < MAX_RETRIES:
-                        continue
-                resp.raise_for_status()
+                while pending:
+                    chunk = pending.popleft().result()[0]
+                    nxt = next(offsets, None)
+                    if nxt is not None:
+                        pending.append(pool.submit(page, nxt))
+                    if chunk:
+                        yield chunk
+                    offset += page_size
+            finally:
+                for future in pending:
+                    future.cancel()
+        if len(chunk) < page_size:
+            return
+        # Records were added after the count was taken; walk the tail sequentially
 
-                chunk = resp.json().get("result", [])
-                results.extend(chunk)
-                if len(chunk) < page_size:
-                    return results  # no more pages
-                offset += page_size
-                time.sleep(0.2)  # polite pacing
-                break  # success -> next page
-            except requests.exceptions.HTTPError as e:
-                if e.response is not None and e.response.status_code == 401:
-                    raise Exception("Authentication failed (401). Check SNOW creds/roles.") from e
-                if attempt >= MAX_RETRIES:
-                    raise
-                time.sleep(min(60, 2 ** attempt))
-            except requests.RequestException:
-                if attempt >= MAX_RETRIES:
-                    raise
-                time.sleep(min(60, 2 ** attempt))
+    while True:
+        instrument.sleep(0.2, "snow.pacing")  # polite pacing
+        chunk, _ = page(offset)
+        if chunk:
+            yield chunk
+        if len(chunk) < page_size:
+            return  # no more pages
+        offset += page_size
+
+
+def fetch_incidents(query: str | None = None, fields: list[str] | None = None, page_size: int = 500,
+                    use_saved_filter: bool = True, concurrency: int = 1,
+                    client: SnowClient | None = None,
+                    store: IncidentStore | None = None,
+                    slice_rows: int | None = None) -> list[dict[str, Any]]:
+    """
+    Fetch incidents using the ServiceNow Table API with paging and retry/backoff.
+    Supports Basic Auth (default) and OAuth (if token provided).
+
+    Args:
+        query: ServiceNow query string. If None and use_saved_filter=True, uses saved filter.
+        fields: List of fields to retrieve
+        page_size: Number of records per page
+        use_saved_filter: Whether to use saved filter if no query provided
+        concurrency: Maximum number of pages fetched in parallel. With 1 (default) pages are
+            walked one at a time; above 1 the first page's X-Total-Count is used to fetch the
+            remaining offsets on a thread pool. Rows are returned in offset order either way.
+        client: Shared SnowClient to reuse pooled connections; a temporary one is created
+            (and closed) when omitted.
+        store: Local IncidentStore for incremental sync. Only records with
+            ``sys_updated_on`` at or after the store's high-water mark for this query are
+            requested; they are upserted and every stored record for the query is returned.
+        slice_rows: Fetch a date-bounded query (e.g. ``u_resolvedBETWEEN...``) as time slices
+            of at most about this many records, ``concurrency`` slices at a time, with
+            per-slice retries and on-disk checkpoints (see ``src.time_slices``). Queries
+            without a date range are paged as usual.
+    """
+    # Use saved filter by default (best practice)
+    if query is None and use_saved_filter:
+        query = get_saved_filter_query("PYTHON: MAJOR IM")
+        print("🔍 Using saved filter: PYTHON: MAJOR IM")
+
+    fields = fields or DEFAULT_FIELDS
+    if store is not None:
+        return _sync_incidents(store, query or "", fields, page_size, concurrency, client, slice_rows)
+    if slice_rows and query:
+        from src.time_slices import fetch_time_sliced
+
+        sliced = fetch_time_sliced(query, fields, page_size, concurrency, slice_rows, client=client)
+        if sliced is not None:
+            return sliced
+
+    results: list[dict[str, Any]] = []
+    with instrument.span("snow.fetch_incidents", concurrency=concurrency, page_size=page_size) as fetch_span:
+        for chunk in iter_incident_pages(query, fields, page_size, use_saved_filter=False,
+                                         concurrency=concurrency, client=client):
+            results.extend(chunk)
+        fetch_span.set(rows=len(results))
+    return results
+
+
+class StatsUnavailable(Exception):
+    """The Aggregate API is disabled or not permitted for this user/table."""
+
+
+def fetch_stats(query: str, group_by: list[str] | None = None,
+                client: SnowClient | None = None) -> list[dict[str, Any]]:
+    """Record counts from the ServiceNow Aggregate API (``/api/now/stats``).
+
+    Returns one ``{"count": int, <group field>: value, ...}`` dict per group (a single
+    dict when ``group_by`` is empty). Group values are raw values (``sys_id`` for
+    references). Raises ``StatsUnavailable`` when the endpoint is missing or not
+    permitted (400/403/404), so callers can fall back to fetching rows.
+    """
+    if client is None:
+        with SnowClient() as own_client:
+            return fetch_stats(query, group_by, own_client)
+
+    params = {"sysparm_query": query, "sysparm_count": "true"}
+    if group_by:
+        params["sysparm_group_by"] = ",".join(group_by)
+    try:
+        with instrument.span("snow.stats", group_by=",".join(group_by or [])):
+            result, _, _ = _get_page_with_retries(client, params, _BackoffGate(), url=client.stats_url,
+                                                  fatal_statuses=(400, 403, 404))
+    except requests.exceptions.HTTPError as e:
+        raise StatsUnavailable(str(e)) from e
+    groups = result if isinstance(result, list) else [result]
+    out = []
+    for group in groups:
+        row: dict[str, Any] = {"count": int((group.get("stats") or {}).get("count") or 0)}
+        for grouped in group.get("groupby_fields") or []:
+            row[grouped.get("field")] = grouped.get("value", "")
+        out.append(row)
+    return out
+
+
+def _updated_since(high_water: str) -> str:
+    """Encoded-query clause for records updated at/after a ``YYYY-MM-DD HH:MM:SS`` mark."""
+    day, _, clock = high_water.partition(" ")
+    return f"sys_updated_on>=javascript:gs.dateGenerate('{day}','{clock or '00:00:00'}')"
+
+
+def delta_query(store: IncidentStore, query: str) -> str:
+    """``query`` limited to records updated since its high-water mark in ``store``."""
+    high_water = store.high_water_mark(query)
+    if not high_water:
+        return query
+    # >= rather than > so same-second updates are not lost; the upsert absorbs repeats
+    return f"{query}^{_updated_since(high_water)}" if query else _updated_since(high_water)
+
+
+def _sync_incidents(store: IncidentStore, query: str, fields: list[str], page_size: int,
+                    concurrency: int, client: SnowClient | None,
+                    slice_rows: int | None = None) -> list[dict[str, Any]]:
+    """Delta-sync ``query`` into ``store`` and return the stored result set."""
+    # sys_id/sys_updated_on identify rows and drive the high-water mark
+    fields = list(dict.fromkeys([*fields, "sys_id", "sys_updated_on"]))
+    full_sync = store.high_water_mark(query) is None
+    changed = fetch_incidents(delta_query(store, query), fields, page_size, use_saved_filter=False,
+                              concurrency=concurrency, client=client, slice_rows=slice_rows)
+    store.upsert(query, changed)
+    reconcile_members(store, query, page_size, concurrency, client, changed if full_sync else None)
+    return store.records(query)
+
+
+def reconcile_members(store: IncidentStore, query: str, page_size: int, concurrency: int,
+                      client: SnowClient | None, full_result: list[dict[str, Any]] | None = None,
+                      fetch_keys: Callable[[str, list[str]], list[dict[str, Any]]] | None = None) -> None:
+    """Drop stored members of ``query`` it no longer returns server-side (e.g. downgraded from P1).
+
+    A delta sync never sees those records. ``full_result`` (the rows of a full
+    sync) is used as it is; otherwise, every ``RECONCILE_SECONDS``, the keys the
+    query returns are fetched without their data. ``fetch_keys(query, fields)``
+    replaces the paged fetch on ``client`` for that (e.g. the asyncio client).
+    """
+    from src.store import record_key
+
+    if full_result is None:
+        last = store.reconciled_at(query)
+        if last is not None and time.time() - last < RECONCILE_SECONDS:
+            return
+        if fetch_keys is not None:
+            full_result = fetch_keys(query, ["sys_id", "number"])
+        else:
+            full_result = fetch_incidents(query, ["sys_id", "number"], page_size, use_saved_filter=False,
+                                          concurrency=concurrency, client=client)
+    dropped = store.reconcile(query, (k for k in map(record_key, full_result) if k is not None))
+    instrument.count("store.reconciled_drops", dropped)
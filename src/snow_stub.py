@@ -0,0 +1,352 @@
+"""Local stand-in for the ServiceNow Table API, for offline load and latency testing.
+
+Serves ``GET /api/now/table/<table>`` from an in-memory frame of raw (string)
+incident rows, honouring ``sysparm_limit``/``sysparm_offset``/``sysparm_fields``
+and a subset of ``sysparm_query``, and sending ``X-Total-Count`` like the real
+instance, and ``GET /api/now/stats/<table>`` (Aggregate API counts with
+``sysparm_group_by``). Latency, rate limiting (429 + Retry-After) and 5xx errors can be
+injected to exercise the client's paging, concurrency and backoff.
+
+Run standalone:  python -m src.snow_stub --rows 100000 --port 8080 --latency-ms 80
+"""
+from __future__ import annotations
+
+import argparse
+import gzip
+import json
+import math
+import random
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import pandas as pd
+
+from src.local_query import UnsupportedQuery, parse_clause
+from src.time_slices import SN_FORMAT, resolve_date
+
+
+@dataclass
+class StubConfig:
+    """Fault and latency injection knobs.
+
+    Args:
+        latency_ms: Fixed service time added to every response.
+        jitter_ms: Extra uniformly distributed delay (0..jitter_ms) per response.
+        rate_limit: Sustained requests/second before answering 429 (token bucket); None disables.
+        burst: Token bucket size; defaults to ``max(1, rate_limit)``.
+        throttle_rate: Probability of a 429 regardless of the bucket.
+        error_rate: Probability of an injected 5xx.
+        error_statuses: Statuses the injected errors are drawn from.
+        retry_after: Retry-After seconds sent with injected 429/503 responses.
+        gzip: Compress bodies when the client sends ``Accept-Encoding: gzip``.
+        stats_api: Serve the Aggregate API; when False it answers 403 like an instance
+            where the user lacks the role.
+        seed: Seed for the injection RNG.
+    """
+
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    rate_limit: float | None = None
+    burst: float | None = None
+    throttle_rate: float = 0.0
+    error_rate: float = 0.0
+    error_statuses: tuple[int, ...] = (500, 502, 503)
+    retry_after: int = 1
+    gzip: bool = True
+    stats_api: bool = True
+    seed: int = 0
+
+
+def _resolve_value(value: str) -> str:
+    """A ``javascript:gs.*`` date helper as ``YYYY-MM-DD HH:MM:SS`` (UTC, like ``resolve_date``)."""
+    if not value.startswith("javascript:"):
+        return value
+    when = resolve_date(value)
+    return when.strftime(SN_FORMAT) if when is not None else value
+
+
+def _compare(col: pd.Series, op: str, value: str) -> pd.Series:
+    try:
+        number = float(value)
+    except ValueError:
+        number = None
+    if number is not None:
+        numeric = pd.to_numeric(col, errors="coerce")
+        if numeric.notna().any():
+            col, value = numeric, number  # type: ignore[assignment]
+    if op == ">=":
+        return col >= value
+    if op == "<=":
+        return col <= value
+    if op == ">":
+        return col > value
+    return col < value
+
+
+class SnowStub:
+    """Threaded HTTP server answering Table API requests for one table.
+
+    Use as a context manager; ``base_url`` is what ``SnowClient(base_url=...)`` expects.
+    Clauses the stub cannot evaluate (dot-walked fields, ``^OR``/``^NQ`` groups,
+    unknown fields) are skipped, like an instance with invalid-query filtering
+    off, and recorded in ``ignored_clauses``.
+    """
+
+    def __init__(self, data: pd.DataFrame, table: str = "incident", config: StubConfig | None = None,
+                 host: str = "127.0.0.1", port: int = 0) -> None:
+        self.data = data.reset_index(drop=True)
+        self.table = table
+        self.config = config or StubConfig()
+        self.ignored_clauses: set[str] = set()
+        self.counters = {"requests": 0, "ok": 0, "throttled": 0, "errors": 0, "rows": 0}
+        self._lock = threading.Lock()
+        self._rng = random.Random(self.config.seed)
+        self._filtered: OrderedDict[str, pd.DataFrame] = OrderedDict()
+        self._bucket_size = self.config.burst or max(1.0, self.config.rate_limit or 0.0)
+        self._tokens = self._bucket_size
+        self._refilled_at = time.monotonic()
+        self._host = host
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread: threading.Thread | None = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self._host}:{self._server.server_port}/api/now/table"
+
+    def start(self) -> SnowStub:
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self) -> None:
+        """Serve on the calling thread until interrupted."""
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+
+    def stop(self) -> None:
+        if self._thread is not None:
+            # shutdown() blocks until serve_forever() returns, so only call it once serving
+            self._server.shutdown()
+            self._thread.join()
+            self._thread = None
+        self._server.server_close()
+
+    def __enter__(self) -> SnowStub:
+        return self.start()
+
+    def __exit__(self, *exc: object) -> None:
+        self.stop()
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return dict(self.counters)
+
+    def _count(self, key: str, n: int = 1) -> None:
+        with self._lock:
+            self.counters[key] += n
+
+    # -- query evaluation -------------------------------------------------
+    def _clause_mask(self, clause: str) -> pd.Series | None:
+        try:
+            parsed = parse_clause(clause)
+        except UnsupportedQuery:
+            return None
+        if parsed.field not in self.data.columns:
+            return None
+        col = self.data[parsed.field].fillna("")
+        op, value = parsed.op, _resolve_value(parsed.value)
+        if op == "ISNOTEMPTY":
+            return col != ""
+        if op == "ISEMPTY":
+            return col == ""
+        if op in ("IN", "NOT IN"):
+            hit = col.isin(value.split(","))
+            return hit if op == "IN" else ~hit
+        if op == "=":
+            return col == value
+        if op == "!=":
+            return col != value
+        if op == "BETWEEN":
+            low, _, high = value.partition("@")
+            return (col >= _resolve_value(low)) & (col <= _resolve_value(high)) & (col != "")
+        return _compare(col, op, value) & (col != "")
+
+    def matching(self, query: str) -> pd.DataFrame:
+        """Rows matching ``query`` (memoised: every page of a walk repeats the same query)."""
+        with self._lock:
+            cached = self._filtered.get(query)
+            if cached is not None:
+                self._filtered.move_to_end(query)
+                return cached
+        mask = pd.Series(True, index=self.data.index)
+        clauses = [c for c in query.split("^") if c]
+        for i, clause in enumerate(clauses):
+            if clause.startswith("NQ"):
+                self.ignored_clauses.update(clauses[i:])
+                break
+            # Skip OR groups whole (including the clause the first ^OR attaches to),
+            # parenthesised groups and ^NQ queries (above); applying part of one would over-filter
+            in_or_group = i + 1 < len(clauses) and clauses[i + 1].startswith("OR")
+            if in_or_group or clause.startswith(("OR", "(")):
+                self.ignored_clauses.add(clause)
+                continue
+            clause_mask = self._clause_mask(clause)
+            if clause_mask is None:
+                self.ignored_clauses.add(clause)
+            else:
+                mask &= clause_mask
+        result = self.data[mask]
+        with self._lock:
+            self._filtered[query] = result
+            while len(self._filtered) > 16:
+                self._filtered.popitem(last=False)
+        return result
+
+    # -- fault injection ------------------------------------------------
+    def _throttle_wait(self) -> float | None:
+        """Seconds until a token is free if this request should be rate-limited, else None."""
+        cfg = self.config
+        with self._lock:
+            if cfg.throttle_rate and self._rng.random() < cfg.throttle_rate:
+                return float(cfg.retry_after)
+            if not cfg.rate_limit:
+                return None
+            now = time.monotonic()
+            self._tokens = min(self._bucket_size, self._tokens + (now - self._refilled_at) * cfg.rate_limit)
+            self._refilled_at = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return None
+            return (1 - self._tokens) / cfg.rate_limit
+
+    def _injected_error(self) -> int | None:
+        cfg = self.config
+        with self._lock:
+            if cfg.error_rate and self._rng.random() < cfg.error_rate:
+                return self._rng.choice(cfg.error_statuses)
+            return None
+
+    def _delay(self) -> float:
+        cfg = self.config
+        with self._lock:
+            jitter = self._rng.uniform(0, cfg.jitter_ms) if cfg.jitter_ms else 0.0
+        return (cfg.latency_ms + jitter) / 1000
+
+    def _handler(self) -> type[BaseHTTPRequestHandler]:
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, so the client's connection pool is exercised
+
+            def log_message(self, format: str, *args: object) -> None:  # noqa: A002
+                pass
+
+            def _send(self, status: int, payload: dict, headers: dict[str, str] | None = None) -> None:
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                if stub.config.gzip and "gzip" in self.headers.get("Accept-Encoding", ""):
+                    body = gzip.compress(body, compresslevel=1)
+                    self.send_header("Content-Encoding", "gzip")
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self) -> None:  # noqa: N802
+                stub._count("requests")
+                delay = stub._delay()
+                if delay:
+                    time.sleep(delay)
+                url = urlsplit(self.path)
+                prefix, _, table = url.path.rstrip("/").rpartition("/")
+                if prefix not in ("/api/now/table", "/api/now/stats") or table != stub.table:
+                    self._send(404, {"error": {"message": "Invalid table", "detail": url.path}})
+                    return
+
+                wait = stub._throttle_wait()
+                if wait is not None:
+                    stub._count("throttled")
+                    self._send(429, {"error": {"message": "Rate limit exceeded"}},
+                               {"Retry-After": str(max(0, math.ceil(wait)))})
+                    return
+                status = stub._injected_error()
+                if status is not None:
+                    stub._count("errors")
+                    headers = {"Retry-After": str(stub.config.retry_after)} if status == 503 else None
+                    self._send(status, {"error": {"message": "Injected failure"}}, headers)
+                    return
+
+                params = {k: v[-1] for k, v in parse_qs(url.query, keep_blank_values=True).items()}
+                if prefix == "/api/now/stats":
+                    self._stats(params)
+                    return
+                try:
+                    limit = int(params.get("sysparm_limit") or 10_000)
+                    offset = int(params.get("sysparm_offset") or 0)
+                except ValueError:
+                    self._send(400, {"error": {"message": "Invalid sysparm_limit/sysparm_offset"}})
+                    return
+                rows = stub.matching(params.get("sysparm_query", ""))
+                fields = [f for f in params.get("sysparm_fields", "").split(",") if f in rows.columns]
+                page = rows.iloc[offset:offset + limit]
+                if fields:
+                    page = page[fields]
+                stub._count("ok")
+                stub._count("rows", len(page))
+                self._send(200, {"result": page.to_dict("records")}, {"X-Total-Count": str(len(rows))})
+
+            def _stats(self, params: dict[str, str]) -> None:
+                if not stub.config.stats_api:
+                    self._send(403, {"error": {"message": "User Not Authorized"}})
+                    return
+                rows = stub.matching(params.get("sysparm_query", ""))
+                group_by = [f for f in params.get("sysparm_group_by", "").split(",") if f]
+                missing = [f for f in group_by if f not in rows.columns]
+                if missing:
+                    self._send(400, {"error": {"message": f"Invalid group by field: {missing[0]}"}})
+                    return
+                stub._count("ok")
+                if not group_by:
+                    self._send(200, {"result": {"stats": {"count": str(len(rows))}}})
+                    return
+                counts = rows[group_by].fillna("").value_counts(sort=False)
+                result = [{"groupby_fields": [{"field": f, "value": str(v)} for f, v in zip(group_by, key)],
+                           "stats": {"count": str(n)}} for key, n in zip(counts.index.to_list(), counts.to_list())]
+                self._send(200, {"result": result})
+
+        return Handler
+
+
+def main(argv: list[str] | None = None) -> None:
+    from src.synthetic import generate_incidents
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=float, default=None)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args(argv)
+
+    config = StubConfig(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                        rate_limit=args.rate_limit, error_rate=args.error_rate)
+    stub = SnowStub(generate_incidents(args.rows), config=config, port=args.port)
+    print(f"Serving {args.rows:,} synthetic incidents at {stub.base_url}/incident (Ctrl+C to stop)")
+    try:
+        stub.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
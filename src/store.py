@@ -0,0 +1,184 @@
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections.abc import Iterable
+from typing import Any
+
+DEFAULT_STORE_PATH = os.path.join("data", "incidents.sqlite")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS incidents (
+    key TEXT PRIMARY KEY,
+    number TEXT,
+    sys_updated_on TEXT,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS query_members (
+    query TEXT NOT NULL,
+    key TEXT NOT NULL,
+    PRIMARY KEY (query, key)
+);
+CREATE TABLE IF NOT EXISTS sync_state (
+    query TEXT PRIMARY KEY,
+    high_water TEXT
+);
+CREATE TABLE IF NOT EXISTS reconcile_state (
+    query TEXT PRIMARY KEY,
+    reconciled_at REAL NOT NULL
+);
+"""
+
+
+def record_key(record: dict[str, Any]) -> str | None:
+    """Stable identity for an incident: sys_id when fetched, else the INC number."""
+    return record.get("sys_id") or record.get("number") or None
+
+
+class IncidentStore:
+    """SQLite-backed local copy of fetched incidents.
+
+    Each record is stored once (keyed by ``sys_id``/``number``); the store also
+    remembers which query returned it and the highest ``sys_updated_on`` seen per
+    query, which drives incremental delta syncs in ``fetch_incidents``.
+
+    Records that stop matching a query server-side (e.g. downgraded from P1) are
+    not returned by a delta sync. ``reconcile`` drops them, given the keys the
+    query returns now; ``fetch_incidents`` does that periodically with a cheap
+    key-only fetch.
+    """
+
+    def __init__(self, path: str | os.PathLike[str] = DEFAULT_STORE_PATH) -> None:
+        self.path = os.fspath(path)
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        with self._conn:
+            self._conn.executescript(_SCHEMA)
+
+    def high_water_mark(self, query: str) -> str | None:
+        """Latest ``sys_updated_on`` synced for ``query`` (ServiceNow ``YYYY-MM-DD HH:MM:SS``, UTC)."""
+        with self._lock:
+            row = self._conn.execute("SELECT high_water FROM sync_state WHERE query = ?", (query,)).fetchone()
+        return row[0] if row else None
+
+    def upsert(self, query: str, records: list[dict[str, Any]], members_only: bool = False) -> int:
+        """Insert or replace ``records`` for ``query`` and advance its high-water mark.
+
+        With ``members_only`` the records (e.g. key-only rows of a view whose full
+        records come from a broader query) only mark which keys ``query`` returned;
+        stored data is left as it is.
+
+        Returns the number of records written.
+        """
+        rows = []
+        for rec in records:
+            key = record_key(rec)
+            if key is not None:
+                rows.append((key, rec.get("number"), rec.get("sys_updated_on") or None, json.dumps(rec)))
+        updated = [r[2] for r in rows if r[2]]
+
+        with self._lock, self._conn:
+            if not members_only:
+                self._conn.executemany(
+                    "INSERT INTO incidents (key, number, sys_updated_on, data) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT(key) DO UPDATE SET number = excluded.number, "
+                    "sys_updated_on = excluded.sys_updated_on, data = excluded.data",
+                    rows,
+                )
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO query_members (query, key) VALUES (?, ?)",
+                [(query, r[0]) for r in rows],
+            )
+            if updated:
+                # ServiceNow timestamps sort lexicographically, so MAX() is the newest
+                self._conn.execute(
+                    "INSERT INTO sync_state (query, high_water) VALUES (?, ?) "
+                    "ON CONFLICT(query) DO UPDATE SET high_water = MAX(COALESCE(high_water, ''), excluded.high_water)",
+                    (query, max(updated)),
+                )
+        return len(rows)
+
+    def records(self, query: str | None = None) -> list[dict[str, Any]]:
+        """Stored records, optionally limited to those returned by ``query``."""
+        with self._lock:
+            if query is None:
+                cur = self._conn.execute("SELECT data FROM incidents ORDER BY rowid")
+            else:
+                cur = self._conn.execute(
+                    "SELECT i.data FROM incidents i JOIN query_members m ON m.key = i.key "
+                    "WHERE m.query = ? ORDER BY i.rowid",
+                    (query,),
+                )
+            rows = cur.fetchall()
+        return [json.loads(r[0]) for r in rows]
+
+    def keys(self, query: str) -> set[str]:
+        """Keys (``record_key``) of the records returned by ``query``."""
+        with self._lock:
+            rows = self._conn.execute("SELECT key FROM query_members WHERE query = ?", (query,)).fetchall()
+        return {r[0] for r in rows}
+
+    def reconciled_at(self, query: str) -> float | None:
+        """When ``query``'s members were last reconciled (epoch seconds), or None."""
+        with self._lock:
+            row = self._conn.execute("SELECT reconciled_at FROM reconcile_state WHERE query = ?",
+                                     (query,)).fetchone()
+        return row[0] if row else None
+
+    def version(self, query: str) -> str:
+        """Identity of ``query``'s stored result set, e.g. to key a frame built from it.
+
+        It changes when a sync advances the high-water mark and also when a
+        reconcile drops members, which leaves the high-water mark where it was.
+        """
+        with self._lock:
+            count = self._conn.execute("SELECT COUNT(*) FROM query_members WHERE query = ?", (query,)).fetchone()[0]
+        return f"{self.high_water_mark(query) or ''}|{self.reconciled_at(query) or ''}|{count}"
+
+    def reconcile(self, query: str, keys: Iterable[str]) -> int:
+        """Keep only the members of ``query`` in ``keys`` (what the query returns now).
+
+        Records no query refers to any more are deleted. Returns the number of
+        members dropped.
+        """
+        with self._lock, self._conn:
+            self._conn.execute("CREATE TEMP TABLE IF NOT EXISTS current_keys (key TEXT PRIMARY KEY)")
+            self._conn.execute("DELETE FROM current_keys")
+            self._conn.executemany("INSERT OR IGNORE INTO current_keys (key) VALUES (?)", ((k,) for k in keys))
+            dropped = self._conn.execute(
+                "DELETE FROM query_members WHERE query = ? AND key NOT IN (SELECT key FROM current_keys)",
+                (query,),
+            ).rowcount
+            self._conn.execute("DELETE FROM incidents WHERE key NOT IN (SELECT key FROM query_members)")
+            self._conn.execute(
+                "INSERT INTO reconcile_state (query, reconciled_at) VALUES (?, ?) "
+                "ON CONFLICT(query) DO UPDATE SET reconciled_at = excluded.reconciled_at",
+                (query, time.time()),
+            )
+        return dropped
+
+    def reset(self, query: str | None = None) -> None:
+        """Forget the sync state for ``query`` (or everything) so the next sync is a full pull."""
+        with self._lock, self._conn:
+            if query is None:
+                self._conn.executescript("DELETE FROM incidents; DELETE FROM query_members; DELETE FROM sync_state; "
+                                         "DELETE FROM reconcile_state;")
+            else:
+                self._conn.execute("DELETE FROM query_members WHERE query = ?", (query,))
+                self._conn.execute("DELETE FROM sync_state WHERE query = ?", (query,))
+                self._conn.execute("DELETE FROM reconcile_state WHERE query = ?", (query,))
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self) -> IncidentStore:
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+import json
+import os
+from collections.abc import Iterator
+from typing import cast
+
+import numpy as np
+import pandas as pd
+
+PRIORITY_WEIGHTS = [0.03, 0.09, 0.28, 0.40, 0.20]  # P1..P5
+MEDIAN_RESOLVE_HOURS = {1: 4.0, 2: 10.0, 3: 30.0, 4: 60.0, 5: 120.0}
+CATEGORIES = ["Network", "Software", "Hardware", "Database", "Access", "Security", "Other"]
+CATEGORY_WEIGHTS = [0.22, 0.30, 0.15, 0.10, 0.12, 0.04, 0.07]
+STATES = ["1", "2", "3", "6", "7", "8"]  # New, In Progress, On Hold, Resolved, Closed, Canceled
+
+
+def _format_timestamps(ns: np.ndarray) -> np.ndarray:
+    """datetime64 -> ServiceNow ``YYYY-MM-DD HH:MM:SS`` strings ("" for NaT), vectorised."""
+    raw = np.datetime_as_string(ns.astype("datetime64[s]"), unit="s").astype("S19")
+    raw.view(np.uint8).reshape(len(raw), 19)[:, 10] = ord(" ")
+    out = raw.astype("U19").astype(object)
+    out[np.isnat(ns)] = ""
+    return out
+
+
+def generate_incidents(count: int, seed: int = 0, start: str = "2024-01-01", days: int = 365,
+                       locations: int = 2_000) -> pd.DataFrame:
+    """Synthetic incidents shaped like raw Table API rows (all values strings, as ServiceNow returns them).
+
+    Priorities are skewed towards P3/P4, resolution times are log-normal per
+    priority with a long tail (a few open for weeks, ~4% still unresolved) and
+    sites follow a Zipf-like popularity curve over ``locations`` names.
+    """
+    rng = np.random.default_rng(seed)
+    priority = rng.choice(np.arange(1, 6), size=count, p=PRIORITY_WEIGHTS)
+
+    opened = np.datetime64(start, "s") + rng.integers(0, days * 86_400, count).astype("timedelta64[s]")
+    median_hours = np.array([MEDIAN_RESOLVE_HOURS[p] for p in range(1, 6)])[priority - 1]
+    resolve_hours = rng.lognormal(np.log(median_hours), 1.1)
+    resolved = opened + (resolve_hours * 3_600).astype("timedelta64[s]")
+    unresolved = rng.random(count) < 0.04
+    resolved[unresolved] = np.datetime64("NaT")
+    closed = resolved + rng.integers(3_600, 3 * 86_400, count).astype("timedelta64[s]")
+    updated = np.where(unresolved, opened, closed) + rng.integers(0, 3_600, count).astype("timedelta64[s]")
+
+    rank = np.arange(1, locations + 1)
+    site_weights = 1.0 / rank**1.1
+    site = rng.choice(locations, size=count, p=site_weights / site_weights.sum())
+    site_names = np.char.add("Site ", np.char.zfill(np.arange(locations).astype(str), 4)).astype(object)
+
+    # Low-cardinality columns index into small object arrays so each distinct
+    # string object is created once, not once per row
+    digits = np.array([str(i) for i in range(10)], dtype=object)
+    states = np.array(STATES, dtype=object)
+    state = np.where(unresolved, states[rng.integers(0, 3, count)], states[rng.integers(3, 5, count)])
+    seq = np.arange(count)
+    numbers = np.char.add("INC", np.char.zfill((seq + 1_000_000).astype(str), 7)).astype(object)
+    sys_ids = np.char.add(
+        np.char.zfill(rng.integers(0, 2**63, count, dtype=np.int64).astype(str), 20),
+        np.char.zfill(seq.astype(str), 12),
+    ).astype(object)
+    category_idx = rng.choice(len(CATEGORIES), size=count, p=CATEGORY_WEIGHTS)
+    category = np.array(CATEGORIES, dtype=object)[category_idx]
+    descriptions = np.array([f"{c} issue at {n}" for c in CATEGORIES for n in site_names], dtype=object)
+
+    return pd.DataFrame({
+        "sys_id": sys_ids,
+        "number": numbers,
+        "priority": digits[priority],
+        "impact": digits[rng.integers(1, 4, count)],
+        "urgency": digits[rng.integers(1, 4, count)],
+        "opened_at": _format_timestamps(opened),
+        "u_resolved": _format_timestamps(resolved),
+        "closed_at": _format_timestamps(np.where(unresolved, np.datetime64("NaT"), closed)),
+        "sys_updated_on": _format_timestamps(updated),
+        "category": category,
+        "short_description": descriptions[category_idx * locations + site],
+        "location": site_names[site],
+        "incident_state": state,
+    })
+
+
+def to_records(df: pd.DataFrame) -> list[dict[str, str]]:
+    """Rows as Table API ``result`` dicts."""
+    return cast("list[dict[str, str]]", df.to_dict("records"))
+
+
+def iter_pages(df: pd.DataFrame, page_size: int = 500) -> Iterator[list[dict[str, str]]]:
+    """Yield ``result`` pages the way ``iter_incident_pages`` does."""
+    for start in range(0, len(df), page_size):
+        yield cast("list[dict[str, str]]", df.iloc[start:start + page_size].to_dict("records"))
+
+
+def write_json_pages(df: pd.DataFrame, directory: str | os.PathLike[str], page_size: int = 500) -> list[str]:
+    """Write Table API style ``{"result": [...]}`` page files; returns their paths in offset order."""
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for i, page in enumerate(iter_pages(df, page_size)):
+        path = os.path.join(directory, f"page_{i:06d}.json")
+        with open(path, "w", encoding="utf-8") as fh:
+            json.dump({"result": page}, fh)
+        paths.append(path)
+    return paths
+
+
+def write_csv(df: pd.DataFrame, path: str | os.PathLike[str]) -> str:
+    df.to_csv(path, index=False)
+    return os.fspath(path)
+
+
+def write_parquet(df: pd.DataFrame, path: str | os.PathLike[str]) -> str:
+    df.to_parquet(path, index=False)
+    return os.fspath(path)
@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+import math
+from collections.abc import Iterable
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+SEARCH_COLUMNS = ["number", "short_description", "location", "category"]
+
+
+@dataclass(frozen=True)
+class TablePage:
+    """One page of the incident detail table, plus how many rows matched."""
+
+    rows: pd.DataFrame
+    total: int
+    page: int
+    pages: int
+
+
+def _search_mask(df: pd.DataFrame, search: str, columns: Iterable[str]) -> np.ndarray:
+    mask = np.zeros(len(df), dtype=bool)
+    for col in columns:
+        if col in df.columns:
+            s = df[col]
+            if isinstance(s.dtype, pd.CategoricalDtype):
+                # Match the (few) categories once, then map through the codes
+                hits = s.cat.categories.astype(str).str.contains(search, case=False, regex=False)
+                codes = s.cat.codes.to_numpy()
+                mask |= (codes >= 0) & np.append(hits, False)[codes]
+            else:
+                mask |= s.astype("string").str.contains(search, case=False, regex=False).to_numpy(
+                    dtype=bool, na_value=False)
+    return mask
+
+
+def page_frame(df: pd.DataFrame, page: int = 1, page_size: int = 50, search: str = "",
+               filters: dict[str, Iterable[object]] | None = None, sort_by: str | None = None,
+               ascending: bool = False, columns: list[str] | None = None,
+               search_columns: Iterable[str] = SEARCH_COLUMNS) -> TablePage:
+    """Filter, sort and slice ``df`` server-side so only one page is sent to the browser.
+
+    ``filters`` maps columns to allowed values; ``search`` is a case-insensitive
+    substring match over ``search_columns``. Sorting only orders the rows needed
+    up to the requested page when that is cheaper than a full sort.
+    """
+    mask = np.ones(len(df), dtype=bool)
+    for col, allowed in (filters or {}).items():
+        allowed = list(allowed)
+        if allowed and col in df.columns:
+            mask &= df[col].isin(allowed).to_numpy(dtype=bool, na_value=False)
+    if search:
+        mask &= _search_mask(df, search, search_columns)
+    view = df[mask] if not mask.all() else df
+
+    total = len(view)
+    pages = max(1, math.ceil(total / page_size))
+    page = min(max(1, page), pages)
+    start = (page - 1) * page_size
+
+    if sort_by and sort_by in view.columns:
+        needed = start + page_size
+        s = view[sort_by]
+        top = None
+        if needed < total // 4 and (pd.api.types.is_numeric_dtype(s) or pd.api.types.is_datetime64_any_dtype(s)):
+            positions = s.reset_index(drop=True)
+            top = positions.nsmallest(needed) if ascending else positions.nlargest(needed)
+        if top is not None and len(top) == needed:
+            view = view.iloc[top.index]
+        else:
+            view = view.sort_values(sort_by, ascending=ascending, kind="stable", na_position="last")
+    rows = view.iloc[start:start + page_size]
+    if columns:
+        rows = rows[[c for c in columns if c in rows.columns]]
+    return TablePage(rows=rows, total=total, page=page, pages=pages)
@@ -0,0 +1,345 @@
+"""Time-sliced parallel fetch for long date-bounded queries.
+
+Deep ``sysparm_offset`` paging gets slower the further the instance walks, and
+one failed page sinks the whole offset chain. ``fetch_time_sliced`` instead cuts
+the query's date range (e.g. the ``u_resolvedBETWEEN`` of the saved filter) into
+slices of at most ``max_rows`` records, bisecting wherever the count is higher,
+and fetches them in parallel as independent jobs with their own retries. Each
+finished slice is checkpointed to disk, so an interrupted backfill resumes with
+only the missing slices later the same day. Checkpoints are keyed on the
+resolved date bounds and the day. Relative dates (``gs.endOfToday()``) therefore
+get a fresh plan each day, and unfinished checkpoints from earlier days are
+discarded. Rows are de-duplicated by ``number``, since a record updated mid-run
+can move from one slice to another.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import shutil
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, timezone
+from typing import Any
+
+from src import instrument
+from src.snow_client import SnowClient, _BackoffGate, _get_page, fetch_incidents
+
+DEFAULT_CHECKPOINT_DIR = os.path.join("data", "slices")
+DEFAULT_SLICE_ROWS = 5_000
+MIN_SLICE = timedelta(minutes=1)
+SLICE_ATTEMPTS = 3
+SN_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+_DATE_CLAUSE = re.compile(r"^(?P<field>[a-z0-9_.]+?)(?P<op>BETWEEN|>=|<=|>|<)(?P<value>.+)$")
+_DATE_GENERATE = re.compile(r"^javascript:gs\.dateGenerate\('([^']*)'\s*,\s*'([^']*)'\)$")
+_ONE_SECOND = timedelta(seconds=1)
+
+
+def resolve_date(value: str, now: datetime | None = None) -> datetime | None:
+    """A query date value as a naive UTC datetime (None if it is not a date).
+
+    Understands ``javascript:gs.dateGenerate(...)``, ``gs.beginningOfToday()``,
+    ``gs.endOfToday()`` and literal ``YYYY-MM-DD[ HH:MM:SS]`` values.
+    """
+    value = value.strip()
+    for fmt in (SN_FORMAT, "%Y-%m-%d"):
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            pass
+    m = _DATE_GENERATE.match(value)
+    if m:
+        try:
+            return datetime.strptime(f"{m.group(1)} {m.group(2) or '00:00:00'}", SN_FORMAT)
+        except ValueError:
+            return None
+    today = (now or datetime.now(timezone.utc).replace(tzinfo=None)).replace(hour=0, minute=0, second=0,
+                                                                             microsecond=0)
+    if value == "javascript:gs.beginningOfToday()":
+        return today
+    if value == "javascript:gs.endOfToday()":
+        return today + timedelta(days=1) - _ONE_SECOND
+    return None
+
+
+def date_generate(value: datetime) -> str:
+    return f"javascript:gs.dateGenerate('{value:%Y-%m-%d}','{value:%H:%M:%S}')"
+
+
+@dataclass(frozen=True)
+class DateRange:
+    """The date bounds of an encoded query: ``start <= field < end``, plus the other clauses.
+
+    ``open_end`` means the query had no upper bound and ``end`` is "now".
+    """
+
+    field: str
+    start: datetime
+    end: datetime
+    rest: str
+    open_end: bool = False
+
+    def query(self, start: datetime, end: datetime) -> str:
+        bounds = f"{self.field}>={date_generate(start)}^{self.field}<{date_generate(end)}"
+        return f"{self.rest}^{bounds}" if self.rest else bounds
+
+
+def split_date_range(query: str, field: str | None = None, now: datetime | None = None) -> DateRange | None:
+    """Find the top-level date bounds of ``query`` (on ``field``, or the first bounded date field).
+
+    Understands ``BETWEEN a@b`` and ``>=``/``>``/``<=``/``<`` pairs; a missing upper
+    bound means "now". Returns None for queries that cannot be sliced safely:
+    no lower bound, ``^NQ`` queries, or bounds inside an ``^OR`` group.
+    """
+    clauses = query.split("^")
+    if any(c.startswith("NQ") for c in clauses):
+        return None
+    bounds: dict[str, dict[str, datetime]] = {}
+    used: dict[str, list[int]] = {}
+    for i, clause in enumerate(clauses):
+        m = _DATE_CLAUSE.match(clause)
+        if m is None or (i + 1 < len(clauses) and clauses[i + 1].startswith("OR")):
+            continue
+        name, op, value = m.group("field"), m.group("op"), m.group("value")
+        if field is not None and name != field:
+            continue
+        found = bounds.setdefault(name, {})
+        if op == "BETWEEN":
+            low, _, high = value.partition("@")
+            start, end = resolve_date(low, now), resolve_date(high, now)
+            if start is None or end is None:
+                continue
+            found["start"], found["end"] = start, end + _ONE_SECOND
+        else:
+            at = resolve_date(value, now)
+            if at is None:
+                continue
+            key = "start" if op in (">=", ">") else "end"
+            found[key] = at + _ONE_SECOND if op in (">", "<=") else at
+        used.setdefault(name, []).append(i)
+
+    for name, found in bounds.items():
+        if "start" in found:
+            end = found.get("end") or (now or datetime.now(timezone.utc).replace(tzinfo=None)) + _ONE_SECOND
+            rest = "^".join(c for i, c in enumerate(clauses) if i not in used[name] and c)
+            return DateRange(name, found["start"], max(end, found["start"]), rest, "end" not in found)
+    return None
+
+
+@dataclass(frozen=True)
+class TimeSlice:
+    start: datetime
+    end: datetime  # exclusive
+    rows: int | None = None  # count when planned
+
+    @property
+    def name(self) -> str:
+        return f"{self.start:%Y%m%dT%H%M%S}-{self.end:%Y%m%dT%H%M%S}"
+
+
+def count_records(query: str, client: SnowClient) -> int | None:
+    """Records matching ``query``, from X-Total-Count of a one-row page."""
+    params = {"sysparm_query": query, "sysparm_fields": "sys_id", "sysparm_limit": "1", "sysparm_offset": "0"}
+    return _get_page(client, params, _BackoffGate())[1]
+
+
+def plan_slices(dates: DateRange, client: SnowClient, max_rows: int = DEFAULT_SLICE_ROWS,
+                concurrency: int = 4, min_span: timedelta = MIN_SLICE) -> list[TimeSlice]:
+    """Bisect the range until every slice holds at most ``max_rows`` records.
+
+    Dense periods end up in short slices and quiet ones in long slices; empty
+    slices are dropped. Counts for each level of bisection run in parallel.
+    """
+    pending = [(dates.start, dates.end)]
+    planned: list[TimeSlice] = []
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        while pending:
+            counts = list(pool.map(lambda span: count_records(dates.query(*span), client), pending))
+            bisect = []
+            for (start, end), rows in zip(pending, counts):
+                if rows is not None and rows > max_rows and end - start >= 2 * min_span:
+                    mid = start + timedelta(seconds=(end - start).total_seconds() // 2)
+                    bisect += [(start, mid), (mid, end)]
+                elif rows != 0:
+                    planned.append(TimeSlice(start, end, rows))
+            pending = bisect
+    return sorted(planned, key=lambda s: s.start)
+
+
+class SliceCheckpoint:
+    """Completed slices of one backfill, one JSON file each, plus the slice plan."""
+
+    def __init__(self, directory: str | os.PathLike[str], key: str) -> None:
+        self.path = os.path.join(os.fspath(directory), key)
+
+    def _write(self, name: str, payload: object) -> None:
+        os.makedirs(self.path, exist_ok=True)
+        target = os.path.join(self.path, name)
+        tmp = f"{target}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as fh:
+            json.dump(payload, fh)
+        os.replace(tmp, target)
+
+    def _read(self, name: str) -> Any:
+        try:
+            with open(os.path.join(self.path, name), encoding="utf-8") as fh:
+                return json.load(fh)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def load_plan(self) -> list[TimeSlice] | None:
+        plan = self._read("plan.json")
+        if plan is None:
+            return None
+        return [TimeSlice(datetime.strptime(s, SN_FORMAT), datetime.strptime(e, SN_FORMAT), n) for s, e, n in plan]
+
+    def save_plan(self, slices: list[TimeSlice]) -> None:
+        self._write("plan.json", [[f"{s.start:{SN_FORMAT}}", f"{s.end:{SN_FORMAT}}", s.rows] for s in slices])
+
+    def load(self, piece: TimeSlice) -> list[dict[str, Any]] | None:
+        return self._read(f"{piece.name}.json")
+
+    def save(self, piece: TimeSlice, rows: list[dict[str, Any]]) -> None:
+        self._write(f"{piece.name}.json", rows)
+
+    def clear(self) -> None:
+        shutil.rmtree(self.path, ignore_errors=True)
+
+
+def _utc_today() -> date:
+    return datetime.now(timezone.utc).date()
+
+
+def checkpoint_key(dates: DateRange, fields: list[str], day: date | None = None) -> str:
+    """Checkpoint name for a backfill of ``dates`` started on ``day`` (default: today, UTC).
+
+    Keyed on the resolved bounds rather than the query text, so a relative date
+    that resolves differently is a different backfill. An open upper bound
+    ("now") is left out, so that backfill can still resume later the same day.
+    """
+    day = day or _utc_today()
+    end = "open" if dates.open_end else f"{dates.end:{SN_FORMAT}}"
+    spec = f"{dates.field}|{dates.start:{SN_FORMAT}}|{end}|{dates.rest}|{','.join(fields)}"
+    return f"{day:%Y%m%d}-{hashlib.sha256(spec.encode()).hexdigest()[:16]}"
+
+
+def prune_checkpoints(directory: str | os.PathLike[str], day: date | None = None) -> None:
+    """Discard checkpoints of backfills started before ``day``; they never finished."""
+    prefix = f"{day or _utc_today():%Y%m%d}-"
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return
+    for name in names:
+        path = os.path.join(os.fspath(directory), name)
+        if os.path.isdir(path) and not name.startswith(prefix):
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def dedupe(rows: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    """Drop repeated records (by ``number``, else ``sys_id``), keeping the first."""
+    seen: set[str] = set()
+    out = []
+    for row in rows:
+        key = row.get("number") or row.get("sys_id")
+        if key is None or key not in seen:
+            if key is not None:
+                seen.add(key)
+            out.append(row)
+    return out
+
+
+def fetch_time_sliced(query: str, fields: list[str], page_size: int = 500, concurrency: int = 4,
+                      max_rows: int = DEFAULT_SLICE_ROWS, field: str | None = None,
+                      checkpoint_dir: str | os.PathLike[str] | None = DEFAULT_CHECKPOINT_DIR,
+                      client: SnowClient | None = None,
+                      on_slice: Callable[[TimeSlice, int], None] | None = None) -> list[dict[str, Any]] | None:
+    """Fetch a date-bounded query as parallel, resumable time slices.
+
+    Args:
+        query: Encoded query with a date range (see ``split_date_range``).
+        fields: Fields to retrieve; ``number`` is added for de-duplication.
+        page_size: Page size within each slice.
+        concurrency: Slices fetched in parallel (each walks its own pages sequentially).
+        max_rows: Target upper bound on records per slice.
+        field: Date field to slice on (default: the first bounded date field in ``query``).
+        checkpoint_dir: Where finished slices are kept until the whole fetch succeeds;
+            None disables checkpointing.
+        client: Shared SnowClient; a temporary one is created when omitted.
+        on_slice: Progress callback, called with each finished slice and its row count.
+
+    Returns the de-duplicated rows in slice order, or None if ``query`` has no
+    usable date range (callers then fall back to plain offset paging).
+    """
+    dates = split_date_range(query, field)
+    if dates is None:
+        return None
+    if client is None:
+        with SnowClient(pool_size=max(1, concurrency)) as own_client:
+            return fetch_time_sliced(query, fields, page_size, concurrency, max_rows, field,
+                                     checkpoint_dir, own_client, on_slice)
+
+    fields = list(dict.fromkeys([*fields, "number"]))
+    checkpoint = None
+    if checkpoint_dir:
+        day = _utc_today()
+        prune_checkpoints(checkpoint_dir, day)
+        checkpoint = SliceCheckpoint(checkpoint_dir, checkpoint_key(dates, fields, day))
+    # Resuming keeps the original plan, so finished slices line up with their files
+    slices = checkpoint.load_plan() if checkpoint else None
+    if slices is None:
+        with instrument.span("snow.slice_plan") as plan_span:
+            slices = plan_slices(dates, client, max_rows, concurrency)
+            plan_span.set(slices=len(slices))
+        if checkpoint:
+            checkpoint.save_plan(slices)
+    elif dates.open_end:
+        # The plan stopped at the first run's "now": fetch what came after as one more slice
+        covered = max((piece.end for piece in slices), default=dates.start)
+        if dates.end > covered:
+            slices = [*slices, TimeSlice(covered, dates.end)]
+
+    def fetch_slice(piece: TimeSlice) -> list[dict[str, Any]]:
+        cached = checkpoint.load(piece) if checkpoint else None
+        if cached is not None:
+            instrument.count("snow.slices_resumed")
+            return cached
+        for attempt in range(1, SLICE_ATTEMPTS + 1):
+            try:
+                with instrument.span("snow.slice", slice=piece.name):
+                    rows = fetch_incidents(dates.query(piece.start, piece.end), fields, page_size,
+                                           use_saved_filter=False, client=client)
+                break
+            except Exception:
+                if attempt == SLICE_ATTEMPTS:
+                    raise
+                instrument.count("snow.slice_retries")
+                instrument.sleep(min(60, 2 ** attempt), "snow.slice_backoff")
+        if checkpoint:
+            checkpoint.save(piece, rows)
+        return rows
+
+    results: dict[TimeSlice, list[dict[str, Any]]] = {}
+    errors: list[BaseException] = []
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        futures = {pool.submit(fetch_slice, piece): piece for piece in slices}
+        for future in as_completed(futures):
+            piece = futures[future]
+            try:
+                results[piece] = future.result()
+            except Exception as e:  # let the other slices finish and checkpoint first
+                errors.append(e)
+                continue
+            if on_slice is not None:
+                on_slice(piece, len(results[piece]))
+    if errors:
+        raise errors[0]
+
+    rows = dedupe([row for piece in slices for row in results[piece]])
+    if checkpoint:
+        checkpoint.clear()
+    return rows
@@ -0,0 +1,194 @@
+from __future__ import annotations
+
+import math
+import re
+
+import numpy as np
+import pandas as pd
+
+SNOW_DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Tried in order against a sample of each column; the one that parses the most
+# sampled values is used for the whole column. Day-first wins over month-first
+# for slash dates because our exports come from EMEA instance profiles.
+CANDIDATE_FORMATS = [
+    SNOW_DATETIME_FORMAT,
+    "%Y-%m-%d %H:%M",
+    "%Y-%m-%d",
+    "ISO8601",
+    "%d/%m/%Y %H:%M:%S",
+    "%d/%m/%Y %H:%M",
+    "%d-%m-%Y %H:%M:%S",
+    "%m/%d/%Y %H:%M:%S",
+    "%d/%m/%Y",
+]
+
+_FIELD_WIDTHS = {"Y": 4, "m": 2, "d": 2, "H": 2, "M": 2, "S": 2}
+_NAT = np.iinfo(np.int64).min
+
+_SAMPLE_SIZE = 10_000
+_DETECT_SAMPLE = 50
+
+
+def detect_format(values: pd.Series) -> str | None:
+    """Candidate format that parses the most of a small sample of non-empty values.
+
+    Ties go to the earlier candidate, so clean ServiceNow columns resolve to the
+    native format on the first try; stray junk values do not force inference.
+    """
+    sample = _format_sample(values)
+    if sample.empty:
+        return None
+    best, best_hits = None, 0
+    for fmt in CANDIDATE_FORMATS:
+        hits = int(pd.to_datetime(sample, format=fmt, errors="coerce", utc=True).notna().sum())
+        if hits > best_hits:
+            best, best_hits = fmt, hits
+        if hits == len(sample):
+            break
+    return best
+
+
+def format_fits(values: pd.Series, fmt: str) -> bool:
+    """Whether ``fmt`` parses every value of the sample ``detect_format`` would look at."""
+    sample = _format_sample(values)
+    return bool(pd.to_datetime(sample, format=fmt, errors="coerce", utc=True).notna().all())
+
+
+def _format_sample(values: pd.Series) -> pd.Series:
+    """Up to ``_DETECT_SAMPLE`` distinct non-empty values, as text, from the head of ``values``."""
+    head = values.iloc[:1_000]
+    sample = head[head.notna()]
+    if sample.empty:
+        sample = values.dropna()
+    sample = sample.astype(str)
+    return pd.Series(sample[sample.str.strip() != ""].unique()[:_DETECT_SAMPLE])
+
+
+def _fixed_width_layout(fmt: str) -> tuple[int, dict[str, int], dict[int, int]] | None:
+    """Byte offsets of each field (and literal) for zero-padded, fixed-width formats."""
+    if not re.fullmatch(r"(%[YmdHMS]|[^%])+", fmt):
+        return None
+    fields: dict[str, int] = {}
+    literals: dict[int, int] = {}
+    pos = 0
+    for token in re.findall(r"%[YmdHMS]|[^%]", fmt):
+        if token.startswith("%"):
+            fields[token[1]] = pos
+            pos += _FIELD_WIDTHS[token[1]]
+        else:
+            literals[pos] = ord(token)
+            pos += 1
+    return pos, fields, literals
+
+
+def _parse_fixed_width(values: np.ndarray, fmt: str) -> tuple[np.ndarray, np.ndarray] | None:
+    """Vectorised byte-level parse of a fixed-width format; returns (ns, ok) or None if unsupported.
+
+    pandas routes non-ISO formats (e.g. ``%d/%m/%Y``) through a per-row strptime;
+    reading the digits straight out of an ``S``-dtype buffer is an order of
+    magnitude faster for those.
+    """
+    layout = _fixed_width_layout(fmt)
+    if layout is None:
+        return None
+    width, fields, literals = layout
+    try:
+        raw = np.asarray(values, dtype=object).astype(f"S{width + 1}")
+    except (UnicodeEncodeError, TypeError, ValueError):
+        return None
+    u = raw.view(np.uint8).reshape(len(raw), width + 1)
+    ok = u[:, width] == 0  # nothing past the expected width
+    for offset, char in literals.items():
+        ok &= u[:, offset] == char
+
+    def number(field: str, default: int) -> np.ndarray:
+        if field not in fields:
+            return np.full(len(raw), default, dtype=np.int64)
+        out = np.zeros(len(raw), dtype=np.int64)
+        start = fields[field]
+        for i in range(start, start + _FIELD_WIDTHS[field]):
+            digit = u[:, i].astype(np.int64) - 48
+            np.logical_and(ok, (digit >= 0) & (digit <= 9), out=ok)
+            out = out * 10 + digit
+        return out
+
+    year, month, day = number("Y", 1970), number("m", 1), number("d", 1)
+    hour, minute, second = number("H", 0), number("M", 0), number("S", 0)
+    ok &= (month >= 1) & (month <= 12) & (day >= 1) & (hour <= 23) & (minute <= 59) & (second <= 59)
+    months = np.where(ok, (year - 1970) * 12 + month - 1, 0).astype("datetime64[M]")
+    days = months.astype("datetime64[D]") + np.where(ok, day - 1, 0)
+    ok &= days.astype("datetime64[M]") == months  # rejects e.g. 30 February
+    ns = days.astype("datetime64[ns]").view(np.int64) + ((hour * 60 + minute) * 60 + second) * 10**9
+    ns[~ok] = _NAT
+    return ns, ok
+
+
+def _estimate_distinct(sample_unique: int, sample_size: int, population: int) -> float:
+    """Estimate distinct values in the population from a uniform sample.
+
+    Solves ``D * (1 - exp(-k / D)) = u`` for ``D`` (expected distinct count ``u``
+    in a sample of ``k`` drawn from ``D`` equally likely values).
+    """
+    if sample_unique >= sample_size:
+        return float(population)
+    lo, hi = float(sample_unique), float(population) * 10
+    for _ in range(60):
+        mid = (lo + hi) / 2
+        if mid * (1 - math.exp(-sample_size / mid)) < sample_unique:
+            lo = mid
+        else:
+            hi = mid
+    return min(lo, float(population))
+
+
+def _should_dedupe(values: pd.Series) -> bool:
+    n = len(values)
+    if n <= _SAMPLE_SIZE:
+        return False
+    # Strided rather than random: far cheaper, and on time-sorted data it can only
+    # under-count duplicates (i.e. err towards the plain path)
+    sample = values.iloc[:: n // _SAMPLE_SIZE].iloc[:_SAMPLE_SIZE]
+    return _estimate_distinct(sample.nunique(dropna=True), len(sample), n) < n / 2
+
+
+def parse_timestamps(values: pd.Series, fmt: str | None = None) -> pd.Series:
+    """Parse a ServiceNow timestamp column into ``datetime64[ns, UTC]``.
+
+    - Already-datetime columns are only localised/converted, never re-parsed.
+    - The format is detected once per column (unless ``fmt`` is given) and the
+      whole column goes through pandas' fixed-format path instead of inference.
+    - Columns with many repeated strings are parsed once per distinct value and
+      expanded through the factorized codes.
+    - Naive values are taken as UTC (what the Table API returns with
+      ``sysparm_display_value=false``); unparseable values become NaT.
+    """
+    s = values if isinstance(values, pd.Series) else pd.Series(values)
+    if pd.api.types.is_datetime64_any_dtype(s):
+        if s.dt.tz is None:
+            s = s.dt.tz_localize("UTC")
+        return s.dt.tz_convert("UTC").astype("datetime64[ns, UTC]")
+
+    fmt = fmt or detect_format(s) or "mixed"
+
+    def _parse(v: pd.Series | pd.Index) -> pd.DatetimeIndex:
+        fast = None if fmt.startswith("%Y-%m-%d") else _parse_fixed_width(np.asarray(v), fmt)
+        if fast is None:
+            # ISO layouts are already on pandas' C fast path. cache=False: the dedupe
+            # decision below replaces pandas' first-500-rows heuristic.
+            parsed = pd.to_datetime(v, format=fmt, errors="coerce", utc=True, cache=False)
+            return pd.DatetimeIndex(parsed).as_unit("ns")
+        ns, ok = fast
+        leftover = ~ok & pd.notna(np.asarray(v))
+        if leftover.any():
+            # e.g. non-zero-padded days: let pandas try just those rows
+            slow = pd.to_datetime(pd.Series(np.asarray(v)[leftover]), format=fmt, errors="coerce", utc=True)
+            ns[leftover] = np.asarray(slow.values, dtype="datetime64[ns]").view(np.int64)
+        return pd.DatetimeIndex(ns.view("datetime64[ns]")).tz_localize("UTC")
+
+    if _should_dedupe(s):
+        codes, uniques = pd.factorize(s, use_na_sentinel=True)
+        # Append NaT so the -1 (missing) code maps onto it
+        lookup = _parse(uniques).append(pd.DatetimeIndex([pd.NaT], tz="UTC"))
+        return pd.Series(lookup.take(codes), index=s.index, name=s.name)
+    return pd.Series(_parse(s), index=s.index, name=s.name)
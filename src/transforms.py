@@ -1,49 +1,251 @@
 from __future__ import annotations
 
+import time
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from functools import cache
+from pathlib import Path
+
 import pandas as pd
+import yaml
 
-RENAME_MAP = {
-    "u_major_incident": "is_major",
-    "opened_at": "opened_at",
-    "u_resolved": "resolved_at",
-    "closed_at": "closed_at",
-    "location": "location",
-}
-
-
-def to_dataframe(records: list[dict]) -> pd.DataFrame:
-    df = pd.DataFrame.from_records(records)
-
-    # normalise columns - only rename if the source column exists
-    for k, v in RENAME_MAP.items():
-        if k in df.columns:
-            if k != v:  # Only rename if different
-                df[v] = df[k]
-
-    # Ensure opened_at exists (it should be there from ServiceNow)
-    if 'opened_at' not in df.columns:
-        # Try to find alternative column names
-        for col in df.columns:
-            if 'open' in col.lower() or 'created' in col.lower():
-                df['opened_at'] = df[col]
-                break
-
-    # types - handle ServiceNow date format "YYYY-MM-DD HH:MM:SS"
-    for col in ["opened_at","resolved_at","closed_at"]:
-        if col in df.columns:
-            df[col] = pd.to_datetime(df[col], format="%Y-%m-%d %H:%M:%S", errors="coerce", utc=True)
+from src import instrument
+from src.timeparse import detect_format, format_fits, parse_timestamps
 
-    for col in ["priority","impact","urgency","severity"]:
-        if col in df.columns:
-            df[col] = pd.to_numeric(df[col], errors="coerce")
+FIELD_MAP_PATH = Path(__file__).resolve().parent.parent / "config" / "field_map.yaml"
 
-    if "is_major" in df.columns:
-        df["is_major"] = df["is_major"].astype(str).str.lower().isin(["true","1","yes","y"])
-    elif "priority" in df.columns:
-        # Fallback heuristic: priority 1/2 often aligns with MI—tune for your process
-        df["is_major"] = df["priority"].isin([1, 2])
+MAJOR_PRIORITIES = [1, 2]
+TRUTHY = ["true", "1", "yes", "y"]
+
+_GROUP_KEYS = ("int_like", "datetime_like")
+
+# Compact-mode layout: what the dashboard reads and how each column is stored
+DASHBOARD_COLUMNS = [
+    "number", "priority", "impact", "urgency", "opened_at", "resolved_at", "closed_at",
+    "location", "category", "incident_state", "short_description", "is_major",
+]
+DATETIME_COLUMNS = ["opened_at", "resolved_at", "closed_at"]
+SMALLINT_COLUMNS = ["priority", "impact", "urgency", "severity"]
+CATEGORY_COLUMNS = ["location", "category", "incident_state"]
+CATEGORY_MAX_RATIO = 0.5  # other text columns become categories below this unique/row ratio
+
+
+class TransformPlan:
+    """Compiled normalisation plan built from ``config/field_map.yaml``.
+
+    Applies one batch rename from source aliases to canonical columns, then
+    vectorised dtype conversion of the ``datetime_like``/``int_like`` groups and
+    derivation of ``is_major``. Works for both API records and CSV exports.
+    """
+
+    def __init__(self, aliases: dict[str, list[str]], int_like: list[str], datetime_like: list[str]) -> None:
+        self.aliases = {canonical: tuple(sources) for canonical, sources in aliases.items()}
+        self.int_like = tuple(int_like)
+        self.datetime_like = tuple(datetime_like)
+        self._rename_cache: dict[tuple[str, ...], dict[str, str]] = {}
+        # (source column set, column) -> detected datetime format, so paged input
+        # detects each column's format once rather than once per page (a cheap
+        # sample check confirms it still fits each new frame)
+        self._format_cache: dict[tuple[tuple[str, ...], str], str] = {}
+
+    @classmethod
+    def from_yaml(cls, path: str | Path = FIELD_MAP_PATH) -> TransformPlan:
+        with open(path, encoding="utf-8") as fh:
+            spec = yaml.safe_load(fh) or {}
+        aliases = {k: list(v or []) for k, v in spec.items() if k not in _GROUP_KEYS}
+        return cls(aliases, spec.get("int_like", []), spec.get("datetime_like", []))
+
+    def rename_map(self, columns: Iterable[str]) -> dict[str, str]:
+        """Source -> canonical renames for a given input column set (resolved once per set)."""
+        key = tuple(columns)
+        mapping = self._rename_cache.get(key)
+        if mapping is None:
+            present = set(key)
+            mapping = {}
+            for canonical, sources in self.aliases.items():
+                if canonical in present:
+                    continue  # already canonical; never overwrite it with an alias
+                source = next((s for s in sources if s in present and s not in mapping), None)
+                if source is not None and source != canonical:
+                    mapping[source] = canonical
+            self._rename_cache[key] = mapping
+        return mapping
+
+    def apply(self, df: pd.DataFrame, timings: dict[str, float] | None = None) -> pd.DataFrame:
+        """Normalise ``df``; per-stage seconds are written to ``timings`` if given."""
+        clock = time.perf_counter()
+
+        def lap(stage: str) -> None:
+            nonlocal clock
+            now = time.perf_counter()
+            if timings is not None:
+                timings[stage] = timings.get(stage, 0.0) + (now - clock)
+            instrument.record(f"transform.{stage}", now - clock)
+            clock = now
+
+        source_columns = tuple(df.columns)
+        df = df.rename(columns=self.rename_map(source_columns))
+        lap("rename")
+
+        for col in self.datetime_like:
+            if col in df.columns:
+                s = df[col]
+                if pd.api.types.is_datetime64_any_dtype(s):
+                    df[col] = parse_timestamps(s)
+                    continue
+                fmt_key = (source_columns, col)
+                fmt = self._format_cache.get(fmt_key)
+                if fmt is None or not format_fits(s, fmt):
+                    # The plan is shared process-wide: another source with the same
+                    # headers can use another layout, so a cached format is re-checked
+                    fmt = detect_format(s)
+                    if fmt is not None:
+                        self._format_cache[fmt_key] = fmt
+                df[col] = parse_timestamps(s, fmt=fmt)
+        lap("datetime")
+
+        for col in self.int_like:
+            if col in df.columns:
+                df[col] = _to_number(df[col])
+        lap("numeric")
+
+        if "is_major" in df.columns:
+            df["is_major"] = df["is_major"].astype(str).str.lower().isin(TRUTHY)
+        elif "priority" in df.columns:
+            # Fallback heuristic: priority 1/2 often aligns with MI—tune for your process
+            df["is_major"] = df["priority"].isin(MAJOR_PRIORITIES)
+        else:
+            # If neither column exists, set all incidents as non-major
+            df["is_major"] = False
+        lap("is_major")
+
+        return df
+
+
+def _to_number(s: pd.Series) -> pd.Series:
+    """Numeric coercion that also understands ServiceNow labels such as "1 - Critical" or "P1"."""
+    if pd.api.types.is_numeric_dtype(s):
+        return s
+    out = pd.to_numeric(s, errors="coerce")
+    unparsed = out.isna() & s.notna()
+    if unparsed.any():
+        out = out.mask(unparsed, pd.to_numeric(s[unparsed].astype(str).str.extract(r"(\d+)", expand=False), errors="coerce"))
+    return out
+
+
+@cache
+def load_transform_plan(path: str | None = None) -> TransformPlan:
+    """The transform plan for ``path`` (default ``config/field_map.yaml``), compiled once per process."""
+    return TransformPlan.from_yaml(path or FIELD_MAP_PATH)
+
+
+def to_dataframe(records: list[dict] | pd.DataFrame, timings: dict[str, float] | None = None,
+                 compact: bool = False) -> pd.DataFrame:
+    """Normalise API records (or an already-loaded CSV frame) into the canonical incident frame.
+
+    With ``compact=True`` the result goes through ``compact_frame``.
+    """
+    start = time.perf_counter()
+    df = records if isinstance(records, pd.DataFrame) else pd.DataFrame.from_records(records)
+    elapsed = time.perf_counter() - start
+    if timings is not None:
+        timings["from_records"] = timings.get("from_records", 0.0) + elapsed
+    instrument.record("transform.from_records", elapsed, rows=len(df))
+    df = load_transform_plan().apply(df, timings)
+    if compact:
+        df, _ = compact_frame(df)
+    return df
+
+
+def to_dataframe_chunked(pages: Iterable[list[dict]], timings: dict[str, float] | None = None,
+                         compact: bool = False) -> pd.DataFrame:
+    """Build the incident frame page by page (e.g. from ``iter_incident_pages``).
+
+    Each page is converted to typed columns as soon as it arrives, so raw dicts
+    never accumulate; the typed pieces are concatenated once at the end. With
+    ``compact=True`` unused columns are dropped per page and the concatenated
+    frame is compacted.
+    """
+    frames = []
+    for page in pages:
+        if page:
+            df = to_dataframe(page, timings)
+            frames.append(df[[c for c in df.columns if c in DASHBOARD_COLUMNS]] if compact else df)
+    if not frames:
+        df = to_dataframe([])
+    elif len(frames) == 1:
+        df = frames[0]
     else:
-        # If neither column exists, set all incidents as non-major
-        df["is_major"] = False
+        df = pd.concat(frames, ignore_index=True)
+    if compact:
+        df, _ = compact_frame(df)
+    return df
+
+
+@dataclass(frozen=True)
+class MemoryReport:
+    """Deep memory usage (bytes) of a frame before and after compaction."""
 
+    before: int
+    after: int
+    columns_before: dict[str, int] = field(default_factory=dict)
+    columns_after: dict[str, int] = field(default_factory=dict)
+
+    @property
+    def saved_ratio(self) -> float:
+        return 1 - self.after / self.before if self.before else 0.0
+
+    def __str__(self) -> str:
+        return f"{self.before / 2**20:.1f} MiB -> {self.after / 2**20:.1f} MiB ({self.saved_ratio:.0%} saved)"
+
+
+def compact_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+    """Store a normalised incident frame in compact dtypes (returns a new frame).
+
+    Timestamps become ``datetime64[ns, UTC]``, priority-like columns nullable ``Int8``,
+    ``is_major`` ``bool``, known low-cardinality columns ``category``.
+    """
+    df = df.copy()
+    for col in DATETIME_COLUMNS:
+        if col in df.columns:
+            df[col] = parse_timestamps(df[col])
+    for col in SMALLINT_COLUMNS:
+        if col in df.columns:
+            s = pd.to_numeric(df[col], errors="coerce")
+            valid = s.dropna()
+            if ((valid % 1 == 0) & valid.between(-128, 127)).all():
+                df[col] = s.astype("Int8")
+    if "is_major" in df.columns:
+        df["is_major"] = df["is_major"].fillna(False).astype(bool)
+    for col in CATEGORY_COLUMNS:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype("category")
     return df
+
+
+@instrument.timed("transform.compact_frame")
+def compact_frame(df: pd.DataFrame, drop_unused: bool = True) -> tuple[pd.DataFrame, MemoryReport]:
+    """Opt-in compact representation for large frames.
+
+    On top of ``compact_dtypes``: remaining text columns become ``category`` when
+    low-cardinality and pyarrow-backed strings otherwise, and (with ``drop_unused``)
+    columns outside ``DASHBOARD_COLUMNS`` are dropped.
+    """
+    usage_before = df.memory_usage(deep=True, index=False)
+    if drop_unused:
+        df = df[[c for c in df.columns if c in DASHBOARD_COLUMNS]]
+    df = compact_dtypes(df)
+    for col in df.columns:
+        if df[col].dtype == object:
+            if len(df) and df[col].nunique(dropna=True) / len(df) < CATEGORY_MAX_RATIO:
+                df[col] = df[col].astype("category")
+            else:
+                df[col] = df[col].astype("string[pyarrow]")
+    usage_after = df.memory_usage(deep=True, index=False)
+    report = MemoryReport(
+        before=int(usage_before.sum()),
+        after=int(usage_after.sum()),
+        columns_before={str(k): int(v) for k, v in usage_before.items()},
+        columns_after={str(k): int(v) for k, v in usage_after.items()},
+    )
+    return df, report
@@ -0,0 +1,284 @@
+from __future__ import annotations
+
+import threading
+from collections.abc import Iterable, Sequence
+from typing import TypeVar
+
+import numpy as np
+import pandas as pd
+
+from src.kpis import _NAT, _NS_PER_DAY, _NS_PER_HOUR, _as_ns
+from src.sketch import DDSketch
+
+FrameT = TypeVar("FrameT", pd.DataFrame, pd.Series)
+
+BUCKET_KEYS = ["day", "priority", "location", "is_major"]
+FREQUENCIES = {"D": "D", "W": "W-MON", "M": "MS"}
+
+# Resolution times are kept as DDSketch bucket counts (in hours) per bucket, so
+# percentiles for any slice are within this relative error of the exact value
+RELATIVE_ACCURACY = 0.01
+_KEYS = DDSketch(RELATIVE_ACCURACY)
+
+
+def _empty_totals() -> pd.DataFrame:
+    index = pd.MultiIndex.from_arrays([[]] * len(BUCKET_KEYS), names=BUCKET_KEYS)
+    return pd.DataFrame({"incidents": pd.Series(dtype="int64"), "resolved": pd.Series(dtype="int64"),
+                         "resolve_hours": pd.Series(dtype="float64")}, index=index)
+
+
+def _empty_hist() -> pd.Series:
+    index = pd.MultiIndex.from_arrays([[]] * (len(BUCKET_KEYS) + 1), names=[*BUCKET_KEYS, "bin"])
+    return pd.Series(dtype="int64", index=index, name="count")
+
+
+def _period_start(days: np.ndarray, freq: str) -> np.ndarray:
+    """Day numbers (days since epoch) -> first day of their D/W/M period, as datetime64[ns]."""
+    if freq == "D":
+        start = days
+    elif freq == "W":
+        start = days - (days + 3) % 7  # Monday-start weeks, as in kpis.weekly_counts
+    elif freq == "M":
+        start = days.astype("datetime64[D]").astype("datetime64[M]").astype("datetime64[D]").astype(np.int64)
+    else:
+        raise ValueError(f"Unknown frequency {freq!r}; expected one of {sorted(FREQUENCIES)}")
+    return (np.asarray(start, dtype=np.int64) * _NS_PER_DAY).astype("datetime64[ns]")
+
+
+def _quantiles_from_hist(hist: np.ndarray, values: np.ndarray,
+                         quantiles: Sequence[float]) -> dict[float, np.ndarray]:
+    """Per-row lower-quantile estimates (hours) from a dense periods x sketch-bucket count matrix.
+
+    ``values`` are the representative values of the (ascending) bucket columns; the
+    rank convention matches ``DDSketch.quantiles``.
+    """
+    total = hist.sum(axis=1)
+    cum = hist.cumsum(axis=1)
+    out = {}
+    for q in quantiles:
+        idx = (cum > (q * (total - 1))[:, None]).argmax(axis=1)
+        out[q] = np.where(total > 0, values[idx], np.nan) if len(values) else np.full(len(hist), np.nan)
+    return out
+
+
+class TrendStore:
+    """Time-bucketed incident aggregates for trend charts and rolling KPIs.
+
+    Incidents are bucketed by opened day, priority, site and ``is_major``; each
+    bucket holds the incident count, resolved count, summed resolution hours and
+    DDSketch bucket counts of resolution times. All of these are additive,
+    so ``add``/``remove`` update the store from new (or superseded) rows alone and
+    day/week/month series are rolled up from the buckets without touching rows.
+
+    To apply an upsert (e.g. an incident that has since been resolved), ``remove``
+    the previously added version of the row and ``add`` the new one.
+    """
+
+    def __init__(self, site_col: str = "location") -> None:
+        self.site_col = site_col
+        self._totals = _empty_totals()
+        self._hist = _empty_hist()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, site_col: str = "location") -> TrendStore:
+        store = cls(site_col)
+        store.add(df)
+        return store
+
+    def __len__(self) -> int:
+        return len(self._totals)
+
+    def add(self, df: pd.DataFrame) -> None:
+        """Fold new incidents (a normalised frame) into the buckets."""
+        self._apply(df, 1)
+
+    def remove(self, df: pd.DataFrame) -> None:
+        """Take previously added incidents back out of the buckets."""
+        self._apply(df, -1)
+
+    # -- bucketing --------------------------------------------------------
+    def _bucket(self, df: pd.DataFrame) -> tuple[pd.DataFrame, pd.Series]:
+        opened = _as_ns(df["opened_at"])
+        keep = opened != _NAT
+        opened = opened[keep]
+        n = len(opened)
+
+        if "priority" in df.columns:
+            priority = pd.to_numeric(df["priority"], errors="coerce").to_numpy(dtype="float64", na_value=np.nan)[keep]
+            priority = np.where(np.isnan(priority), -1, priority).astype(np.int64)
+        else:
+            priority = np.full(n, -1, dtype=np.int64)
+        if self.site_col in df.columns:
+            sites = df[self.site_col].astype(object)
+            location = sites.where(sites.notna(), "").astype(str).to_numpy()[keep]
+        else:
+            location = np.full(n, "", dtype=object)
+        if "is_major" in df.columns:
+            is_major = df["is_major"].to_numpy(dtype=bool, na_value=False)[keep]
+        else:
+            is_major = np.zeros(n, dtype=bool)
+
+        if "resolved_at" in df.columns:
+            resolved_ns = _as_ns(df["resolved_at"])[keep]
+            resolved = (resolved_ns != _NAT) & (resolved_ns >= opened)
+            hours = np.where(resolved, (resolved_ns - opened) / _NS_PER_HOUR, 0.0)
+        else:
+            resolved = np.zeros(n, dtype=bool)
+            hours = np.zeros(n)
+
+        rows = pd.DataFrame({
+            "day": opened // _NS_PER_DAY,
+            "priority": priority,
+            "location": location,
+            "is_major": is_major,
+            "resolved": resolved.astype(np.int64),
+            "resolve_hours": hours,
+        })
+        grouped = rows.groupby(BUCKET_KEYS, sort=False)
+        totals = pd.DataFrame({
+            "incidents": grouped.size(),
+            "resolved": grouped["resolved"].sum(),
+            "resolve_hours": grouped["resolve_hours"].sum(),
+        })
+        done = rows[resolved].assign(bin=_KEYS.keys(hours[resolved]))
+        hist = done.groupby([*BUCKET_KEYS, "bin"], sort=False).size().rename("count")
+        return totals, hist
+
+    def _apply(self, df: pd.DataFrame, sign: int) -> None:
+        if df.empty:
+            return
+        totals, hist = self._bucket(df)
+        with self._lock:
+            merged = self._totals.add(sign * totals, fill_value=0)
+            merged = merged[merged["incidents"] > 0]
+            self._totals = merged.astype({"incidents": "int64", "resolved": "int64"})
+            merged_hist = self._hist.add(sign * hist, fill_value=0)
+            self._hist = merged_hist[merged_hist > 0].astype("int64")
+
+    # -- reads --------------------------------------------------------------
+    def _select(self, frame: FrameT, major_only: bool, priorities: Iterable[int] | None,
+                locations: Iterable[str] | None) -> FrameT:
+        index = frame.index
+        mask = np.ones(len(frame), dtype=bool)
+        if major_only:
+            mask &= index.get_level_values("is_major").to_numpy(dtype=bool)
+        if priorities is not None:
+            mask &= index.get_level_values("priority").isin(list(priorities))
+        if locations is not None:
+            mask &= index.get_level_values("location").isin(list(locations))
+        return frame[mask]
+
+    def _rollup(self, freq: str, major_only: bool, priorities: Iterable[int] | None,
+                locations: Iterable[str] | None) -> tuple[pd.DataFrame, np.ndarray, np.ndarray]:
+        """Per-period sums over the full (gap-filled) period range, plus a dense
+        periods x sketch-bucket count matrix and the bucket values of its columns."""
+        with self._lock:
+            totals, hist = self._totals, self._hist
+        totals = self._select(totals, major_only, priorities, locations)
+        hist = self._select(hist, major_only, priorities, locations)
+
+        periods = _period_start(totals.index.get_level_values("day").to_numpy(dtype=np.int64), freq)
+        sums = totals.groupby(periods).sum()
+        if len(sums):
+            full = pd.date_range(sums.index.min(), sums.index.max(), freq=FREQUENCIES[freq])
+            sums = sums.reindex(full, fill_value=0)
+        sums.index.name = "period"
+
+        keys, columns = np.unique(hist.index.get_level_values("bin").to_numpy(dtype=np.int64), return_inverse=True)
+        dense = np.zeros((len(sums), len(keys)), dtype=np.int64)
+        if len(hist):
+            hist_periods = _period_start(hist.index.get_level_values("day").to_numpy(dtype=np.int64), freq)
+            rows = sums.index.get_indexer(pd.Index(hist_periods))
+            np.add.at(dense, (rows, columns), hist.to_numpy())
+        return sums, dense, _KEYS.values(keys)
+
+    def mttr_sketch(self, start: str | pd.Timestamp | None = None, end: str | pd.Timestamp | None = None,
+                    major_only: bool = True, priorities: Iterable[int] | None = None,
+                    locations: Iterable[str] | None = None) -> DDSketch:
+        """Merged resolution-time sketch (hours) for incidents opened in ``[start, end)``."""
+        with self._lock:
+            hist = self._hist
+        hist = self._select(hist, major_only, priorities, locations)
+        days = hist.index.get_level_values("day").to_numpy(dtype=np.int64)
+        mask = np.ones(len(hist), dtype=bool)
+        if start is not None:
+            mask &= days >= _day_number(start)
+        if end is not None:
+            mask &= days < _day_number(end)
+        per_key = hist[mask].groupby(level="bin").sum()
+        return DDSketch.from_counts(per_key.index.to_numpy(), per_key.to_numpy(), RELATIVE_ACCURACY)
+
+    def mttr_percentiles(self, quantiles: Sequence[float] = (0.5, 0.9, 0.99),
+                         start: str | pd.Timestamp | None = None, end: str | pd.Timestamp | None = None,
+                         major_only: bool = True, priorities: Iterable[int] | None = None,
+                         locations: Iterable[str] | None = None) -> dict[float, float]:
+        """Time-to-resolve percentiles (hours); the filters are those of ``mttr_sketch``."""
+        sketch = self.mttr_sketch(start, end, major_only, priorities, locations)
+        return dict(zip(quantiles, sketch.quantiles(quantiles)))
+
+    def series(self, freq: str = "W", quantiles: Sequence[float] = (0.5, 0.9), major_only: bool = True,
+               priorities: Iterable[int] | None = None, locations: Iterable[str] | None = None) -> pd.DataFrame:
+        """Per-period trend, read from the buckets in O(buckets).
+
+        Returns one row per day/week/month (``freq`` ``"D"``/``"W"``/``"M"``, empty
+        periods included) with columns ``period``, ``incidents``, ``resolved``,
+        ``mttr_hours`` and a ``p<NN>_hours`` column per requested quantile.
+        """
+        return self._series(*self._rollup(freq, major_only, priorities, locations), quantiles)
+
+    @staticmethod
+    def _series(sums: pd.DataFrame, dense: np.ndarray, values: np.ndarray,
+                quantiles: Sequence[float]) -> pd.DataFrame:
+        out = pd.DataFrame({
+            "period": sums.index,
+            "incidents": sums["incidents"].to_numpy(dtype=np.int64),
+            "resolved": sums["resolved"].to_numpy(dtype=np.int64),
+            "mttr_hours": _ratio(sums["resolve_hours"].to_numpy(), sums["resolved"].to_numpy()),
+        })
+        for q, estimates in _quantiles_from_hist(dense, values, quantiles).items():
+            out[_quantile_column(q)] = estimates
+        return out
+
+    def rolling(self, window: int = 4, freq: str = "W", quantiles: Sequence[float] = (0.5, 0.9),
+                major_only: bool = True, priorities: Iterable[int] | None = None,
+                locations: Iterable[str] | None = None) -> pd.DataFrame:
+        """``series`` plus trailing-``window`` KPIs and period-over-period change.
+
+        Adds ``incidents_ma`` (moving average count), ``mttr_rolling_hours`` (resolved-weighted
+        MTTR over the window), ``p<NN>_rolling_hours``, ``incidents_delta`` and
+        ``incidents_pct_change`` against the previous period.
+        """
+        sums, dense, values = self._rollup(freq, major_only, priorities, locations)
+        out = self._series(sums, dense, values, quantiles)
+        incidents = out["incidents"]
+        out["incidents_ma"] = incidents.rolling(window, min_periods=1).mean()
+        resolved = sums["resolved"].rolling(window, min_periods=1).sum().to_numpy()
+        hours = sums["resolve_hours"].rolling(window, min_periods=1).sum().to_numpy()
+        out["mttr_rolling_hours"] = _ratio(hours, resolved)
+        cum = np.vstack([np.zeros((1, dense.shape[1]), dtype=np.int64), dense.cumsum(axis=0)])
+        starts = np.maximum(np.arange(1, len(dense) + 1) - window, 0)
+        windowed = cum[1:] - cum[starts]
+        for q, estimates in _quantiles_from_hist(windowed, values, quantiles).items():
+            out[_quantile_column(q, "rolling_")] = estimates
+        out["incidents_delta"] = incidents.diff()
+        previous = incidents.shift()
+        out["incidents_pct_change"] = (incidents - previous) / previous.where(previous != 0)
+        return out
+
+
+def _day_number(value: str | pd.Timestamp) -> int:
+    ts = pd.Timestamp(value)
+    if ts.tzinfo is not None:
+        ts = ts.tz_convert("UTC").tz_localize(None)
+    return int(ts.value // _NS_PER_DAY)
+
+
+def _ratio(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    numerator = np.asarray(numerator, dtype="float64")
+    denominator = np.asarray(denominator, dtype="float64")
+    return np.divide(numerator, denominator, out=np.full_like(numerator, np.nan), where=denominator > 0)
+
+
+def _quantile_column(q: float, infix: str = "") -> str:
+    return f"p{q * 100:g}_{infix}hours"
@@ -0,0 +1,279 @@
+"""Several dashboard views (saved filters or encoded queries) fetched as one batch.
+
+The saved filters overlap heavily. Every ``PYTHON: MAJOR IM`` record is also
+an ``EMEA_HIGH_PRIORITY`` record, and every one of those is a
+``SIMPLE_P1_P2`` record. ``fetch_views`` downloads full records only for the
+broadest views and keeps each record once, keyed by ``sys_id``/``number``. A
+view whose top-level clauses include all of a broader view's clauses is
+contained in that view. Such a view is filtered from the broader view's
+records locally (``src.local_query``). If it reads fields the frame lacks,
+such as the dot-walked ``location.u_region``, only the keys of its matches
+are fetched, which are tiny pages. Every view is then a boolean mask over the
+one frame, and switching views costs no API calls.
+"""
+from __future__ import annotations
+
+import threading
+from collections.abc import Iterable, Iterator, Mapping
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Union
+
+import numpy as np
+import pandas as pd
+
+from src import instrument
+from src.frame_cache import cache_key
+from src.local_query import CompiledQuery, UnsupportedQuery, and_clauses, compile_query
+from src.snow_client import (
+    DEFAULT_FIELDS,
+    SAVED_FILTERS,
+    SnowClient,
+    delta_query,
+    fetch_incidents,
+    iter_incident_pages,
+    reconcile_members,
+)
+from src.store import record_key
+from src.transforms import load_transform_plan, to_dataframe
+
+if TYPE_CHECKING:
+    from src.store import IncidentStore
+
+SAVED_VIEWS = ("PYTHON: MAJOR IM", "SIMPLE_P1_P2", "EMEA_HIGH_PRIORITY")
+CONFIGURED_VIEW = "Configured query"
+# Enough to identify a view's records (and drive its delta sync) without their data
+KEY_FIELDS = ["sys_id", "number", "sys_updated_on"]
+VIEW_COLUMN_PREFIX = "view:"
+
+Views = Union[Iterable[str], Mapping[str, str]]
+
+
+def resolve_views(views: Views) -> dict[str, str]:
+    """View name -> encoded query. Saved-filter names resolve to their query; other strings are queries."""
+    if isinstance(views, Mapping):
+        return dict(views)
+    return {view: SAVED_FILTERS.get(view, view) for view in views}
+
+
+def dashboard_views(query: str) -> dict[str, str]:
+    """The views the dashboard offers: the configured query plus the saved filters."""
+    return {CONFIGURED_VIEW: query, **resolve_views(SAVED_VIEWS)}
+
+
+def views_key(views: Mapping[str, str]) -> str:
+    """Stable identity of a set of views (e.g. the snapshot name for them)."""
+    return "\n".join(f"{name}\t{query}" for name, query in views.items())
+
+
+def batch_version(views: Mapping[str, str], store: IncidentStore) -> str:
+    """Frame-cache key for the batch of ``views`` synced into ``store``.
+
+    It changes whenever a view's stored records do (``IncidentStore.version``).
+    """
+    return cache_key(views_key(views), DEFAULT_FIELDS, ",".join(store.version(q) for q in views.values()))
+
+
+def _clauses(query: str) -> frozenset[str] | None:
+    """Top-level AND clauses (``^OR`` groups kept whole); None for ``^NQ`` queries."""
+    clauses = and_clauses(query)
+    if any(c.startswith("NQ") for c in clauses):
+        return None
+    return frozenset(clauses)
+
+
+def plan_views(views: Mapping[str, str]) -> dict[str, str | None]:
+    """Map each view to the view whose full records contain its own, or None if it is fetched in full.
+
+    View B is contained in view A when B's top-level clauses include all of A's.
+    Of several such views, the narrowest is used. Views with the same clauses
+    as an earlier view share its fetch.
+    """
+    names = list(views)
+    clauses = {name: _clauses(views[name]) for name in names}
+
+    def broader(a: str, b: str) -> bool:
+        ca, cb = clauses[a], clauses[b]
+        if a == b or ca is None or cb is None or not ca <= cb:
+            return False
+        return ca < cb or names.index(a) < names.index(b)
+
+    roots = [name for name in names if not any(broader(other, name) for other in names)]
+    plan: dict[str, str | None] = {}
+    for name in names:
+        covers = [root for root in roots if broader(root, name)]
+        plan[name] = max(covers, key=lambda root: len(clauses[root] or ()), default=None)
+    return plan
+
+
+@dataclass(frozen=True)
+class ViewBatch:
+    """Every record of a set of views, stored once, with each view as a row mask."""
+
+    df: pd.DataFrame
+    masks: dict[str, np.ndarray]
+
+    def view(self, name: str) -> pd.DataFrame:
+        """Rows of view ``name`` (no API calls)."""
+        return self.df[self.masks[name]].reset_index(drop=True)
+
+    def counts(self) -> dict[str, int]:
+        return {name: int(np.count_nonzero(mask)) for name, mask in self.masks.items()}
+
+    def to_frame(self) -> pd.DataFrame:
+        """``df`` plus one boolean ``view:<name>`` column per view, e.g. for snapshots."""
+        return self.df.assign(**{f"{VIEW_COLUMN_PREFIX}{name}": mask for name, mask in self.masks.items()})
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> ViewBatch:
+        """Inverse of ``to_frame``."""
+        cols = [c for c in df.columns if c.startswith(VIEW_COLUMN_PREFIX)]
+        masks = {c[len(VIEW_COLUMN_PREFIX):]: df[c].to_numpy(dtype=bool) for c in cols}
+        return cls(df.drop(columns=cols), masks)
+
+
+def _local_query(query: str, fields: list[str]) -> CompiledQuery | None:
+    """``query`` compiled for local evaluation, if every field it reads is among ``fields``."""
+    renames = load_transform_plan().rename_map(fields)
+    try:
+        compiled = compile_query(query)
+    except UnsupportedQuery:
+        return None
+    return compiled if compiled.supports([renames.get(f, f) for f in fields]) else None
+
+
+def _fetch_keys(query: str, page_size: int, concurrency: int, client: SnowClient,
+                store: IncidentStore | None) -> set[str]:
+    """Keys of the records matching ``query``, fetched without their data."""
+    if store is None:
+        rows = fetch_incidents(query, KEY_FIELDS, page_size, use_saved_filter=False,
+                               concurrency=concurrency, client=client)
+        return {key for key in map(record_key, rows) if key is not None}
+    full_sync = store.high_water_mark(query) is None
+    rows = fetch_incidents(delta_query(store, query), KEY_FIELDS, page_size, use_saved_filter=False,
+                           concurrency=concurrency, client=client)
+    store.upsert(query, rows, members_only=True)
+    # Records that left the view (e.g. moved out of EMEA) are not in a delta
+    reconcile_members(store, query, page_size, concurrency, client, rows if full_sync else None)
+    return store.keys(query)
+
+
+def _full_pages(query: str, fields: list[str], page_size: int, concurrency: int, client: SnowClient,
+                store: IncidentStore | None, slice_rows: int | None) -> Iterator[list[dict[str, Any]]]:
+    """Pages of ``query``'s full records, streamed when neither a store nor time slices are used.
+
+    A store sync or a sliced fetch returns its result as one list, which is then
+    handed out ``page_size`` records at a time.
+    """
+    if store is None and not slice_rows:
+        yield from iter_incident_pages(query, fields, page_size, use_saved_filter=False,
+                                       concurrency=concurrency, client=client)
+        return
+    rows = fetch_incidents(query, fields, page_size, False, concurrency, client, store, slice_rows)
+    for start in range(0, len(rows), page_size):
+        yield rows[start:start + page_size]
+
+
+class _Collector:
+    """The views' records as typed frame pieces, de-duplicated and converted page by page."""
+
+    def __init__(self, names: Iterable[str]) -> None:
+        self.members: dict[str, set[str]] = {name: set() for name in names}
+        self.keys: list[str] = []
+        self._seen: set[str] = set()
+        self._frames: list[pd.DataFrame] = []
+        self._lock = threading.Lock()
+
+    def add(self, name: str, page: list[dict[str, Any]]) -> None:
+        """Record ``page`` as members of view ``name``, converting only records not seen before."""
+        with self._lock:
+            members = self.members[name]
+            fresh = []
+            for rec in page:
+                key = record_key(rec)
+                if key is None:
+                    continue
+                members.add(key)
+                if key not in self._seen:
+                    self._seen.add(key)
+                    self.keys.append(key)
+                    fresh.append(rec)
+            if fresh:
+                self._frames.append(to_dataframe(fresh))
+
+    def frame(self) -> pd.DataFrame:
+        if not self._frames:
+            return to_dataframe([])
+        return self._frames[0] if len(self._frames) == 1 else pd.concat(self._frames, ignore_index=True)
+
+
+def fetch_views(views: Views, fields: list[str] | None = None, page_size: int = 500, concurrency: int = 1,
+                client: SnowClient | None = None, store: IncidentStore | None = None,
+                slice_rows: int | None = None) -> ViewBatch:
+    """Fetch several views at once, each record once, and return them as masks over one frame.
+
+    Each page is de-duplicated by key and converted to typed columns as it
+    arrives, so raw records of the whole batch are never held at once.
+
+    Args:
+        views: Saved-filter names or encoded queries, or a mapping of view name to query.
+        fields: Fields fetched for the full records (``sys_id`` and ``number`` are added).
+        page_size: Records per page.
+        concurrency: Pages in flight per view; the views themselves are fetched in parallel.
+        client: Shared SnowClient; a temporary one is created (and closed) when omitted.
+        store: IncidentStore for incremental sync of every view (see ``fetch_incidents``).
+        slice_rows: Time-slice date-bounded views that are fetched in full (see ``src.time_slices``).
+    """
+    views = resolve_views(views)
+    plan = plan_views(views)
+    fields = list(dict.fromkeys([*(fields or DEFAULT_FIELDS), "sys_id", "number"]))
+    own_client = client is None
+    client = client or SnowClient()
+    full = [name for name, cover in plan.items() if cover is None]
+    contained = [name for name, cover in plan.items()
+                 if cover is not None and _clauses(views[name]) != _clauses(views[cover])]
+    # Evaluated on the cover's records where the fetched fields allow it; otherwise
+    # (e.g. dot-walked fields) the instance says which keys match
+    local: dict[str, CompiledQuery] = {}
+    for name in contained:
+        compiled = _local_query(views[name], fields)
+        if compiled is not None:
+            local[name] = compiled
+    keyed = [name for name in contained if name not in local]
+    try:
+        with instrument.span("views.fetch", views=len(views), full=len(full), keyed=len(keyed),
+                             local=len(local)) as fetch_span, \
+                ThreadPoolExecutor(max_workers=max(1, len(full) + len(keyed))) as pool:
+            collector = _Collector(full)
+
+            def fetch_full(name: str) -> None:
+                for page in _full_pages(views[name], fields, page_size, concurrency, client, store, slice_rows):
+                    collector.add(name, page)
+
+            full_jobs = [pool.submit(fetch_full, name) for name in full]
+            key_jobs = {name: pool.submit(_fetch_keys, views[name], page_size, concurrency, client, store)
+                        for name in keyed}
+            for job in full_jobs:
+                job.result()
+            members = {**collector.members, **{name: job.result() for name, job in key_jobs.items()}}
+            fetch_span.set(rows=len(collector.keys))
+    finally:
+        if own_client:
+            client.close()
+
+    keys = pd.Index(collector.keys)
+    df = collector.frame()
+    if not len(df):
+        return ViewBatch(df, {name: np.zeros(0, dtype=bool) for name in views})
+    masks = {name: keys.isin(members[name]) for name in full}
+    for name, cover in plan.items():
+        if cover is None:
+            continue
+        if name in local:
+            masks[name] = masks[cover] & local[name].mask(df)
+        elif name in members:
+            # Keys fetched after the cover's records can include newer matches it did not return
+            masks[name] = masks[cover] & keys.isin(members[name])
+        else:
+            masks[name] = masks[cover]
+    return ViewBatch(df, {name: masks[name] for name in views})
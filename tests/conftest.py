@@ -0,0 +1,20 @@
+import pytest
+
+from src.snow_client import SnowClient
+
+
+@pytest.fixture
+def snow_credentials(monkeypatch):
+    """Basic-auth credentials for the test, restored afterwards."""
+    monkeypatch.setenv("SNOW_USERNAME", "test-user")
+    monkeypatch.setenv("SNOW_PASSWORD", "test-password")
+
+
+@pytest.fixture
+def stub_client(snow_credentials):
+    """Factory for a SnowClient pointed at a ``SnowStub``."""
+
+    def make(stub, **kwargs):
+        return SnowClient(base_url=stub.base_url, **kwargs)
+
+    return make
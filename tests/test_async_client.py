@@ -0,0 +1,140 @@
+import asyncio
+import time
+
+import pytest
+
+from src.rate_limit import TokenBucket, limiter_for
+from src.snow_client import DEFAULT_FIELDS
+from src.snow_client import fetch_incidents as fetch_sync
+from src.snow_stub import SnowStub, StubConfig
+from src.store import IncidentStore
+from src.synthetic import generate_incidents
+
+httpx = pytest.importorskip("httpx")
+
+from src.async_client import (  # noqa: E402
+    AsyncSnowClient,
+    fetch_incidents,
+    fetch_many,
+    run,
+    shared_client,
+)
+
+
+def test_token_bucket_paces_and_pauses():
+    bucket = TokenBucket(rate=50, burst=1)
+    assert bucket.acquire() == 0
+    waits = [bucket._reserve() for _ in range(3)]
+    assert waits == sorted(waits) and waits[-1] == pytest.approx(3 / 50, abs=0.01)
+
+    paused = TokenBucket()
+    paused.pause(0.05)
+    start = time.perf_counter()
+    asyncio.run(paused.acquire_async())
+    assert time.perf_counter() - start >= 0.04
+    assert limiter_for("https://x.service-now.com/api/now/table") is limiter_for("https://x.service-now.com/api/now/stats")
+
+
+def test_async_fetch_matches_sync(stub_client):
+    data = generate_incidents(1_200)
+    with SnowStub(data) as stub, stub_client(stub) as client:
+        expected = fetch_sync("priorityIN1,2", DEFAULT_FIELDS, 100, use_saved_filter=False, client=client)
+        rows = fetch_incidents("priorityIN1,2", DEFAULT_FIELDS, 100, concurrency=4, client=client)
+    assert rows == expected
+
+
+def test_fetch_many_shares_one_budget(stub_client):
+    data = generate_incidents(400)
+    queries = {"p1": "priority=1", "p2": "priority=2", "all": ""}
+    with SnowStub(data) as stub, stub_client(stub):
+        start = time.perf_counter()
+
+        async def go():
+            async with AsyncSnowClient(stub.base_url, limiter=TokenBucket(rate=40, burst=1)) as async_client:
+                return await async_client.fetch_many(queries, ["number", "priority"], page_size=50, concurrency=4)
+
+        out = run(go())
+        elapsed = time.perf_counter() - start
+        requests = stub.stats()["requests"]
+    assert {r["priority"] for r in out["p1"]} == {"1"} and len(out["all"]) == 400
+    assert len(out["p1"]) + len(out["p2"]) == int(data["priority"].isin(["1", "2"]).sum())
+    # Every page of all three queries drew from the same 40 req/s bucket
+    assert elapsed >= (requests - 1) / 40 * 0.9
+
+
+def test_retry_after_is_honoured(stub_client):
+    data = generate_incidents(300)
+    config = StubConfig(throttle_rate=0.3, retry_after=0, seed=3)
+    with SnowStub(data, config=config) as stub, stub_client(stub) as client:
+        rows = fetch_many({"all": ""}, ["number"], page_size=25, concurrency=4, client=client)["all"]
+        assert stub.stats()["throttled"] > 0
+    assert [r["number"] for r in rows] == data["number"].tolist()
+
+
+def test_cancelled_fetch_stops_paging(stub_client):
+    data = generate_incidents(500)
+    with SnowStub(data, config=StubConfig(latency_ms=50)) as stub, stub_client(stub):
+        async def go():
+            async with AsyncSnowClient(stub.base_url) as async_client:
+                await asyncio.wait_for(async_client.fetch("", ["number"], page_size=10, concurrency=2), 0.2)
+
+        with pytest.raises(asyncio.TimeoutError):
+            run(go())
+        time.sleep(0.2)
+        assert stub.stats()["requests"] < 50
+
+
+def test_failed_page_cancels_the_other_pages(snow_credentials):
+    finished = []
+
+    class FlakyClient(AsyncSnowClient):
+        async def get_page(self, params, table=None):
+            offset = int(params["sysparm_offset"])
+            if offset == 10:
+                raise httpx.ConnectError("connection reset")
+            if offset:
+                await asyncio.sleep(0.3)
+            finished.append(offset)
+            return [{"number": f"INC{offset}"}] * 10, 100
+
+    async def go():
+        async with FlakyClient("http://instance.invalid/api/now/table") as async_client:
+            with pytest.raises(httpx.ConnectError):
+                await async_client.fetch("", ["number"], page_size=10, concurrency=4)
+            await asyncio.sleep(0.4)  # long enough for any page still running to finish
+
+    run(go())
+    assert finished == [0]
+
+
+def test_facade_reuses_one_client_per_instance(stub_client):
+    data = generate_incidents(100)
+    with SnowStub(data) as stub, stub_client(stub) as client:
+        fetch_many({"all": ""}, ["number"], client=client)
+        fetch_many({"p1": "priority=1"}, ["number"], client=client)
+        assert shared_client(stub.base_url, client.table) is shared_client(stub.base_url + "/", client.table)
+        assert shared_client(stub.base_url, client.table).stats.summary()["requests"] == 2
+
+
+def test_facade_delta_sync(tmp_path, stub_client):
+    data = generate_incidents(200)
+    with SnowStub(data) as stub, stub_client(stub) as client, IncidentStore(tmp_path / "s.sqlite") as store:
+        first = fetch_incidents("", page_size=50, concurrency=2, client=client, store=store)
+        again = fetch_incidents("", page_size=50, concurrency=2, client=client, store=store)
+    assert len(first) == len(again) == 200
+
+
+def test_facade_sync_reconciles_dropped_records(tmp_path, stub_client, monkeypatch):
+    from src import snow_client
+
+    data = generate_incidents(200)
+    gone = data["number"].iloc[0]
+    with IncidentStore(tmp_path / "s.sqlite") as store:
+        with SnowStub(data) as stub, stub_client(stub) as client:
+            fetch_incidents("", page_size=50, concurrency=2, client=client, store=store)
+        monkeypatch.setattr(snow_client, "RECONCILE_SECONDS", 0)
+        with SnowStub(data[data["number"] != gone]) as stub, stub_client(stub) as client:
+            rows = fetch_incidents("", page_size=50, concurrency=2, client=client, store=store)
+            # The delta and the key-only reconcile both went through the async client
+            assert shared_client(stub.base_url, client.table).stats.summary()["requests"] == stub.stats()["requests"]
+    assert len(rows) == 199 and gone not in {r["number"] for r in rows}
@@ -0,0 +1,42 @@
+import io
+
+import pandas as pd
+import pytest
+
+from src.csv_ingest import ingest_columns, ingest_csv
+from src.kpis import compute_kpis
+from src.synthetic import generate_incidents
+from src.transforms import load_transform_plan
+
+
+def _assert_same_kpis(got, expected):
+    assert (got.mi_count, got.sites_impacted) == (expected.mi_count, expected.sites_impacted)
+    assert got.p1_ratio == pytest.approx(expected.p1_ratio)
+    assert got.mttr_hours == pytest.approx(expected.mttr_hours)
+    assert got.weekly.equals(expected.weekly)
+
+
+@pytest.mark.parametrize("name", ["sample_incidents.csv", "test_incidents.csv"])
+def test_chunked_ingest_matches_whole_file_transform(name):
+    path = f"tests/data/{name}"
+    expected = load_transform_plan().apply(pd.read_csv(path))
+    result = ingest_csv(path, chunk_rows=7)
+
+    assert result.rows == len(expected) and result.chunks > 1
+    _assert_same_kpis(result.kpis, compute_kpis(expected))
+    _assert_same_kpis(compute_kpis(result.df), compute_kpis(expected))
+    assert result.df["priority"].tolist() == expected["priority"].tolist()
+
+
+def test_only_dashboard_columns_are_read_and_categories_survive_chunking():
+    raw = generate_incidents(2_000)
+    data = raw.to_csv(index=False).encode()
+    assert ingest_columns(list(raw.columns)) == [
+        "number", "priority", "impact", "urgency", "opened_at", "u_resolved", "closed_at",
+        "category", "short_description", "location", "incident_state"]
+
+    result = ingest_csv(io.BytesIO(data), chunk_rows=300)
+    assert "sys_id" not in result.df.columns and "resolved_at" in result.df.columns
+    assert isinstance(result.df["location"].dtype, pd.CategoricalDtype)
+    assert result.chunks == 7
+    _assert_same_kpis(result.kpis, compute_kpis(ingest_csv(data, chunk_rows=10_000, compact=False).df))
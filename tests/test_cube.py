@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+
+from src import kpis
+from src.cube import KpiCube
+from src.synthetic import generate_incidents
+from src.transforms import to_dataframe
+
+
+def _frame():
+    return to_dataframe(generate_incidents(5_000, seed=7, locations=50))
+
+
+def _assert_kpis_equal(got, expected):
+    assert got.mi_count == expected.mi_count
+    assert np.isclose(got.mttr_hours, expected.mttr_hours)
+    assert np.isclose(got.p1_ratio, expected.p1_ratio)
+    assert got.sites_impacted == expected.sites_impacted
+    pd.testing.assert_frame_equal(got.weekly, expected.weekly)
+
+
+def test_slices_match_compute_kpis_on_filtered_rows():
+    df = _frame()
+    cube = KpiCube.build(df)
+    _assert_kpis_equal(cube.kpis(), kpis.compute_kpis(df))
+
+    sites = df["location"].dropna().unique()[:5].tolist()
+    subset = df[df["location"].isin(sites) & (df["category"] == "Network")]
+    _assert_kpis_equal(cube.kpis(location=sites, category="Network"), kpis.compute_kpis(subset))
+
+    recent = df[df["opened_at"] >= pd.Timestamp("2024-07-01", tz="UTC")]
+    _assert_kpis_equal(cube.kpis(week=slice("2024-07-01", None)), kpis.compute_kpis(recent))
+
+
+def test_rollup_distinct_sites_across_merged_cells():
+    df = _frame()
+    cube = KpiCube.build(df)
+    by_priority = cube.rollup("priority").set_index("priority")
+    for priority, group in df[df["is_major"]].groupby("priority"):
+        assert by_priority.loc[priority, "incidents"] == len(group)
+        assert by_priority.loc[priority, "sites_impacted"] == group["location"].nunique()
+    # Sites are counted once even when they appear under several categories and weeks
+    total = cube.rollup(major_only=False).iloc[0]
+    assert total["sites_impacted"] == df["location"].nunique()
+    assert total["incidents"] == len(df)
+
+
+def test_cube_without_optional_columns():
+    df = to_dataframe([{"number": "INC1", "priority": "1", "opened_at": "2025-01-06 08:00:00"}])
+    cube = KpiCube.build(df)
+    assert cube.dimensions == ["week", "priority", "is_major"]
+    res = cube.kpis()
+    assert res.mi_count == 1 and res.sites_impacted == 0 and res.mttr_hours == 0.0
@@ -0,0 +1,52 @@
+import os
+
+import pandas as pd
+
+from src.frame_cache import FrameCache, cache_key, file_fingerprint
+from src.transforms import to_dataframe
+
+
+def _frame():
+    return to_dataframe([
+        {"number": "INC1", "priority": "1", "opened_at": "2025-01-01 08:00:00", "u_resolved": "2025-01-01 10:00:00", "location": "London"},
+        {"number": "INC2", "priority": "3", "opened_at": "2025-01-02 08:00:00", "u_resolved": "", "location": "Mumbai"},
+    ])
+
+
+def test_round_trip_keeps_canonical_dtypes(tmp_path):
+    cache = FrameCache(tmp_path)
+    key = cache_key("priorityIN1,2", ["number"], "hw1")
+    assert cache.get(key) is None
+
+    cache.put(key, _frame())
+    df = cache.get(key)
+    assert str(df["opened_at"].dtype) == "datetime64[ns, UTC]"
+    assert str(df["priority"].dtype) == "Int8"
+    assert df["is_major"].dtype == bool
+    assert isinstance(df["location"].dtype, pd.CategoricalDtype)
+    assert df["resolved_at"].isna().tolist() == [False, True]
+
+
+def test_key_changes_with_fingerprint(tmp_path):
+    path = tmp_path / "export.csv"
+    path.write_text("number\nINC1\n")
+    first = file_fingerprint(path)
+    path.write_text("number\nINC1\nINC2\n")
+    assert cache_key("csv", None, first) != cache_key("csv", None, file_fingerprint(path))
+
+
+def test_ttl_expiry_and_size_eviction(tmp_path):
+    expired = FrameCache(tmp_path / "ttl", ttl_seconds=-1)
+    expired.put("k", _frame())
+    assert expired.get("k") is None
+
+    small = FrameCache(tmp_path / "lru", max_bytes=1)
+    small.put("a", _frame())
+    small.put("b", _frame())
+    assert len(os.listdir(tmp_path / "lru")) <= 1
+
+    builds = []
+    cache = FrameCache(tmp_path / "build")
+    for _ in range(2):
+        cache.get_or_build("k", lambda: builds.append(1) or _frame())
+    assert len(builds) == 1
@@ -0,0 +1,85 @@
+import json
+import logging
+
+import pytest
+
+from src import instrument, kpis
+from src.synthetic import generate_incidents
+from src.transforms import to_dataframe
+
+
+@pytest.fixture
+def enabled():
+    instrument.reset()
+    instrument.enable()
+    yield
+    instrument.enable(False)
+    instrument.reset()
+
+
+def test_disabled_records_nothing():
+    instrument.reset()
+    with instrument.span("x") as s:
+        s.set(rows=1)
+    instrument.count("c")
+    kpis.mttr_hours(to_dataframe(generate_incidents(10)))
+    assert instrument.export_json()["spans"] == {} and instrument.export_json()["counters"] == {}
+
+
+def test_spans_counters_and_exports(enabled, caplog):
+    with caplog.at_level(logging.INFO, logger="mi_dashboard.perf"):
+        df = to_dataframe(generate_incidents(200))
+        kpis.compute_kpis(df)
+        with instrument.span("custom", stage="a") as s:
+            s.set(rows=3)
+        instrument.count("snow.retries", 2)
+
+    data = instrument.export_json()
+    assert {"transform.from_records", "transform.datetime", "kpi.compute_kpis", "custom"} <= set(data["spans"])
+    assert data["spans"]["custom"]["count"] == 1 and data["counters"] == {"snow.retries": 2}
+    logged = [json.loads(r.message) for r in caplog.records]
+    assert {"span": "custom", "stage": "a", "rows": 3}.items() <= next(e for e in logged if e["span"] == "custom").items()
+
+    text = instrument.export_prometheus()
+    assert 'mi_span_count_total{span="kpi.compute_kpis"} 1' in text
+    assert 'mi_counter_total{name="snow.retries"} 2' in text
+
+
+def test_enabling_lets_span_lines_through_without_logging_config(caplog, monkeypatch):
+    monkeypatch.setattr(instrument.logger, "level", logging.NOTSET)
+    instrument.enable()
+    try:
+        with instrument.span("visible"):
+            pass
+    finally:
+        instrument.enable(False)
+        instrument.reset()
+    assert any(json.loads(r.message)["span"] == "visible" for r in caplog.records)
+
+
+def test_profile_dumps_only_when_requested(tmp_path, monkeypatch):
+    with instrument.profile("render") as path:
+        assert path is None
+    monkeypatch.setenv("MI_PROFILE", "cprofile")
+    monkeypatch.setenv("MI_PROFILE_DIR", str(tmp_path))
+    with instrument.profile("render") as path:
+        sum(range(1000))
+    assert path.endswith(".prof") and (tmp_path / path.rsplit("/", 1)[-1]).exists()
+
+
+def test_fetch_counts_requests_retries_and_bytes(enabled, stub_client):
+    from src.snow_client import fetch_incidents
+    from src.snow_stub import SnowStub, StubConfig
+
+    config = StubConfig(error_rate=0.2, error_statuses=(503,), retry_after=0, seed=1)
+    with SnowStub(generate_incidents(1_000), config=config) as stub, stub_client(stub) as client:
+        rows = fetch_incidents("priorityIN1,2,3,4,5", ["number"], page_size=250, use_saved_filter=False,
+                               concurrency=2, client=client)
+        served = stub.stats()
+    data = instrument.export_json()
+    assert len(rows) == 1_000
+    assert data["counters"]["snow.requests"] == served["requests"]
+    assert data["counters"].get("snow.retries", 0) == served["errors"]
+    assert data["counters"]["snow.wire_bytes"] > 0
+    assert data["spans"]["snow.page"]["count"] == served["ok"]
+    assert data["spans"]["snow.fetch_incidents"]["count"] == 1
@@ -0,0 +1,51 @@
+from datetime import datetime, timezone
+
+import pandas as pd
+
+from src.kpi_cache import KpiCache, frame_fingerprint, stamp_frame
+
+
+def _df():
+    def ts(h): return datetime(2025, 5, 1, h, tzinfo=timezone.utc)
+    return pd.DataFrame([
+        {"is_major": True, "opened_at": ts(0), "resolved_at": ts(5), "priority": 1, "location": "SiteA"},
+        {"is_major": True, "opened_at": ts(2), "resolved_at": ts(10), "priority": 2, "location": "SiteB"},
+        {"is_major": False, "opened_at": ts(1), "resolved_at": ts(3), "priority": 3, "location": "SiteA"},
+    ])
+
+
+def test_fingerprint_tracks_content_not_identity():
+    assert frame_fingerprint(_df()) == frame_fingerprint(_df())
+    changed = _df()
+    changed.loc[0, "priority"] = 3
+    assert frame_fingerprint(changed) != frame_fingerprint(_df())
+
+
+def test_stamp_is_used_only_for_the_stamped_object():
+    df = stamp_frame(_df(), "load-42")
+    assert frame_fingerprint(df) == "v:load-42"
+    assert frame_fingerprint(df[df["is_major"]]).startswith("h:")
+
+
+def test_cache_hits_misses_and_lru_eviction():
+    cache = KpiCache(maxsize=2)
+    first = cache.get_or_compute(_df())
+    assert cache.get_or_compute(_df()) is first
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+    other = _df()
+    other.loc[2, "is_major"] = True
+    assert cache.get_or_compute(other).mi_count == 3
+    cache.get_or_compute(_df(), site_col="priority")
+    assert cache.stats()["size"] == 2
+    cache.get_or_compute(_df())  # evicted as least recently used
+    assert cache.stats()["misses"] == 4
+
+
+def test_put_serves_precomputed_results():
+    cache = KpiCache()
+    df = stamp_frame(_df(), "streamed-1")
+    precomputed = cache.get_or_compute(_df())
+    cache.put(df, precomputed)
+    assert cache.get_or_compute(df) is precomputed
+    assert cache.stats()["hits"] == 1
@@ -0,0 +1,67 @@
+
+import pytest
+
+from src.kpi_fetch import fetch_headline_kpis, major_query
+from src.kpis import compute_kpis
+from src.snow_client import (
+    DEFAULT_FIELDS,
+    StatsUnavailable,
+    fetch_incidents,
+    fetch_stats,
+    kpi_fields,
+)
+from src.snow_stub import SnowStub, StubConfig
+from src.synthetic import generate_incidents
+from src.transforms import to_dataframe
+
+
+def test_kpi_fields_and_major_query():
+    assert kpi_fields(["mi_count", "p1_ratio"]) == ["priority"]
+    assert kpi_fields(["mttr_hours", "weekly"]) == ["priority", "opened_at", "u_resolved"]
+    assert set(kpi_fields()) < set(DEFAULT_FIELDS)
+    assert major_query("") == "priorityIN1,2"
+    assert major_query("active=true^NQstate=6") == "active=true^priorityIN1,2^NQstate=6^priorityIN1,2"
+
+
+def test_fetch_stats_grouped_and_total(stub_client):
+    data = generate_incidents(500)
+    with SnowStub(data) as stub, stub_client(stub) as client:
+        assert client.stats_url == f"{stub.base_url[:-len('/table')]}/stats/incident"
+        groups = fetch_stats("priorityIN1,2", ["priority"], client)
+        expected = data[data["priority"].isin(["1", "2"])]["priority"].value_counts()
+        assert {g["priority"]: g["count"] for g in groups} == expected.to_dict()
+        assert fetch_stats("priority=1", client=client) == [{"count": int(expected["1"])}]
+
+
+def test_headline_kpis_match_full_fetch_with_smaller_payload(stub_client):
+    data = generate_incidents(3_000)
+    with SnowStub(data) as stub, stub_client(stub) as client:
+        full = compute_kpis(to_dataframe(fetch_incidents("", DEFAULT_FIELDS, 1_000, use_saved_filter=False,
+                                                         client=client)))
+        full_bytes = client.stats.summary()["body_bytes"]
+        client.stats.reset()
+        headline = fetch_headline_kpis("", page_size=1_000, client=client)
+        headline_bytes = client.stats.summary()["body_bytes"]
+
+    assert headline.mi_count == full.mi_count
+    assert headline.p1_ratio == pytest.approx(full.p1_ratio)
+    assert headline.sites_impacted == full.sites_impacted
+    assert headline.mttr_hours == pytest.approx(full.mttr_hours)
+    assert headline.weekly.equals(full.weekly)
+    assert headline_bytes < full_bytes / 2
+
+
+def test_counts_only_use_stats_and_fall_back_to_rows(stub_client):
+    data = generate_incidents(1_000)
+    with SnowStub(data) as stub, stub_client(stub) as client:
+        counts = fetch_headline_kpis("", ["mi_count", "p1_ratio", "sites_impacted"], client=client)
+        assert stub.stats()["rows"] == 0  # answered from the Aggregate API alone
+
+    with SnowStub(data, config=StubConfig(stats_api=False)) as stub, stub_client(stub) as client:
+        with pytest.raises(StatsUnavailable):
+            fetch_stats("", ["priority"], client)
+        fallback = fetch_headline_kpis("", ["mi_count", "p1_ratio", "sites_impacted"], client=client)
+        assert stub.stats()["rows"] == counts.mi_count
+
+    assert (fallback.mi_count, fallback.p1_ratio, fallback.sites_impacted) == (
+        counts.mi_count, pytest.approx(counts.p1_ratio), counts.sites_impacted)
@@ -25,3 +25,39 @@ def test_p1_ratio():
 
 def test_sites_impacted():
     assert kpis.sites_impacted(_df()) == 2
+
+def test_compute_kpis_matches_individual_functions():
+    df = _df()
+    res = kpis.compute_kpis(df)
+    assert res.mi_count == 2
+    assert abs(res.mttr_hours - kpis.mttr_hours(df)) < 1e-9
+    assert res.p1_ratio == kpis.p1_ratio(df)
+    assert res.sites_impacted == kpis.sites_impacted(df)
+    pd.testing.assert_frame_equal(res.weekly, kpis.weekly_counts(df))
+
+def test_weekly_counts_match_period_grouping():
+    opened = pd.Series(pd.date_range("2024-12-25", periods=60, freq="19h", tz="UTC"))
+    df = pd.DataFrame({"is_major": [i % 3 != 0 for i in range(60)], "opened_at": opened})
+    major = df[df["is_major"]]
+    expected = major.groupby(major["opened_at"].dt.tz_localize(None).dt.to_period("W").dt.start_time).size()
+    wk = kpis.weekly_counts(df)
+    assert wk["week"].tolist() == expected.index.tolist()
+    assert wk["mi_count"].tolist() == expected.tolist()
+
+def test_compute_kpis_handles_nulls_and_categoricals():
+    df = _df()
+    df.loc[1, "resolved_at"] = pd.NaT
+    df["location"] = df["location"].astype("category")
+    df["priority"] = df["priority"].astype("Int8")
+    res = kpis.compute_kpis(df)
+    assert res.mttr_hours == 5.0
+    assert res.sites_impacted == 2
+    assert res.p1_ratio == 0.5
+
+def test_mttr_percentiles():
+    df = _df()
+    assert kpis.mttr_percentiles(df, (0.0, 1.0)) == [5.0, 8.0]
+    res = kpis.compute_kpis(df)
+    assert (res.mttr_p50_hours, res.mttr_p99_hours) == (5.0, 5.0)
+    df["is_major"] = False
+    assert all(pd.isna(v) for v in kpis.mttr_percentiles(df))
@@ -0,0 +1,68 @@
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+from src.local_query import UnsupportedQuery, compile_query, filter_frame
+from src.snow_client import get_complex_manual_query
+from src.snow_stub import SnowStub
+from src.synthetic import generate_incidents
+from src.transforms import compact_frame, to_dataframe
+
+STUB_QUERIES = [
+    "priorityIN1,2",
+    "priority=1^category=Network",
+    "priority!=1",
+    "categoryNOT INNetwork,Database^impact>=2",
+    "location=Site 0003^priority<=2",
+    "u_resolvedBETWEENjavascript:gs.dateGenerate('2024-06-01','00:00:00')@javascript:gs.endOfToday()",
+    "opened_at<javascript:gs.dateGenerate('2024-03-01','00:00:00')^u_resolvedISNOTEMPTY",
+    "sys_updated_on>=javascript:gs.dateGenerate('2024-09-01','00:00:00')",
+]
+
+
+@pytest.fixture(scope="module")
+def incidents():
+    raw = generate_incidents(5_000)
+    return raw, to_dataframe(raw)
+
+
+@pytest.mark.parametrize("query", STUB_QUERIES)
+def test_matches_instance_semantics(incidents, query):
+    raw, df = incidents
+    expected = sorted(SnowStub(raw).matching(query)["number"])
+    assert sorted(filter_frame(df, query)["number"]) == expected
+    compact, _ = compact_frame(df, drop_unused=False)
+    assert sorted(filter_frame(compact, query)["number"]) == expected
+
+
+def test_or_nq_and_null_grouping():
+    df = pd.DataFrame({"number": ["A", "B", "C", "D"], "priority": [1, 2, 3, 1],
+                       "location": ["x", None, "y", ""], "category": ["Network", "Network", "Other", "Other"]})
+    numbers = lambda q: filter_frame(df, q)["number"].tolist()  # noqa: E731
+    assert numbers("priority=3^ORcategory=Network^priority!=2") == ["A", "C"]
+    assert numbers("(location!=x^ORlocation=NULL)^priorityIN1,2") == ["B", "D"]
+    assert numbers("location!=x") == ["C"]  # != never matches empty values
+    assert numbers("locationISEMPTY") == ["B", "D"]
+    assert numbers("priority=3^NQcategory=Network^priority=2") == ["B", "C"]
+    assert numbers("priority=1^ORDERBYnumber^EQ") == ["A", "D"]
+    assert numbers("") == ["A", "B", "C", "D"]
+
+
+def test_relative_dates_resolve_at_evaluation():
+    df = pd.DataFrame({"number": ["A", "B"],
+                       "resolved_at": pd.to_datetime(["2025-01-10 12:00", "2025-01-11 12:00"], utc=True)})
+    query = "u_resolved<=javascript:gs.endOfToday()"
+    assert filter_frame(df, query, now=datetime(2025, 1, 10, 8))["number"].tolist() == ["A"]
+    assert filter_frame(df, query, now=datetime(2025, 1, 11, 8))["number"].tolist() == ["A", "B"]
+
+
+def test_compiled_queries_are_cached_and_unsupported_fields_raise(incidents):
+    _, df = incidents
+    assert compile_query("priorityIN1,2") is compile_query("priorityIN1,2")
+    complex_query = compile_query(get_complex_manual_query())
+    assert not complex_query.supports(df.columns)
+    with pytest.raises(UnsupportedQuery):
+        complex_query.mask(df)
+    with pytest.raises(UnsupportedQuery):
+        compile_query("not a clause")
@@ -0,0 +1,59 @@
+import pandas as pd
+import pytest
+
+from src.kpis import compute_kpis
+from src.parallel import KpiPartial, merge_partials, process_csv, process_records
+from src.synthetic import generate_incidents
+from src.transforms import compact_dtypes, to_dataframe
+
+
+def _assert_same_kpis(got, expected):
+    assert got.mi_count == expected.mi_count
+    assert got.sites_impacted == expected.sites_impacted
+    assert got.p1_ratio == pytest.approx(expected.p1_ratio)
+    assert got.mttr_hours == pytest.approx(expected.mttr_hours)
+    assert (got.mttr_p50_hours, got.mttr_p90_hours, got.mttr_p99_hours) == pytest.approx(
+        (expected.mttr_p50_hours, expected.mttr_p90_hours, expected.mttr_p99_hours))
+    assert got.weekly.equals(expected.weekly)
+
+
+def test_partials_merge_to_whole_frame_kpis():
+    df = to_dataframe(generate_incidents(5_000))
+    expected = compute_kpis(df)
+    parts = [KpiPartial.from_frame(df.iloc[i:i + 800]) for i in range(0, len(df), 800)]
+    _assert_same_kpis(merge_partials(parts), expected)
+    assert merge_partials([]).mi_count == 0
+
+
+def test_process_csv_matches_single_process(tmp_path):
+    raw = generate_incidents(6_000)
+    raw.loc[::50, "location"] = ""  # blanks are missing sites, not a site called ""
+    path = tmp_path / "export.csv"
+    raw.to_csv(path, index=False)
+    expected_df = to_dataframe(pd.read_csv(path, dtype=str))
+
+    df, result = process_csv(path, workers=2, shard_rows=1_000, compact=False)
+    _assert_same_kpis(result, compute_kpis(expected_df))
+    # Arrow hands back None for missing strings where read_csv has NaN
+    blanks = dict.fromkeys(expected_df.select_dtypes(object).columns, "")
+    pd.testing.assert_frame_equal(df.fillna(blanks), expected_df.fillna(blanks))
+
+    # The default matches ingest_csv: compact dtypes, categories unified across shards
+    df, _ = process_csv(path, workers=2, shard_rows=1_000)
+    compacted = compact_dtypes(expected_df)
+    assert df.dtypes.to_dict() == compacted.dtypes.to_dict()
+    blanks = dict.fromkeys(compacted.select_dtypes(object).columns, "")
+    pd.testing.assert_frame_equal(df.fillna(blanks), compacted.fillna(blanks), check_categorical=False)
+
+    df, kpis_only = process_csv(path, workers=2, shard_rows=1_000, keep_frame=False)
+    assert df is None and kpis_only.mi_count == result.mi_count
+
+
+def test_process_records_pages():
+    raw = generate_incidents(3_000)
+    records = raw.to_dict("records")
+    pages = [records[i:i + 500] for i in range(0, len(records), 500)]
+    df, result = process_records(pages, workers=2, shard_rows=1_000)
+    expected_df = to_dataframe(records)
+    _assert_same_kpis(result, compute_kpis(expected_df))
+    assert len(df) == len(expected_df)
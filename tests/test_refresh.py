@@ -0,0 +1,80 @@
+import os
+import time
+
+from src.kpi_cache import frame_fingerprint
+from src.refresh import MIN_INTERVAL_SECONDS, RefreshWorker, SnapshotStore
+from src.synthetic import generate_incidents
+from src.transforms import to_dataframe
+
+
+def test_publish_is_visible_to_other_readers_and_prunes_old_files(tmp_path):
+    writer = SnapshotStore("priorityIN1,2", tmp_path)
+    reader = SnapshotStore("priorityIN1,2", tmp_path)
+    assert reader.latest() is None
+
+    for seed in range(4):
+        published = writer.publish(to_dataframe(generate_incidents(300, seed=seed)))
+    seen = reader.latest()
+    assert seen.version == published.version and len(seen.df) == 300
+    assert seen.kpis.mi_count == published.kpis.mi_count
+    assert frame_fingerprint(seen.df) == f"v:{published.version}"
+    assert reader.latest() is seen  # memoised until the next publish
+    assert len([n for n in os.listdir(tmp_path) if n.endswith(".feather")]) == 2
+    assert SnapshotStore("priorityIN1", tmp_path).latest() is None
+
+
+def test_failed_refresh_keeps_last_good_snapshot(tmp_path):
+    store = SnapshotStore("q", tmp_path)
+    frames = iter([to_dataframe(generate_incidents(100)), RuntimeError("instance down")])
+
+    def build():
+        item = next(frames)
+        if isinstance(item, Exception):
+            raise item
+        return item
+
+    worker = RefreshWorker(store, build)
+    good = worker.run_once()
+    assert worker.run_once() is None
+    assert store.latest().version == good.version
+    assert store.status() == {**store.status(), "refreshing": False, "last_error": "RuntimeError: instance down"}
+
+
+def _wait_for(predicate, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out waiting for a snapshot"
+        time.sleep(0.01)
+
+
+def test_background_thread_refreshes_on_trigger(tmp_path):
+    store = SnapshotStore("q", tmp_path)
+    worker = RefreshWorker(store, lambda: to_dataframe(generate_incidents(50)), interval=3600).start()
+    try:
+        _wait_for(lambda: store.latest() is not None)
+        first = store.latest().version
+        worker.trigger()
+        _wait_for(lambda: store.latest().version != first)
+    finally:
+        worker.stop(timeout=10)
+    assert not worker.refreshing
+
+
+def test_zero_interval_disables_periodic_refresh(tmp_path):
+    store = SnapshotStore("q", tmp_path)
+    builds = []
+
+    def build():
+        builds.append(1)
+        return to_dataframe(generate_incidents(50))
+
+    worker = RefreshWorker(store, build, interval=0).start()
+    assert not worker.enabled and worker._thread is None
+    time.sleep(0.1)
+    assert builds == [] and store.latest() is None
+
+    worker.trigger()  # one refresh on request, then idle again
+    _wait_for(lambda: store.latest() is not None and not worker.refreshing)
+    time.sleep(0.1)
+    assert len(builds) == 1
+    assert RefreshWorker(store, build, interval=0.01).interval == MIN_INTERVAL_SECONDS
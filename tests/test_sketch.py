@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+
+from src.sketch import DDSketch
+
+
+def _durations(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return np.concatenate([rng.lognormal(np.log(10), 1.2, n), [0.0] * 5, rng.uniform(500, 720, n // 100)])
+
+
+@pytest.mark.parametrize("accuracy", [0.01, 0.02])
+def test_quantiles_within_relative_accuracy_of_numpy(accuracy):
+    values = _durations(200_000)
+    sketch = DDSketch(accuracy).add(values)
+    qs = [0.0, 0.01, 0.5, 0.9, 0.99, 0.999, 1.0]
+    exact = np.percentile(values, [q * 100 for q in qs], method="lower")
+    assert np.allclose(sketch.quantiles(qs), exact, rtol=accuracy, atol=0)
+    assert sketch.count == len(values)
+
+
+def test_merge_equals_sketch_of_union():
+    a, b = _durations(50_000, seed=1), _durations(30_000, seed=2)
+    merged = DDSketch().add(a) + DDSketch().add(b)
+    whole = DDSketch().add(np.concatenate([a, b]))
+    assert merged.bins == whole.bins and merged.count == whole.count
+    with pytest.raises(ValueError):
+        DDSketch(0.01).merge(DDSketch(0.05))
+
+
+def test_empty_and_invalid_input():
+    assert np.isnan(DDSketch().quantile(0.5))
+    assert DDSketch().add([np.nan, 3.0]).count == 1
+    with pytest.raises(ValueError):
+        DDSketch().add([-1.0])
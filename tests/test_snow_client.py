@@ -1,8 +1,11 @@
+import json
 import os
 
 import responses
 
-from src.snow_client import fetch_incidents
+from src import snow_client
+from src.snow_client import SnowClient, fetch_incidents, iter_incident_pages
+from src.store import IncidentStore
 
 
 @responses.activate
@@ -20,3 +23,130 @@ def test_fetch_incidents_paginates():
     responses.add(responses.GET, url, json={"result":[]}, status=200)
     out = fetch_incidents(query="priority=1")
     assert len(out) == 1 and out[0]["number"] == "INC1"
+
+
+@responses.activate
+def test_fetch_incidents_concurrent_keeps_offset_order():
+    os.environ['SNOW_INSTANCE'] = 'test-instance'
+    os.environ['SNOW_USERNAME'] = 'test-user'
+    os.environ['SNOW_PASSWORD'] = 'test-password'
+
+    url = "https://test-instance.service-now.com/api/now/table/incident"
+    rows = [{"number": f"INC{i}"} for i in range(7)]
+    throttled = set()
+
+    def page(request):
+        offset = int(request.params["sysparm_offset"])
+        limit = int(request.params["sysparm_limit"])
+        # Rate-limit each page once to exercise the shared Retry-After backoff
+        if offset not in throttled:
+            throttled.add(offset)
+            return (429, {"Retry-After": "0"}, "{}")
+        body = json.dumps({"result": rows[offset:offset + limit]})
+        return (200, {"X-Total-Count": str(len(rows))}, body)
+
+    responses.add_callback(responses.GET, url, callback=page)
+    out = fetch_incidents(query="priority=1", page_size=2, concurrency=3)
+    assert [r["number"] for r in out] == [r["number"] for r in rows]
+
+
+@responses.activate
+def test_snow_client_reuses_session_and_records_stats():
+    os.environ['SNOW_USERNAME'] = 'test-user'
+    os.environ['SNOW_PASSWORD'] = 'test-password'
+
+    url = "https://stub.example/api/now/table/incident"
+    responses.add(responses.GET, url, json={"result": [{"number": "INC1"}, {"number": "INC2"}]}, status=200)
+    responses.add(responses.GET, url, json={"result": [{"number": "INC3"}]}, status=200)
+
+    with SnowClient(base_url="https://stub.example/api/now/table", table="incident") as client:
+        out = fetch_incidents(query="priority=1", page_size=2, client=client)
+        stats = client.stats.summary()
+
+    assert [r["number"] for r in out] == ["INC1", "INC2", "INC3"]
+    assert stats["requests"] == 2
+    assert stats["body_bytes"] > 0
+    assert "gzip" in responses.calls[0].request.headers["Accept-Encoding"]
+
+
+@responses.activate
+def test_fetch_incidents_incremental_sync_requests_only_updates():
+    os.environ['SNOW_USERNAME'] = 'test-user'
+    os.environ['SNOW_PASSWORD'] = 'test-password'
+
+    url = "https://stub.example/api/now/table/incident"
+    responses.add(responses.GET, url, json={"result": [
+        {"sys_id": "a", "number": "INC1", "sys_updated_on": "2025-01-01 10:00:00"},
+        {"sys_id": "b", "number": "INC2", "sys_updated_on": "2025-01-02 09:30:00"},
+    ]}, status=200)
+    responses.add(responses.GET, url, json={"result": [
+        {"sys_id": "b", "number": "INC2", "sys_updated_on": "2025-01-03 08:00:00"},
+    ]}, status=200)
+
+    store = IncidentStore(":memory:")
+    client = SnowClient(base_url="https://stub.example/api/now/table", table="incident")
+    first = fetch_incidents(query="priority=1", client=client, store=store)
+    second = fetch_incidents(query="priority=1", client=client, store=store)
+
+    assert "sys_updated_on" not in responses.calls[0].request.params["sysparm_query"]
+    delta = responses.calls[1].request.params["sysparm_query"]
+    assert delta == "priority=1^sys_updated_on>=javascript:gs.dateGenerate('2025-01-02','09:30:00')"
+    assert "sys_id" in responses.calls[0].request.params["sysparm_fields"]
+    assert len(first) == 2 and len(second) == 2
+    assert second[1]["sys_updated_on"] == "2025-01-03 08:00:00"
+
+
+@responses.activate
+def test_incremental_sync_drops_records_the_query_no_longer_returns(monkeypatch):
+    os.environ['SNOW_USERNAME'] = 'test-user'
+    os.environ['SNOW_PASSWORD'] = 'test-password'
+    monkeypatch.setattr(snow_client, "RECONCILE_SECONDS", 0)
+
+    url = "https://stub.example/api/now/table/incident"
+    responses.add(responses.GET, url, json={"result": [
+        {"sys_id": "a", "number": "INC1", "sys_updated_on": "2025-01-01 10:00:00"},
+        {"sys_id": "b", "number": "INC2", "sys_updated_on": "2025-01-02 09:30:00"},
+    ]}, status=200)
+    # INC1 was downgraded: the delta is empty and the key-only check no longer lists it
+    responses.add(responses.GET, url, json={"result": []}, status=200)
+    responses.add(responses.GET, url, json={"result": [{"sys_id": "b", "number": "INC2"}]}, status=200)
+
+    store = IncidentStore(":memory:")
+    client = SnowClient(base_url="https://stub.example/api/now/table", table="incident")
+    assert len(fetch_incidents(query="priority=1", client=client, store=store)) == 2
+    second = fetch_incidents(query="priority=1", client=client, store=store)
+
+    assert [r["number"] for r in second] == ["INC2"]
+    assert responses.calls[2].request.params["sysparm_fields"] == "sys_id,number"
+    assert store.records() == second
+
+
+@responses.activate
+def test_iter_incident_pages_yields_each_page():
+    os.environ['SNOW_USERNAME'] = 'test-user'
+    os.environ['SNOW_PASSWORD'] = 'test-password'
+
+    url = "https://stub.example/api/now/table/incident"
+    responses.add(responses.GET, url, json={"result": [{"number": "INC1"}, {"number": "INC2"}]}, status=200)
+    responses.add(responses.GET, url, json={"result": [{"number": "INC3"}]}, status=200)
+
+    client = SnowClient(base_url="https://stub.example/api/now/table", table="incident")
+    pages = iter_incident_pages(query="priority=1", page_size=2, client=client)
+    assert [r["number"] for r in next(pages)] == ["INC1", "INC2"]
+    assert len(responses.calls) == 1  # second page not requested until asked for
+    assert [r["number"] for r in next(pages)] == ["INC3"]
+    assert next(pages, None) is None
+
+
+def test_request_stats_stay_bounded(monkeypatch):
+    monkeypatch.setattr(snow_client, "RECENT_LATENCIES", 3)
+    stats = snow_client.RequestStats()
+    for i in range(1, 11):
+        stats.record(i / 10, 100, 40, 200 if i % 5 else 429)
+    assert list(stats.latencies) == [0.8, 0.9, 1.0]
+    assert stats.statuses == {200: 8, 429: 2}
+    summary = stats.summary()
+    assert summary["requests"] == 10 and summary["body_bytes"] == 1_000 and summary["wire_bytes"] == 400
+    assert summary["mean_latency_s"] == 0.55 and summary["max_latency_s"] == 1.0
+    stats.reset()
+    assert stats.summary()["requests"] == 0 and not stats.latencies
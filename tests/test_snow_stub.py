@@ -0,0 +1,76 @@
+import pandas as pd
+import requests
+
+from src.snow_client import fetch_incidents
+from src.snow_stub import SnowStub, StubConfig
+from src.synthetic import generate_incidents
+
+
+def test_pages_fields_and_total_count():
+    data = generate_incidents(1_200)
+    with SnowStub(data) as stub:
+        url = f"{stub.base_url}/incident"
+        resp = requests.get(url, params={"sysparm_limit": "500", "sysparm_offset": "1000",
+                                         "sysparm_fields": "number,priority"})
+        assert resp.status_code == 200
+        assert resp.headers["X-Total-Count"] == "1200"
+        rows = resp.json()["result"]
+        assert len(rows) == 200 and set(rows[0]) == {"number", "priority"}
+        assert rows[0]["number"] == data["number"].iloc[1_000]
+        assert requests.get(f"{stub.base_url}/change_request").status_code == 404
+
+
+def test_encoded_query_subset():
+    data = pd.DataFrame({
+        "number": ["INC1", "INC2", "INC3", "INC4"],
+        "priority": ["1", "2", "3", "1"],
+        "u_resolved": ["2025-01-05 10:00:00", "", "2025-02-01 00:00:00", "2024-12-31 23:00:00"],
+    })
+    stub = SnowStub(data)
+    try:
+        def numbers(query):
+            return stub.matching(query)["number"].tolist()
+
+        assert numbers("priorityIN1,2") == ["INC1", "INC2", "INC4"]
+        assert numbers("priority=1^u_resolvedISNOTEMPTY") == ["INC1", "INC4"]
+        assert numbers("priority>=2") == ["INC2", "INC3"]
+        assert numbers("u_resolved>=javascript:gs.dateGenerate('2025-01-01','00:00:00')") == ["INC1", "INC3"]
+        assert numbers("u_resolvedBETWEENjavascript:gs.dateGenerate('2025-01-01','00:00:00')"
+                       "@javascript:gs.dateGenerate('2025-01-31','23:59:59')") == ["INC1"]
+        # Unsupported clauses are skipped rather than over-filtering
+        assert numbers("priority=3^location.u_region=EMEA") == ["INC3"]
+        assert numbers("priority=3^ORpriority=2") == ["INC1", "INC2", "INC3", "INC4"]
+        assert "location.u_region=EMEA" in stub.ignored_clauses
+    finally:
+        stub.stop()
+
+
+def test_fetch_incidents_survives_injected_throttling_and_errors(stub_client):
+    data = generate_incidents(2_000)
+    config = StubConfig(throttle_rate=0.2, error_rate=0.1, error_statuses=(503,), retry_after=0, seed=3)
+    with SnowStub(data, config=config) as stub, stub_client(stub) as client:
+        rows = fetch_incidents("priorityIN1,2,3", ["number", "priority"], page_size=200,
+                               use_saved_filter=False, concurrency=4, client=client)
+        served = stub.stats()
+        assert [r["number"] for r in rows] == stub.matching("priorityIN1,2,3")["number"].tolist()
+        assert served["throttled"] + served["errors"] > 0
+        assert client.stats.summary()["requests"] == served["requests"]
+        assert client.stats.statuses[200] == served["ok"]
+
+
+def test_relative_dates_match_the_local_evaluator():
+    from datetime import datetime, timedelta, timezone
+
+    from src.local_query import filter_frame
+    from src.transforms import to_dataframe
+
+    data = generate_incidents(300)
+    # Either side of the UTC day boundary, where a local-date stub used to disagree
+    today = datetime.now(timezone.utc).replace(tzinfo=None, hour=0, minute=0, second=0, microsecond=0)
+    data.loc[:9, "opened_at"] = (today + timedelta(minutes=1)).strftime("%Y-%m-%d %H:%M:%S")
+    data.loc[10:19, "opened_at"] = (today - timedelta(minutes=1)).strftime("%Y-%m-%d %H:%M:%S")
+    query = "opened_at>=javascript:gs.beginningOfToday()^opened_at<=javascript:gs.endOfToday()"
+    with SnowStub(data) as stub:
+        served = stub.matching(query)
+    assert sorted(served["number"]) == sorted(filter_frame(to_dataframe(data), query)["number"])
+    assert len(served) >= 10 and not set(data["number"][10:20]) & set(served["number"])
@@ -0,0 +1,48 @@
+from src.store import IncidentStore
+
+
+def test_upsert_tracks_high_water_mark_and_replaces_by_key():
+    store = IncidentStore(":memory:")
+    store.upsert("priority=1", [
+        {"sys_id": "a", "number": "INC1", "priority": "1", "sys_updated_on": "2025-01-01 10:00:00"},
+        {"sys_id": "b", "number": "INC2", "priority": "1", "sys_updated_on": "2025-01-02 09:00:00"},
+    ])
+    assert store.high_water_mark("priority=1") == "2025-01-02 09:00:00"
+
+    store.upsert("priority=1", [{"sys_id": "a", "number": "INC1", "priority": "2", "sys_updated_on": "2025-01-03 00:00:00"}])
+    records = store.records("priority=1")
+    assert [r["number"] for r in records] == ["INC1", "INC2"]
+    assert records[0]["priority"] == "2"
+    assert store.high_water_mark("priority=1") == "2025-01-03 00:00:00"
+    assert store.high_water_mark("priority=2") is None
+
+
+def test_records_are_scoped_per_query_but_stored_once():
+    store = IncidentStore(":memory:")
+    rec = {"sys_id": "a", "number": "INC1", "sys_updated_on": "2025-01-01 10:00:00"}
+    store.upsert("q1", [rec])
+    store.upsert("q2", [rec, {"sys_id": "b", "number": "INC2", "sys_updated_on": "2025-01-01 11:00:00"}])
+    assert len(store.records("q1")) == 1
+    assert len(store.records("q2")) == 2
+    assert len(store.records()) == 2
+
+    store.reset("q2")
+    assert store.records("q2") == [] and store.high_water_mark("q2") is None
+
+
+def test_reconcile_drops_members_the_query_no_longer_returns():
+    store = IncidentStore(":memory:")
+    shared = {"sys_id": "a", "number": "INC1", "sys_updated_on": "2025-01-01 10:00:00"}
+    store.upsert("q1", [shared, {"sys_id": "b", "number": "INC2", "sys_updated_on": "2025-01-01 11:00:00"}])
+    store.upsert("q2", [shared])
+    assert store.reconciled_at("q1") is None
+    before = store.version("q1")
+
+    assert store.reconcile("q1", ["b"]) == 1
+    assert store.version("q1") != before  # the high-water mark has not moved
+    assert [r["number"] for r in store.records("q1")] == ["INC2"]
+    # Still a member of q2, so the record itself is kept
+    assert [r["number"] for r in store.records("q2")] == ["INC1"]
+    assert store.reconcile("q2", []) == 1
+    assert [r["number"] for r in store.records()] == ["INC2"]
+    assert store.reconciled_at("q1") is not None
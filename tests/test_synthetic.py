@@ -0,0 +1,48 @@
+import json
+
+import pandas as pd
+
+from src.synthetic import (
+    generate_incidents,
+    iter_pages,
+    to_records,
+    write_csv,
+    write_json_pages,
+    write_parquet,
+)
+from src.transforms import to_dataframe
+
+
+def test_shape_and_distribution():
+    df = generate_incidents(20_000, seed=1)
+    assert len(df) == 20_000
+    assert df["number"].is_unique and df["sys_id"].is_unique
+    shares = df["priority"].value_counts(normalize=True)
+    assert shares["4"] > shares["3"] > shares["1"]
+    unresolved = df["u_resolved"] == ""
+    assert 0.02 < unresolved.mean() < 0.06
+    assert (df.loc[unresolved, "closed_at"] == "").all()
+    # Zipf-like: the busiest site sees far more than an average one
+    assert df["location"].value_counts().iloc[0] > 10 * len(df) / 2_000
+
+
+def test_same_seed_is_reproducible():
+    pd.testing.assert_frame_equal(generate_incidents(500, seed=7), generate_incidents(500, seed=7))
+
+
+def test_records_feed_the_transform_plan():
+    df = to_dataframe(to_records(generate_incidents(1_000)))
+    assert str(df["opened_at"].dtype) == "datetime64[ns, UTC]"
+    assert df["opened_at"].notna().all()
+    assert (df["resolved_at"].dropna() > df.loc[df["resolved_at"].notna(), "opened_at"]).all()
+    assert sum(len(p) for p in iter_pages(generate_incidents(1_234), page_size=500)) == 1_234
+
+
+def test_writers(tmp_path):
+    df = generate_incidents(1_100)
+    pages = write_json_pages(df, tmp_path / "pages", page_size=500)
+    assert len(pages) == 3
+    with open(pages[-1], encoding="utf-8") as fh:
+        assert len(json.load(fh)["result"]) == 100
+    assert len(pd.read_csv(write_csv(df, tmp_path / "incidents.csv"))) == 1_100
+    assert pd.read_parquet(write_parquet(df, tmp_path / "incidents.parquet")).equals(df)
@@ -0,0 +1,30 @@
+import pandas as pd
+
+from src.synthetic import generate_incidents
+from src.table_view import page_frame
+from src.transforms import compact_frame, to_dataframe
+
+
+def _frame():
+    return to_dataframe(generate_incidents(2_000, seed=9, locations=20))
+
+
+def test_pages_cover_filtered_rows_in_sort_order():
+    df = _frame()
+    expected = df[df["priority"].isin([1, 2])].sort_values("opened_at", ascending=False, kind="stable")
+    first = page_frame(df, page=1, page_size=25, filters={"priority": [1, 2]}, sort_by="opened_at")
+    assert first.total == len(expected) and first.pages == -(-len(expected) // 25)
+    pd.testing.assert_frame_equal(first.rows, expected.iloc[:25])
+    # Deep pages take the full-sort path and must agree
+    last = page_frame(df, page=first.pages, page_size=25, filters={"priority": [1, 2]}, sort_by="opened_at")
+    pd.testing.assert_frame_equal(last.rows, expected.iloc[(first.pages - 1) * 25:])
+
+
+def test_search_and_page_clamping_with_categoricals():
+    df, _ = compact_frame(_frame())
+    site = str(df["location"].cat.categories[3])
+    page = page_frame(df, page=999, page_size=10, search=site.lower(), columns=["number", "location"])
+    matches = df["location"].astype(str).str.contains(site, case=False, regex=False)
+    assert page.total == int(matches.sum())
+    assert page.page == page.pages and list(page.rows.columns) == ["number", "location"]
+    assert page_frame(df.iloc[:0]).pages == 1
@@ -0,0 +1,116 @@
+import os
+from datetime import date, datetime
+
+import pytest
+
+from src import time_slices
+from src.snow_client import fetch_incidents, get_saved_filter_query
+from src.snow_stub import SnowStub
+from src.synthetic import generate_incidents
+from src.time_slices import (
+    SliceCheckpoint,
+    checkpoint_key,
+    fetch_time_sliced,
+    prune_checkpoints,
+    split_date_range,
+)
+
+
+def test_split_date_range():
+    now = datetime(2025, 6, 10, 12, 0, 0)
+    dates = split_date_range(get_saved_filter_query("PYTHON: MAJOR IM"), now=now)
+    assert dates.field == "u_resolved"
+    assert dates.start == datetime(2025, 1, 1)
+    assert dates.end == datetime(2025, 6, 11)  # end of today, exclusive
+    assert dates.rest == "priorityIN1,2^location.u_region=EMEA"
+    assert dates.query(datetime(2025, 1, 1), datetime(2025, 2, 1)).endswith(
+        "u_resolved<javascript:gs.dateGenerate('2025-02-01','00:00:00')")
+
+    dates = split_date_range("opened_at>2024-01-01 00:00:00^opened_at<=2024-12-31^priority>=2", now=now)
+    assert (dates.start, dates.end, dates.rest) == (datetime(2024, 1, 1, 0, 0, 1), datetime(2024, 12, 31, 0, 0, 1),
+                                                    "priority>=2")
+    assert split_date_range("priorityIN1,2") is None
+    assert split_date_range("opened_at<=2024-12-31") is None  # no lower bound
+    assert split_date_range("opened_at>=2024-01-01^ORpriority=1") is None
+    assert split_date_range("opened_at>=2024-01-01^NQpriority=1") is None
+
+
+def test_sliced_fetch_matches_offset_paging(tmp_path, stub_client):
+    data = generate_incidents(3_000, days=365)
+    query = "priorityIN1,2,3^opened_atBETWEENjavascript:gs.dateGenerate('2024-01-01','00:00:00')" \
+            "@javascript:gs.dateGenerate('2024-12-31','23:59:59')"
+    done = []
+    with SnowStub(data) as stub, stub_client(stub) as client:
+        paged = fetch_incidents(query, ["number", "opened_at"], 200, use_saved_filter=False, client=client)
+        sliced = fetch_time_sliced(query, ["number", "opened_at"], 200, concurrency=4, max_rows=150,
+                                   checkpoint_dir=tmp_path, client=client, on_slice=lambda s, n: done.append(n))
+    assert sorted(r["number"] for r in sliced) == sorted(r["number"] for r in paged)
+    assert len(done) > 4 and max(done) <= 150
+    assert not os.listdir(tmp_path)  # checkpoints are cleared once complete
+
+
+def test_interrupted_backfill_resumes_from_checkpoint(tmp_path, monkeypatch, stub_client):
+    data = generate_incidents(2_000, days=365)
+    query = "opened_at>=2024-01-01^opened_at<2025-01-01"
+    fields = ["number", "opened_at"]
+    calls = []
+
+    def flaky_fetch(slice_query, *args, **kwargs):
+        calls.append(slice_query)
+        if len(calls) % 2 == 0:
+            raise ConnectionError("connection reset")
+        return fetch_incidents(slice_query, *args, **kwargs)
+
+    monkeypatch.setattr(time_slices, "SLICE_ATTEMPTS", 1)
+    monkeypatch.setattr(time_slices, "fetch_incidents", flaky_fetch)
+    with SnowStub(data) as stub, stub_client(stub) as client:
+        with pytest.raises(ConnectionError):
+            fetch_time_sliced(query, fields, 500, concurrency=2, max_rows=300, checkpoint_dir=tmp_path,
+                              client=client)
+    monkeypatch.undo()
+    checkpoint = SliceCheckpoint(tmp_path, checkpoint_key(split_date_range(query), fields))
+    plan = checkpoint.load_plan()
+    finished = [s for s in plan if checkpoint.load(s) is not None]
+    assert 0 < len(finished) < len(plan)
+
+    with SnowStub(data) as stub, stub_client(stub) as client:
+        rows = fetch_time_sliced(query, fields, 500, concurrency=2, max_rows=300, checkpoint_dir=tmp_path,
+                                 client=client)
+        # The plan is reused and only unfinished slices are fetched again (one page each)
+        assert stub.stats()["requests"] == len(plan) - len(finished)
+    assert sorted(r["number"] for r in rows) == sorted(data["number"])
+    assert not os.path.exists(checkpoint.path)
+
+
+def test_checkpoints_are_keyed_on_resolved_bounds_and_day(tmp_path):
+    fields = ["number"]
+    relative = "opened_at>=javascript:gs.beginningOfToday()^opened_at<=javascript:gs.endOfToday()"
+    monday = split_date_range(relative, now=datetime(2025, 6, 9, 12))
+    tuesday = split_date_range(relative, now=datetime(2025, 6, 10, 12))
+    assert checkpoint_key(monday, fields, date(2025, 6, 10)) != checkpoint_key(tuesday, fields, date(2025, 6, 10))
+    # "Now" as the upper bound moves every second, but the backfill is the same one all day
+    morning = split_date_range("opened_at>=2024-01-01", now=datetime(2025, 6, 10, 8))
+    evening = split_date_range("opened_at>=2024-01-01", now=datetime(2025, 6, 10, 20))
+    assert checkpoint_key(morning, fields, date(2025, 6, 10)) == checkpoint_key(evening, fields, date(2025, 6, 10))
+    assert checkpoint_key(morning, fields, date(2025, 6, 10)) != checkpoint_key(morning, fields, date(2025, 6, 11))
+
+    stale = SliceCheckpoint(tmp_path, checkpoint_key(morning, fields, date(2025, 6, 10)))
+    current = SliceCheckpoint(tmp_path, checkpoint_key(morning, fields, date(2025, 6, 11)))
+    stale.save_plan([])
+    current.save_plan([])
+    prune_checkpoints(tmp_path, date(2025, 6, 11))
+    assert stale.load_plan() is None and current.load_plan() == []
+
+
+def test_fetch_incidents_slices_only_date_bounded_queries(tmp_path, monkeypatch, stub_client):
+    monkeypatch.chdir(tmp_path)  # checkpoints go to data/slices under the working directory
+    data = generate_incidents(1_000, days=365)
+    with SnowStub(data) as stub, stub_client(stub) as client:
+        rows = fetch_incidents("opened_at>=2024-01-01", ["number"], 500, use_saved_filter=False,
+                               concurrency=4, client=client, slice_rows=200)
+        assert sorted(r["number"] for r in rows) == sorted(data["number"])
+        sliced_requests = stub.stats()["requests"]
+        assert sliced_requests > 2
+        rows = fetch_incidents("priorityIN1,2", ["number"], 500, use_saved_filter=False, client=client,
+                               slice_rows=200)
+        assert stub.stats()["requests"] == sliced_requests + 1
@@ -0,0 +1,44 @@
+import pandas as pd
+
+from src.timeparse import _estimate_distinct, detect_format, parse_timestamps
+
+
+def test_servicenow_strings_parse_to_utc():
+    out = parse_timestamps(pd.Series(["2025-01-02 12:00:00", "", None, "junk"]))
+    assert str(out.dtype) == "datetime64[ns, UTC]"
+    assert out.iloc[0] == pd.Timestamp("2025-01-02 12:00:00", tz="UTC")
+    assert out.iloc[1:].isna().all()
+
+
+def test_format_detection_handles_csv_exports():
+    assert detect_format(pd.Series(["2025-01-02 12:00:00", "junk"])) == "%Y-%m-%d %H:%M:%S"
+    assert detect_format(pd.Series(["13/01/2025 08:30:00"])) == "%d/%m/%Y %H:%M:%S"
+    out = parse_timestamps(pd.Series(["13/01/2025 08:30:00", "02/03/2025 09:00:00"]))
+    assert out.tolist() == [pd.Timestamp("2025-01-13 08:30", tz="UTC"), pd.Timestamp("2025-03-02 09:00", tz="UTC")]
+
+
+def test_existing_datetimes_are_normalised_not_reparsed():
+    naive = pd.Series(pd.to_datetime(["2025-01-02 12:00:00"]))
+    assert parse_timestamps(naive).iloc[0] == pd.Timestamp("2025-01-02 12:00:00", tz="UTC")
+    cet = naive.dt.tz_localize("Europe/Paris")
+    assert parse_timestamps(cet).iloc[0] == pd.Timestamp("2025-01-02 11:00:00", tz="UTC")
+
+
+def test_dedupe_path_matches_direct_parse():
+    hours = pd.date_range("2025-01-01", periods=200, freq="h").strftime("%Y-%m-%d %H:%M:%S")
+    s = pd.Series(list(hours) * 100 + [None])
+    expected = pd.to_datetime(s, format="%Y-%m-%d %H:%M:%S", utc=True)
+    pd.testing.assert_series_equal(parse_timestamps(s), expected)
+
+
+def test_distinct_estimate():
+    assert _estimate_distinct(10_000, 10_000, 1_000_000) == 1_000_000
+    assert 150 < _estimate_distinct(199, 10_000, 20_000) < 250
+
+
+def test_fixed_width_path_rejects_bad_dates_and_falls_back_for_unpadded():
+    s = pd.Series(["30/02/2025 10:00:00", "1/2/2025 10:00:00", "13/01/2025 08:30:00", None])
+    out = parse_timestamps(s, fmt="%d/%m/%Y %H:%M:%S")
+    assert pd.isna(out.iloc[0]) and pd.isna(out.iloc[3])
+    assert out.iloc[1] == pd.Timestamp("2025-02-01 10:00", tz="UTC")
+    assert out.iloc[2] == pd.Timestamp("2025-01-13 08:30", tz="UTC")
@@ -0,0 +1,88 @@
+import pandas as pd
+
+from src.transforms import (
+    TransformPlan,
+    compact_frame,
+    load_transform_plan,
+    to_dataframe,
+    to_dataframe_chunked,
+)
+
+
+def _records(n):
+    return [
+        {"number": f"INC{i}", "priority": str(i % 4 + 1), "opened_at": f"2025-03-{i % 28 + 1:02d} 08:00:00",
+         "u_resolved": f"2025-03-{i % 28 + 1:02d} 12:30:00", "location": f"Site{i % 3}"}
+        for i in range(n)
+    ]
+
+
+def test_to_dataframe_chunked_matches_single_pass():
+    records = _records(10)
+    pages = [records[0:4], records[4:8], records[8:10]]
+    expected = to_dataframe(records)
+    pd.testing.assert_frame_equal(to_dataframe_chunked(iter(pages)), expected)
+
+
+def test_to_dataframe_chunked_handles_no_pages():
+    df = to_dataframe_chunked([])
+    assert df.empty and "is_major" in df.columns
+
+
+def test_transform_plan_normalises_csv_exports():
+    raw = pd.DataFrame({
+        "incident_id": ["INC001", "INC002", "INC003"],
+        "priority": ["P1", "3 - Moderate", None],
+        "created_date": ["2024-01-01 10:00:00", "2024-01-03 14:30:00", "bad"],
+        "resolved_date": ["2024-01-01 16:00:00", None, None],
+        "sites_impacted": ["Site A", "Site C", "Site B"],
+    })
+    timings = {}
+    df = load_transform_plan().apply(raw, timings)
+
+    assert {"number", "opened_at", "resolved_at", "location"} <= set(df.columns)
+    assert df["priority"].tolist()[:2] == [1, 3] and pd.isna(df["priority"].iloc[2])
+    assert df["is_major"].tolist() == [True, False, False]
+    assert str(df["opened_at"].dt.tz) == "UTC" and pd.isna(df["opened_at"].iloc[2])
+    assert set(timings) == {"rename", "datetime", "numeric", "is_major"}
+    assert "incident_id" in raw.columns  # input left untouched
+
+
+def test_cached_datetime_format_is_rechecked_for_each_frame():
+    plan = TransformPlan({}, [], ["opened_at"])
+    iso = plan.apply(pd.DataFrame({"opened_at": ["2025-03-14 08:00:00", "2025-03-15 09:30:00"]}))
+    # Same headers, another export layout: the cached ISO format must not be reused
+    dmy = plan.apply(pd.DataFrame({"opened_at": ["14/03/2025 08:00", "15/03/2025 09:30"]}))
+
+    assert iso["opened_at"].notna().all()
+    assert dmy["opened_at"].tolist() == iso["opened_at"].dt.floor("min").tolist()
+
+
+def test_rename_never_overwrites_canonical_columns():
+    plan = TransformPlan({"resolved_at": ["u_resolved"]}, [], [])
+    assert plan.rename_map(["u_resolved"]) == {"u_resolved": "resolved_at"}
+    assert plan.rename_map(["u_resolved", "resolved_at"]) == {}
+
+
+def test_compact_frame_shrinks_and_keeps_kpi_inputs():
+    records = _records(2_000)
+    for i, r in enumerate(records):
+        r.update({"short_description": f"Outage {i}", "incident_state": "6", "sys_id": f"{i:032x}"})
+    df = to_dataframe(records)
+    compact, report = compact_frame(df)
+
+    assert "sys_id" not in compact.columns
+    assert str(compact["priority"].dtype) == "Int8"
+    assert isinstance(compact["location"].dtype, pd.CategoricalDtype)
+    assert isinstance(compact["incident_state"].dtype, pd.CategoricalDtype)
+    assert str(compact["short_description"].dtype) == "string"
+    assert report.after < report.before and report.before == int(df.memory_usage(deep=True, index=False).sum())
+    assert compact["is_major"].tolist() == df["is_major"].tolist()
+
+
+def test_compact_chunked_matches_compact_single_pass():
+    records = _records(10)
+    pd.testing.assert_frame_equal(
+        to_dataframe_chunked([records[:5], records[5:]], compact=True),
+        to_dataframe(records, compact=True),
+    )
@@ -0,0 +1,85 @@
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+
+from src import kpis
+from src.synthetic import generate_incidents
+from src.transforms import to_dataframe
+from src.trends import TrendStore
+
+
+def _df():
+    def ts(day, h=0): return datetime(2025, 5, day, h, tzinfo=timezone.utc)
+    return pd.DataFrame([
+        {"is_major": True, "opened_at": ts(5), "resolved_at": ts(5, 4), "priority": 1, "location": "SiteA"},
+        {"is_major": True, "opened_at": ts(6), "resolved_at": ts(6, 8), "priority": 2, "location": "SiteB"},
+        {"is_major": False, "opened_at": ts(7), "resolved_at": ts(7, 1), "priority": 3, "location": "SiteA"},
+        {"is_major": True, "opened_at": ts(20), "resolved_at": pd.NaT, "priority": 1, "location": "SiteA"},
+    ])
+
+
+def test_weekly_series_fills_gaps_and_matches_kpis():
+    df = _df()
+    wk = TrendStore.from_frame(df).series("W")
+    assert wk["period"].tolist() == [pd.Timestamp("2025-05-05"), pd.Timestamp("2025-05-12"), pd.Timestamp("2025-05-19")]
+    assert wk["incidents"].tolist() == [2, 0, 1]
+    assert wk["mttr_hours"].iloc[0] == 6.0 and np.isnan(wk["mttr_hours"].iloc[1])
+    counts = kpis.weekly_counts(df)
+    assert wk[wk["incidents"] > 0]["incidents"].tolist() == counts["mi_count"].tolist()
+
+
+def test_filters_and_all_incidents():
+    store = TrendStore.from_frame(_df())
+    assert store.series("M", major_only=False)["incidents"].tolist() == [4]
+    assert store.series("D", priorities=[1], locations=["SiteA"])["incidents"].sum() == 2
+    assert store.series("W", priorities=[2])["mttr_hours"].tolist() == [8.0]
+
+
+def test_incremental_add_and_remove_match_rebuild():
+    df = to_dataframe(generate_incidents(3_000, seed=4))
+    first, rest = df.iloc[:1_000], df.iloc[1_000:]
+    store = TrendStore.from_frame(first)
+    store.add(rest)
+    pd.testing.assert_frame_equal(store.series("W"), TrendStore.from_frame(df).series("W"))
+
+    # Upsert: the incident was still open, then resolved
+    row = df[df["resolved_at"].isna()].head(1)
+    updated = row.assign(resolved_at=row["opened_at"] + timedelta(hours=3))
+    store.remove(row)
+    store.add(updated)
+    expected = TrendStore.from_frame(pd.concat([df.drop(row.index), updated])).series("M", major_only=False)
+    pd.testing.assert_frame_equal(store.series("M", major_only=False), expected)
+
+
+def test_percentiles_and_rolling_window():
+    df = to_dataframe(generate_incidents(20_000, seed=2))
+    store = TrendStore.from_frame(df)
+    monthly = store.series("M", quantiles=[0.5, 0.9])
+    major = df[df["is_major"] & df["resolved_at"].notna()]
+    hours = (major["resolved_at"] - major["opened_at"]).dt.total_seconds() / 3600
+    exact = hours.groupby(major["opened_at"].dt.tz_localize(None).dt.to_period("M")).quantile(0.9, interpolation="lower")
+    assert np.allclose(monthly["p90_hours"].to_numpy(), exact.to_numpy(), rtol=0.01)
+
+    roll = store.rolling(window=4, freq="W")
+    weekly = store.series("W")
+    assert np.isclose(roll["incidents_ma"].iloc[5], weekly["incidents"].iloc[2:6].mean())
+    window = weekly.iloc[2:6]
+    assert np.isclose(roll["mttr_rolling_hours"].iloc[5],
+                      (window["mttr_hours"] * window["resolved"]).sum() / window["resolved"].sum())
+    assert roll["incidents_delta"].iloc[1] == weekly["incidents"].iloc[1] - weekly["incidents"].iloc[0]
+    assert "p50_rolling_hours" in roll.columns
+
+
+def test_mttr_sketch_slices_match_exact_percentiles():
+    df = to_dataframe(generate_incidents(20_000, seed=5))
+    store = TrendStore.from_frame(df)
+    sliced = df[df["is_major"] & df["resolved_at"].notna() & (df["priority"] == 1)
+                & (df["opened_at"] >= pd.Timestamp("2024-03-01", tz="UTC"))
+                & (df["opened_at"] < pd.Timestamp("2024-07-01", tz="UTC"))]
+    hours = ((sliced["resolved_at"] - sliced["opened_at"]).dt.total_seconds() / 3600).to_numpy()
+    got = store.mttr_percentiles((0.5, 0.9, 0.99), start="2024-03-01", end="2024-07-01", priorities=[1])
+    exact = np.percentile(hours, [50, 90, 99], method="lower")
+    assert np.allclose(list(got.values()), exact, rtol=0.01)
+    assert store.mttr_sketch(priorities=[1]).count == int((df["is_major"] & df["resolved_at"].notna()
+                                                           & (df["priority"] == 1)).sum())
@@ -0,0 +1,138 @@
+
+from src.snow_client import SAVED_FILTERS, fetch_incidents
+from src.snow_stub import SnowStub
+from src.store import IncidentStore
+from src.synthetic import generate_incidents
+from src.views import ViewBatch, fetch_views, plan_views, resolve_views
+
+VIEWS = {
+    "p1": "priority=1",
+    "p1_p2": "priorityIN1,2",
+    "p1_network": "category=Network^priority=1",
+    "p1_again": "priority=1",
+    "open_or_p1": "state=1^ORpriority=1",
+}
+
+
+def test_plan_views_nests_saved_filters():
+    assert plan_views(resolve_views(SAVED_FILTERS)) == {
+        "PYTHON: MAJOR IM": "SIMPLE_P1_P2",
+        "SIMPLE_P1_P2": None,
+        "EMEA_HIGH_PRIORITY": "SIMPLE_P1_P2",
+    }
+    assert plan_views(VIEWS) == {"p1": None, "p1_p2": None, "p1_network": "p1", "p1_again": "p1",
+                                 "open_or_p1": None}
+    assert resolve_views(["SIMPLE_P1_P2", "priority=3"]) == {"SIMPLE_P1_P2": "priorityIN1,2",
+                                                            "priority=3": "priority=3"}
+
+
+def test_fetch_views_matches_separate_fetches(stub_client):
+    data = generate_incidents(1_500)
+    views = {k: v for k, v in VIEWS.items() if k != "open_or_p1"}
+    with SnowStub(data) as stub, stub_client(stub) as client:
+        batch = fetch_views(views, page_size=200, client=client)
+        batch_requests = stub.stats()["requests"]
+        for name, query in views.items():
+            expected = fetch_incidents(query, page_size=200, use_saved_filter=False, client=client)
+            assert sorted(batch.view(name)["number"]) == sorted(r["number"] for r in expected)
+        separate_requests = stub.stats()["requests"] - batch_requests
+    # Every record once: the union of the two full fetches
+    assert batch.df["number"].is_unique
+    assert len(batch.df) == int(data["priority"].isin(["1", "2"]).sum())
+    assert batch.counts()["p1_network"] > 0
+    assert batch_requests < separate_requests
+
+    restored = ViewBatch.from_frame(batch.to_frame())
+    assert list(restored.df.columns) == list(batch.df.columns)
+    assert restored.counts() == batch.counts()
+
+
+def test_contained_views_are_filtered_locally(stub_client):
+    data = generate_incidents(1_000)
+    with SnowStub(data) as stub, stub_client(stub) as client:
+        batch = fetch_views({"p1_p2": "priorityIN1,2", "p1_network": "priorityIN1,2^priority=1^category=Network"},
+                            page_size=1_000, client=client)
+        # One page for the broad view; the narrow one never reaches the instance
+        assert stub.stats()["requests"] == 1
+    expected = data[(data["priority"] == "1") & (data["category"] == "Network")]
+    assert sorted(batch.view("p1_network")["number"]) == sorted(expected["number"])
+
+
+def test_fetch_views_incremental_keeps_members(tmp_path, stub_client):
+    data = generate_incidents(600)
+    # The dot-walked clause cannot be evaluated locally, so its keys are fetched
+    views = {"p1_p2": "priorityIN1,2", "emea": "priorityIN1,2^location.u_region=EMEA"}
+    with SnowStub(data) as stub, stub_client(stub) as client, IncidentStore(tmp_path / "s.sqlite") as store:
+        first = fetch_views(views, page_size=100, client=client, store=store)
+        again = fetch_views(views, page_size=100, client=client, store=store)
+        # Key-only rows mark membership without overwriting the stored data
+        emea = store.records(views["emea"])
+        assert emea and all("short_description" in r for r in emea)
+    assert first.counts() == again.counts()
+    # The stub skips the dot-walked clause, so every P1/P2 matches
+    assert first.counts()["emea"] == first.counts()["p1_p2"] == int(data["priority"].isin(["1", "2"]).sum())
+
+
+def test_full_views_are_converted_page_by_page(monkeypatch, stub_client):
+    from src import views as views_module
+
+    convert = views_module.to_dataframe
+    sizes = []
+
+    def to_dataframe(records):
+        sizes.append(len(records))
+        return convert(records)
+
+    monkeypatch.setattr(views_module, "to_dataframe", to_dataframe)
+    data = generate_incidents(1_000)
+    with SnowStub(data) as stub, stub_client(stub) as client:
+        batch = fetch_views({"p1": "priority=1", "p1_p2": "priorityIN1,2"}, page_size=20, client=client)
+    # Raw records never pile up, and records in both views are converted once
+    assert len(sizes) >= len(batch.df) / 20 > 2 and max(sizes) <= 20
+    assert sum(sizes) == len(batch.df) == int(data["priority"].isin(["1", "2"]).sum())
+
+
+def test_reconciled_records_leave_the_cached_frame(tmp_path, monkeypatch, stub_client):
+    from src import snow_client
+    from src.frame_cache import FrameCache
+    from src.views import batch_version
+
+    data = generate_incidents(300)
+    views = {"p1_p2": "priorityIN1,2"}
+    cache = FrameCache(tmp_path / "frames")
+    with IncidentStore(tmp_path / "s.sqlite") as store:
+        with SnowStub(data) as stub, stub_client(stub) as client:
+            batch = fetch_views(views, page_size=100, client=client, store=store)
+            first = cache.get_or_build(batch_version(views, store), batch.to_frame)
+        # Deleted server-side: a delta sync never sees it, only the reconcile does
+        gone = first["number"].iloc[0]
+        monkeypatch.setattr(snow_client, "RECONCILE_SECONDS", 0)
+        with SnowStub(data[data["number"] != gone]) as stub, stub_client(stub) as client:
+            batch = fetch_views(views, page_size=100, client=client, store=store)
+            again = cache.get_or_build(batch_version(views, store), batch.to_frame)
+    assert gone in set(first["number"]) and gone not in set(again["number"])
+    assert len(again) == len(first) - 1
+
+
+def test_keys_that_leave_a_contained_view_are_reconciled(tmp_path, stub_client, monkeypatch):
+    from src import snow_client
+
+    data = generate_incidents(600)
+    # category is not fetched, so the network view is a key-only fetch, not a local filter
+    views = {"p1_p2": "priorityIN1,2", "network": "priorityIN1,2^category=Network"}
+    fields = ["number", "priority", "sys_updated_on"]
+    with IncidentStore(tmp_path / "s.sqlite") as store:
+        with SnowStub(data) as stub, stub_client(stub) as client:
+            first = fetch_views(views, fields, page_size=100, client=client, store=store)
+        moved = first.view("network")["number"].iloc[0]
+        # Recategorised: still P1/P2, but no longer returned by the network view's delta
+        changed = data.copy()
+        row = changed["number"] == moved
+        changed.loc[row, "category"] = "Software"
+        changed.loc[row, "sys_updated_on"] = "2099-01-01 00:00:00"
+        monkeypatch.setattr(snow_client, "RECONCILE_SECONDS", 0)
+        with SnowStub(changed) as stub, stub_client(stub) as client:
+            again = fetch_views(views, fields, page_size=100, client=client, store=store)
+    assert moved in set(again.view("p1_p2")["number"])
+    assert moved not in set(again.view("network")["number"])
+    assert again.counts()["network"] == first.counts()["network"] - 1